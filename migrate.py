@@ -5,7 +5,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
 
 from src.core.database import create_all_tables, migrate_database
-from src.models import User, Task  # Import models to register them
+from src.models import User, Task, PracticeInstance  # Import models to register them
 
 if __name__ == "__main__":
     print("Creating database tables...")
@@ -0,0 +1,19 @@
+-- SQL practice instance state, previously kept only in Docker labels
+CREATE TABLE IF NOT EXISTS practice_instances (
+    id VARCHAR(64) NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    backend VARCHAR(20) NOT NULL DEFAULT 'container',
+    name VARCHAR(100) NULL,
+    username VARCHAR(50) NULL,
+    db_name VARCHAR(100) NULL,
+    difficulty VARCHAR(20) NOT NULL DEFAULT 'easy',
+    dataset_rows INT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    port INT NULL,
+    expires_at DATETIME NULL,
+    last_activity_at DATETIME NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_practice_instances_user_created (user_id, created_at),
+    INDEX ix_practice_instances_expires_at (expires_at)
+);
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Header
+from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional, List
 import docker
@@ -8,56 +9,168 @@ from src.core.database import get_db
 from src.models.user import User
 from src.core.auth import get_current_user
 from src.services.sql_practice import SQLPracticeService
+from src.services.sql_practice_provider import SQLPracticeServiceProvider, SQLPracticeUnavailable
+from src.services.sql_practice_governor import QueryLimitExceeded, QueryTimeout, QueryCancelled
+from src.services.sql_practice_embedded import DialectError
+from src.services.sql_practice_sessions import SessionError
+from src.services.sql_practice_scripts import ScriptError
+from src.services.sql_practice_datasets import parse_dataset
+from src.services.sql_practice_jobs import JobConflict, job_events
+from src.services.sql_practice_admission import AdmissionRejected
+from src.core.config import settings
 
 router = APIRouter()
-sql_practice_service = SQLPracticeService()
+# 服务在应用启动后于后台初始化（见 src/main.py），导入本模块不访问Docker
+sql_practice_provider = SQLPracticeServiceProvider()
+
+async def get_sql_practice_service() -> SQLPracticeService:
+    """依赖注入：返回已启动的SQL练习服务，初始化失败时返回503"""
+    try:
+        return await sql_practice_provider.get()
+    except SQLPracticeUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 @router.get("/database")
 async def get_current_database(
     current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
 ):
     """获取当前用户的数据库实例信息"""
     try:
-        db_info = await sql_practice_service.get_user_database(current_user.id)
+        db_info = await service.get_user_database(current_user.id)
         return db_info
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def job_accepted(job):
+    """作业已受理：返回202和作业状态，Location 指向轮询地址"""
+    return JSONResponse(
+        status_code=202,
+        content=job.to_dict(),
+        headers={"Location": f"/api/v1/sql-practice/jobs/{job.id}"}
+    )
+
 @router.post("/database")
 async def create_database(
     options: Dict[str, Any],
+    wait: bool = Query(False, description="为true时等待创建完成后返回实例信息"),
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
 ):
-    """为当前用户创建新的SQL练习数据库实例"""
+    """为当前用户创建新的SQL练习数据库实例
+
+    默认立即返回202和作业ID，通过 /jobs/{job_id} 轮询或 /jobs/{job_id}/events 订阅进度。
+    """
     try:
-        difficulty = options.get("difficulty", "easy")
-        if difficulty not in ["easy", "medium", "hard"]:
+        # 难度可以带数据集大小，如 "hard-1M"
+        try:
+            difficulty, rows = parse_dataset(options.get("difficulty", "easy"))
+        except ValueError:
             raise HTTPException(status_code=400, detail="无效的难度级别")
+        if rows and rows > settings.SQL_PRACTICE_DATASET_MAX_ROWS:
+            raise HTTPException(status_code=400, detail="数据集过大")
         
         # Get the username from options or use the current user's username
         username = options.get("username", current_user.username)
         
+        if not wait:
+            job, _ = service.submit_create(
+                user_id=current_user.id,
+                username=username,
+                difficulty=difficulty,
+                rows=rows,
+                idempotency_key=idempotency_key
+            )
+            return job_accepted(job)
+        
         # 先清理现有实例
-        await sql_practice_service.cleanup_user_databases(current_user.id)
+        await service.cleanup_user_databases(current_user.id)
         
         # 创建新实例
-        db_info = await sql_practice_service.create_database(
+        db_info = await service.create_database(
             user_id=current_user.id,
             username=username,
-            difficulty=difficulty
+            difficulty=difficulty,
+            rows=rows
         )
         return db_info
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def get_user_job(service, job_id, current_user):
+    job = service.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="作业不存在或已过期")
+    if job.user_id != str(current_user.id):
+        raise HTTPException(status_code=403, detail="无权查看此作业")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str = Path(...),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """查询创建/重置作业的状态和进度"""
+    return get_user_job(service, job_id, current_user).to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str = Path(...),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """以Server-Sent Events推送作业进度，作业结束后关闭连接"""
+    job = get_user_job(service, job_id, current_user)
+    return StreamingResponse(
+        job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats")
+async def get_service_stats(
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """获取SQL练习服务的运行指标（仅管理员）"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="无权查看服务指标")
+    stats = service.get_stats()
+    stats["startup"] = sql_practice_provider.stats()
+    return stats
+
+@router.post("/hosts/{host_name}/drain")
+async def drain_host(
+    host_name: str = Path(...),
+    resume: bool = Query(False, description="为 true 时结束排空，恢复放置新容器"),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """排空Docker主机：不再放置新容器，已有实例保留到删除或过期（仅管理员）"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="无权管理主机")
+    try:
+        return await service.drain_host(host_name, draining=not resume)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.get("/database/{database_id}")
 async def get_database_info(
     database_id: str = Path(...),
     current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
 ):
     """获取特定数据库实例的信息"""
     try:
-        db_info = await sql_practice_service.get_database_info(database_id)
+        db_info = await service.get_database_info(database_id)
         if not db_info:
             raise HTTPException(status_code=404, detail="数据库实例不存在")
         
@@ -74,24 +187,62 @@ async def get_database_info(
 @router.post("/database/{database_id}/reset")
 async def reset_database(
     database_id: str = Path(...),
+    wait: bool = Query(False, description="为true时等待重置完成后返回"),
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
 ):
-    """重置数据库到初始状态"""
+    """重置数据库到初始状态，默认立即返回202和作业ID"""
     try:
         # 验证用户权限
-        db_info = await sql_practice_service.get_database_info(database_id)
+        db_info = await service.get_database_info(database_id)
         if not db_info:
             raise HTTPException(status_code=404, detail="数据库实例不存在")
         
         if str(db_info.get("user_id")) != str(current_user.id):
             raise HTTPException(status_code=403, detail="无权访问此数据库实例")
         
+        if not wait:
+            job, _ = service.submit_reset(
+                user_id=current_user.id,
+                database_id=database_id,
+                difficulty=db_info.get("difficulty", "easy"),
+                idempotency_key=idempotency_key
+            )
+            return job_accepted(job)
+        
         # 执行重置
-        result = await sql_practice_service.reset_database(
+        result = await service.reset_database(
             database_id=database_id,
             difficulty=db_info.get("difficulty", "easy")
         )
         return {"success": True, "message": "数据库已成功重置"}
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/database/{database_id}/undo")
+async def undo_last_statement(
+    database_id: str = Path(...),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """撤销上一条修改数据的语句（需启用会话模式）"""
+    try:
+        # 验证用户权限
+        db_info = await service.get_database_info(database_id)
+        if not db_info:
+            raise HTTPException(status_code=404, detail="数据库实例不存在")
+        
+        if str(db_info.get("user_id")) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="无权访问此数据库实例")
+        
+        if not await service.undo_last_statement(database_id):
+            raise HTTPException(status_code=400, detail="没有可撤销的语句")
+        return {"success": True, "message": "已撤销上一条语句"}
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -102,11 +253,12 @@ async def execute_query(
     query_data: Dict[str, Any],
     database_id: str = Path(...),
     current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
 ):
     """在指定数据库中执行SQL查询"""
     try:
         # 验证用户权限
-        db_info = await sql_practice_service.get_database_info(database_id)
+        db_info = await service.get_database_info(database_id)
         if not db_info:
             raise HTTPException(status_code=404, detail="数据库实例不存在")
         
@@ -122,27 +274,143 @@ async def execute_query(
         difficulty = query_data.get("difficulty", "easy")
         
         # 执行查询
-        result = await sql_practice_service.execute_query(
+        result = await service.execute_query(
             database_id=database_id,
             sql=sql,
             question_id=question_id,
-            difficulty=difficulty
+            difficulty=difficulty,
+            user_id=current_user.id
         )
         return result
     except HTTPException as e:
         raise e
+    except QueryLimitExceeded as e:
+        raise HTTPException(status_code=429, detail={"error": str(e)})
+    except QueryTimeout as e:
+        raise HTTPException(status_code=408, detail={"error": str(e)})
+    except QueryCancelled as e:
+        raise HTTPException(status_code=409, detail={"error": str(e)})
+    except DialectError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "engine": "sqlite"})
+    except SessionError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
     except Exception as e:
         raise HTTPException(status_code=500, detail={"error": str(e)})
 
+@router.post("/database/{database_id}/script")
+async def execute_script(
+    script_data: Dict[str, Any],
+    database_id: str = Path(...),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """在指定数据库中依次执行多条语句，返回每条语句的结果和耗时；遇到错误即停止"""
+    try:
+        # 验证用户权限
+        db_info = await service.get_database_info(database_id)
+        if not db_info:
+            raise HTTPException(status_code=404, detail="数据库实例不存在")
+        
+        if str(db_info.get("user_id")) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="无权访问此数据库实例")
+        
+        sql = script_data.get("sql")
+        if not sql:
+            raise HTTPException(status_code=400, detail="查询参数不能为空")
+        
+        return await service.execute_script(
+            database_id=database_id,
+            sql=sql,
+            transaction=bool(script_data.get("transaction", False)),
+            user_id=current_user.id
+        )
+    except HTTPException as e:
+        raise e
+    except ScriptError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    except QueryLimitExceeded as e:
+        raise HTTPException(status_code=429, detail={"error": str(e)})
+    except QueryTimeout as e:
+        raise HTTPException(status_code=408, detail={"error": str(e)})
+    except QueryCancelled as e:
+        raise HTTPException(status_code=409, detail={"error": str(e)})
+    except SessionError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"error": str(e)})
+
+@router.post("/database/{database_id}/query/stream")
+async def stream_query(
+    query_data: Dict[str, Any],
+    database_id: str = Path(...),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """在指定数据库中执行SQL查询，以NDJSON逐行返回结果（不判题）"""
+    try:
+        # 验证用户权限
+        db_info = await service.get_database_info(database_id)
+        if not db_info:
+            raise HTTPException(status_code=404, detail="数据库实例不存在")
+        
+        if str(db_info.get("user_id")) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="无权访问此数据库实例")
+        
+        sql = query_data.get("sql")
+        if not sql:
+            raise HTTPException(status_code=400, detail="查询参数不能为空")
+        
+        # 查询在返回响应前执行，SQL错误仍以HTTP错误返回
+        stream = await service.open_query_stream(database_id, sql, user_id=current_user.id)
+        return StreamingResponse(stream, media_type="application/x-ndjson")
+    except HTTPException as e:
+        raise e
+    except QueryLimitExceeded as e:
+        raise HTTPException(status_code=429, detail={"error": str(e)})
+    except QueryTimeout as e:
+        raise HTTPException(status_code=408, detail={"error": str(e)})
+    except QueryCancelled as e:
+        raise HTTPException(status_code=409, detail={"error": str(e)})
+    except DialectError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "engine": "sqlite"})
+    except SessionError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"error": str(e)})
+
+@router.post("/database/{database_id}/query/cancel")
+async def cancel_query(
+    database_id: str = Path(...),
+    current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
+):
+    """取消指定数据库中正在执行的查询"""
+    try:
+        # 验证用户权限
+        db_info = await service.get_database_info(database_id)
+        if not db_info:
+            raise HTTPException(status_code=404, detail="数据库实例不存在")
+        
+        if str(db_info.get("user_id")) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="无权访问此数据库实例")
+        
+        cancelled = await service.cancel_queries(database_id)
+        return {"success": True, "cancelled": cancelled}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/database/{database_id}")
 async def delete_database(
     database_id: str = Path(...),
     current_user: User = Depends(get_current_user),
+    service: SQLPracticeService = Depends(get_sql_practice_service),
 ):
     """删除数据库实例"""
     try:
         # 验证用户权限
-        db_info = await sql_practice_service.get_database_info(database_id)
+        db_info = await service.get_database_info(database_id)
         if not db_info:
             raise HTTPException(status_code=404, detail="数据库实例不存在")
         
@@ -150,7 +418,7 @@ async def delete_database(
             raise HTTPException(status_code=403, detail="无权访问此数据库实例")
         
         # 执行删除
-        await sql_practice_service.delete_database(database_id)
+        await service.delete_database(database_id)
         return {"success": True, "message": "数据库实例已成功删除"}
     except HTTPException as e:
         raise e
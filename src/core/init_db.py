@@ -4,6 +4,7 @@ from passlib.context import CryptContext
 from src.core.database import engine, Base, SessionLocal
 from src.models.user import User  # 需要导入 User 模型才能创建表
 from src.models.task import Task
+from src.models.practice_instance import PracticeInstance
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -6,10 +8,20 @@ from src.models.user import User
 from src.models.material import Material
 from src.models.task import Task  # Import models to register them
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # SQL练习服务在后台初始化（连接Docker、启动预热池等），不阻塞应用启动
+    sqlpractice.sql_practice_provider.warm_up()
+    yield
+    await sqlpractice.sql_practice_provider.shutdown()
+
+
 app = FastAPI(
     title="Score Management System",
     description="Backend API for the Score Management System",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
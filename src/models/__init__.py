@@ -1,4 +1,5 @@
 from src.models.user import User
 from src.models.task import Task
+from src.models.practice_instance import PracticeInstance
 
-__all__ = ["User", "Task"]
+__all__ = ["User", "Task", "PracticeInstance"]
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+
+from src.core.database import Base
+
+
+class PracticeInstance(Base):
+    __tablename__ = "practice_instances"
+
+    # 容器ID，或共享/内嵌后端的实例ID
+    id = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    backend = Column(String(20), nullable=False, default="container")
+    name = Column(String(100), nullable=True)
+    username = Column(String(50), nullable=True)
+    db_name = Column(String(100), nullable=True)
+    difficulty = Column(String(20), nullable=False, default="easy")
+    dataset_rows = Column(Integer, nullable=True)  # 大规模数据集的行数，示例数据为空
+
+    # running / exited / paused 等容器状态
+    status = Column(String(20), nullable=False, default="running")
+    port = Column(Integer, nullable=True)
+
+    expires_at = Column(DateTime, nullable=True, index=True)
+    last_activity_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        # 按用户查询最新实例
+        Index("ix_practice_instances_user_created", "user_id", "created_at"),
+    )
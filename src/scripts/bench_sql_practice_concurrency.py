@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Concurrency benchmark for SQLPracticeService.execute_query.
+
+Fires N parallel queries that each sleep server-side and reports the wall
+time next to the fully serialized time, plus the worst event loop stall
+observed while the queries run. A blocking driver on the event loop shows
+wall time ~= serialized time and a stall as long as the whole batch.
+
+Usage:
+    python -m src.scripts.bench_sql_practice_concurrency [--queries 50] [--sleep 0.2] [--database-id ID]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add the project root to sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.services.sql_practice import SQLPracticeService
+
+
+async def measure_loop_lag(stop_event, interval=0.01):
+    """Return the largest delay between scheduled and actual wake-ups"""
+    worst = 0.0
+    while not stop_event.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def run_benchmark(queries, sleep_seconds, database_id=None):
+    service = SQLPracticeService()
+    created = None
+    try:
+        if not database_id:
+            print("Creating a benchmark sandbox...")
+            created = await service.create_database(user_id="bench", username="bench", difficulty="easy")
+            database_id = created["id"]
+
+        sql = f"SELECT SLEEP({sleep_seconds}) AS slept"
+        # Warm up connections and the executor
+        await service.execute_query(database_id, "SELECT 1")
+
+        stop_event = asyncio.Event()
+        lag_task = asyncio.create_task(measure_loop_lag(stop_event))
+        start = time.perf_counter()
+        await asyncio.gather(*(service.execute_query(database_id, sql) for _ in range(queries)))
+        wall = time.perf_counter() - start
+        stop_event.set()
+        worst_lag = await lag_task
+
+        serialized = queries * sleep_seconds
+        print(f"Queries:            {queries} x SLEEP({sleep_seconds})")
+        print(f"Serialized time:    {serialized:.2f}s")
+        print(f"Wall time:          {wall:.2f}s")
+        print(f"Speedup:            {serialized / wall:.1f}x")
+        print(f"Worst loop stall:   {worst_lag * 1000:.1f}ms")
+    finally:
+        if created:
+            await service.delete_database(database_id)
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel practice queries")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--sleep", type=float, default=0.2)
+    parser.add_argument("--database-id", default=None)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.queries, args.sleep, args.database_id))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add the project root to sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.services.sql_practice import SQLPracticeService
+from src.services.sql_practice_images import PracticeImageBuilder
+
+
+async def build_images(difficulties):
+    """Build (or reuse) the pre-seeded image for each difficulty"""
+    service = SQLPracticeService()
+    builder = service.image_builder or PracticeImageBuilder(service)
+    # With SQL_PRACTICE_DOCKER_HOSTS the image is built on every host
+    hosts = list(service.placement.hosts) if service.placement else [None]
+    for host in hosts:
+        for difficulty in difficulties:
+            tag = await builder.ensure_image(difficulty, host)
+            print(f"✅ {difficulty}: {tag}" + (f" on {host}" if host else ""))
+
+
+if __name__ == "__main__":
+    difficulties = sys.argv[1:] or ["easy", "medium", "hard"]
+    try:
+        asyncio.run(build_images(difficulties))
+    except Exception as e:
+        print(f"❌ Failed to build practice images: {e}")
+        sys.exit(1)
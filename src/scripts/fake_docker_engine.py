@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+"""
+In-memory fake of the Docker Engine API subset used by the SQL practice service.
+
+Point the service (or AsyncDockerClient) at it with
+SQL_PRACTICE_DOCKER_HOST=http://127.0.0.1:2375 (or unix:///tmp/fake-docker.sock
+when started with --socket). Containers never run anything: they print the
+MySQL "ready for connections" log lines after --ready-after seconds, and
+stop waits --stop-delay seconds, so load tests can reproduce slow teardown
+without a Docker daemon.
+
+With --hosts N it starts N independent engines on consecutive ports and
+prints a matching SQL_PRACTICE_DOCKER_HOSTS value for multi-host placement
+tests.
+"""
+
+import re
+import os
+import sys
+import json
+import time
+import uuid
+import struct
+import socketserver
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeEngine:
+    """Container state shared by all request handler threads"""
+
+    def __init__(self, ready_after=0.5, stop_delay=0.0):
+        self.ready_after = ready_after
+        self.stop_delay = stop_delay
+        self.containers = {}
+        self.pulled = set()
+        self.events = []
+        self.next_port = 40000
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def find(self, ref):
+        """Look up a container by full ID, ID prefix or name"""
+        with self.lock:
+            for container in self.containers.values():
+                if container["Id"] == ref or container["Name"] == f"/{ref}":
+                    return container
+            matches = [c for c in self.containers.values() if c["Id"].startswith(ref)]
+            return matches[0] if len(matches) == 1 else None
+
+    def create(self, name, body):
+        with self.lock:
+            if name and any(c["Name"] == f"/{name}" for c in self.containers.values()):
+                return None
+            container_id = uuid.uuid4().hex + uuid.uuid4().hex
+            self.containers[container_id] = {
+                "Id": container_id,
+                "Name": f"/{name or container_id[:12]}",
+                "Created": datetime.now(timezone.utc).isoformat(),
+                "Image": body.get("Image"),
+                "Config": {
+                    "Image": body.get("Image"),
+                    "Env": body.get("Env") or [],
+                    "Labels": body.get("Labels") or {},
+                    "Healthcheck": body.get("Healthcheck"),
+                },
+                "HostConfig": body.get("HostConfig") or {},
+                "State": {"Status": "created", "Running": False, "Paused": False, "ExitCode": 0},
+                "NetworkSettings": {"Ports": {}},
+                "_started_at": None,
+            }
+            self.emit(self.containers[container_id], "create")
+            return container_id
+
+    def emit(self, container, action):
+        """Record a container event for /events subscribers (caller holds the lock)"""
+        self.events.append({
+            "Type": "container",
+            "Action": action,
+            "Actor": {"ID": container["Id"], "Attributes": dict(container["Config"]["Labels"])},
+            "time": int(time.time()),
+        })
+        self.changed.notify_all()
+
+    def start(self, container):
+        with self.lock:
+            if container["State"]["Status"] == "running":
+                return False
+            bindings = {}
+            for port in container["HostConfig"].get("PortBindings") or {}:
+                self.next_port += 1
+                bindings[port] = [{"HostIp": "0.0.0.0", "HostPort": str(self.next_port)}]
+            container["NetworkSettings"]["Ports"] = bindings
+            container["State"].update({"Status": "running", "Running": True, "Paused": False})
+            container["_started_at"] = time.time()
+            self.emit(container, "start")
+            return True
+
+    def stop(self, container, exit_code=0):
+        with self.lock:
+            if container["State"]["Status"] not in ("running", "paused"):
+                return False
+            container["State"].update({"Status": "exited", "Running": False, "Paused": False, "ExitCode": exit_code})
+            container["NetworkSettings"]["Ports"] = {}
+            self.emit(container, "die")
+            return True
+
+    def remove(self, container):
+        with self.lock:
+            self.containers.pop(container["Id"], None)
+            self.emit(container, "destroy")
+
+    def log_lines(self, container):
+        """Log lines the container has printed so far, as (timestamp, line)"""
+        started = container["_started_at"]
+        if started is None:
+            return []
+        lines = [(started, "[System] [MY-010116] [Server] /usr/sbin/mysqld starting as process 1")]
+        if time.time() >= started + self.ready_after / 2:
+            lines.append((started + self.ready_after / 2,
+                          "[System] [MY-010931] [Server] /usr/sbin/mysqld: ready for connections. port: 0"))
+        if time.time() >= started + self.ready_after:
+            lines.append((started + self.ready_after,
+                          "[System] [MY-010931] [Server] /usr/sbin/mysqld: ready for connections. "
+                          "Version: '8.0.0'  socket: '/var/run/mysqld/mysqld.sock'  port: 3306  MySQL"))
+        return lines
+
+    @staticmethod
+    def matches(container, filters):
+        labels = container["Config"]["Labels"]
+        for label in filters.get("label", []):
+            key, _, value = label.partition("=")
+            if key not in labels or (value and labels[key] != value):
+                return False
+        for name in filters.get("name", []):
+            if name not in container["Name"]:
+                return False
+        return True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    engine = None
+
+    ROUTES = [
+        ("GET", r"/_ping", "ping"),
+        ("GET", r"/version", "version"),
+        ("POST", r"/images/create", "pull"),
+        ("GET", r"/containers/json", "list"),
+        ("GET", r"/events", "events"),
+        ("POST", r"/containers/create", "create"),
+        ("GET", r"/containers/([^/]+)/json", "inspect"),
+        ("POST", r"/containers/([^/]+)/(start|stop|kill|pause|unpause|rename)", "action"),
+        ("GET", r"/containers/([^/]+)/stats", "stats"),
+        ("GET", r"/containers/([^/]+)/logs", "logs"),
+        ("DELETE", r"/containers/([^/]+)", "remove"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        path = re.sub(r"^/v[\d.]+", "", url.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        for route_method, pattern, handler in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                return getattr(self, f"handle_{handler}")(*match.groups())
+        self.reply(404, {"message": f"page not found: {method} {path}"})
+
+    def reply(self, status, payload=None):
+        data = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def container_or_404(self, ref):
+        container = self.engine.find(ref)
+        if container is None:
+            self.reply(404, {"message": f"No such container: {ref}"})
+        return container
+
+    def handle_ping(self):
+        self.reply(200, "OK")
+
+    def handle_version(self):
+        self.reply(200, {"Version": "fake", "ApiVersion": "1.41"})
+
+    def handle_pull(self):
+        self.engine.pulled.add(f"{self.query.get('fromImage')}:{self.query.get('tag')}")
+        self.reply(200, {"status": f"Pulled {self.query.get('fromImage')}:{self.query.get('tag')}"})
+
+    def handle_list(self):
+        filters = json.loads(self.query.get("filters", "{}"))
+        show_all = self.query.get("all") in ("1", "true")
+        with self.engine.lock:
+            containers = list(self.engine.containers.values())
+        self.reply(200, [
+            {"Id": c["Id"], "Names": [c["Name"]], "Labels": c["Config"]["Labels"], "State": c["State"]["Status"]}
+            for c in containers
+            if (show_all or c["State"]["Running"]) and self.engine.matches(c, filters)
+        ])
+
+    def handle_create(self):
+        image = self.body.get("Image") or ""
+        # images named missing* exist only after they are pulled
+        if image.startswith("missing") and image not in self.engine.pulled:
+            return self.reply(404, {"message": f"No such image: {image}"})
+        container_id = self.engine.create(self.query.get("name"), self.body)
+        if container_id is None:
+            return self.reply(409, {"message": "Conflict. The container name is already in use"})
+        self.reply(201, {"Id": container_id, "Warnings": []})
+
+    def handle_inspect(self, ref):
+        container = self.container_or_404(ref)
+        if container:
+            state = dict(container["State"])
+            if container["Config"].get("Healthcheck") and state["Status"] == "running":
+                ready = time.time() >= container["_started_at"] + self.engine.ready_after
+                state["Health"] = {"Status": "healthy" if ready else "starting"}
+            self.reply(200, {**{k: v for k, v in container.items() if not k.startswith("_")}, "State": state})
+
+    def handle_action(self, ref, action):
+        container = self.container_or_404(ref)
+        if not container:
+            return
+        status = container["State"]["Status"]
+        if action == "start":
+            return self.reply(204 if self.engine.start(container) else 304)
+        if action == "stop":
+            if status == "running":
+                time.sleep(min(self.engine.stop_delay, float(self.query.get("t", 10))))
+            return self.reply(204 if self.engine.stop(container) else 304)
+        if action == "kill":
+            if status != "running":
+                return self.reply(409, {"message": f"Container {ref} is not running"})
+            self.engine.stop(container, exit_code=137)
+            return self.reply(204)
+        if action == "pause":
+            if status != "running":
+                return self.reply(409, {"message": f"Container {ref} is not running"})
+            with self.engine.lock:
+                container["State"].update({"Status": "paused", "Paused": True})
+                self.engine.emit(container, "pause")
+            return self.reply(204)
+        if action == "unpause":
+            if status != "paused":
+                return self.reply(409, {"message": f"Container {ref} is not paused"})
+            with self.engine.lock:
+                container["State"].update({"Status": "running", "Paused": False})
+                self.engine.emit(container, "unpause")
+            return self.reply(204)
+        if action == "rename":
+            with self.engine.lock:
+                container["Name"] = f"/{self.query['name']}"
+                self.engine.emit(container, "rename")
+            return self.reply(204)
+
+    def handle_stats(self, ref):
+        container = self.container_or_404(ref)
+        if container:
+            running = container["State"]["Status"] in ("running", "paused")
+            usage = 400 * 1024 * 1024 if running else 0
+            self.reply(200, {"memory_stats": {"usage": usage, "stats": {"inactive_file": usage // 10}} if running else {}})
+
+    def handle_remove(self, ref):
+        container = self.container_or_404(ref)
+        if not container:
+            return
+        if container["State"]["Running"] and self.query.get("force") not in ("1", "true"):
+            return self.reply(409, {"message": "You cannot remove a running container. Stop the container before attempting removal or force remove"})
+        self.engine.remove(container)
+        self.reply(204)
+
+    def handle_logs(self, ref):
+        container = self.container_or_404(ref)
+        if not container:
+            return
+        follow = self.query.get("follow") in ("1", "true")
+        since = float(self.query.get("since") or 0)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        try:
+            while True:
+                lines = [line for at, line in self.engine.log_lines(container) if at >= since]
+                for line in lines[sent:]:
+                    frame = (line + "\n").encode()
+                    self.write_chunk(struct.pack(">BxxxI", 1, len(frame)) + frame)
+                sent = len(lines)
+                alive = self.engine.find(container["Id"]) and container["State"]["Running"]
+                if not follow or not alive:
+                    break
+                with self.engine.changed:
+                    self.engine.changed.wait(0.05)
+            self.write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def handle_events(self):
+        """Stream container events from now on until the client disconnects"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with self.engine.lock:
+            sent = len(self.engine.events)
+        try:
+            while True:
+                with self.engine.changed:
+                    self.engine.changed.wait(1.0)
+                    events = self.engine.events[sent:]
+                    sent += len(events)
+                for event in events:
+                    self.write_chunk((json.dumps(event) + "\n").encode())
+                if not events:
+                    # a zero-length write would end the stream; probe the socket with an empty line
+                    self.write_chunk(b"\n")
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+
+def serve(host="127.0.0.1", port=2375, socket_path=None, ready_after=0.5, stop_delay=0.0):
+    """Start the fake engine in a background thread and return the server"""
+    handler = type("FakeEngineHandler", (Handler,), {"engine": FakeEngine(ready_after, stop_delay)})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Docker Engine API for SQL practice tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2375)
+    parser.add_argument("--socket", help="listen on a unix socket instead of TCP")
+    parser.add_argument("--ready-after", type=float, default=0.5, help="seconds until MySQL reports ready")
+    parser.add_argument("--stop-delay", type=float, default=0.0, help="seconds a graceful stop takes")
+    parser.add_argument("--hosts", type=int, default=1, help="number of engines on consecutive TCP ports")
+    args = parser.parse_args()
+
+    if args.hosts > 1:
+        servers = [
+            serve(args.host, args.port + i, None, args.ready_after, args.stop_delay)
+            for i in range(args.hosts)
+        ]
+        hosts = {
+            f"fake{i}": {"url": f"http://{args.host}:{args.port + i}", "address": args.host}
+            for i in range(args.hosts)
+        }
+        print(f"✅ {args.hosts} Fake Docker Engines listening on ports {args.port}-{args.port + args.hosts - 1}")
+        print(f"SQL_PRACTICE_DOCKER_HOSTS='{json.dumps(hosts)}'")
+    else:
+        servers = [serve(args.host, args.port, args.socket, args.ready_after, args.stop_delay)]
+        address = f"unix://{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+        print(f"✅ Fake Docker Engine listening on {address}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import os
+from pathlib import Path
+
+# Add the project root to sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.core.config import settings
+from src.services.sql_practice_datasets import DatasetGenerator, parse_dataset
+
+
+def generate(names):
+    """Generate (or reuse) the CSV files for each dataset, e.g. hard-1M"""
+    data_root = settings.SQL_PRACTICE_DATASET_DIR or str(
+        Path(__file__).parent / "sql_practice" / "datasets"
+    )
+    generator = DatasetGenerator(
+        data_root,
+        seed=settings.SQL_PRACTICE_DATASET_SEED,
+        max_rows=settings.SQL_PRACTICE_DATASET_MAX_ROWS
+    )
+    for name in names:
+        difficulty, rows = parse_dataset(name)
+        if not rows:
+            print(f"⏭️  {name}: sample data only, nothing to generate")
+            continue
+        start = time.time()
+        files = generator.ensure(difficulty, rows)
+        size = sum(os.path.getsize(path) for _, path in files)
+        print(f"✅ {name}: {len(files)} tables, {size / 1024 / 1024:.1f} MB in {time.time() - start:.1f}s")
+        print(f"   {generator.dataset_dir(difficulty, rows)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: generate_practice_datasets.py <dataset> [<dataset> ...]  e.g. hard-1M medium-100K")
+        sys.exit(2)
+    try:
+        generate(sys.argv[1:])
+    except Exception as e:
+        print(f"❌ Failed to generate datasets: {e}")
+        sys.exit(1)
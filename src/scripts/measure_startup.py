@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Measure how long `uvicorn src.main:app` takes to become ready.
+
+Reports the import time of src.main, the time until the lifespan startup
+completes (when uvicorn starts accepting requests) and, with --wait-service,
+the time until the SQL practice service has finished initializing in the
+background. The first two must not depend on the Docker daemon.
+
+Usage:
+    python -m src.scripts.measure_startup [--wait-service] [--timeout 60]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add the project root to sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+
+async def measure(wait_service, timeout):
+    started = time.perf_counter()
+    from src.main import app
+    from src.api.v1 import sqlpractice
+    imported = time.perf_counter()
+    print(f"✅ import src.main: {(imported - started) * 1000:.0f}ms")
+
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        print(f"✅ lifespan startup: {(ready - imported) * 1000:.0f}ms")
+        if wait_service:
+            try:
+                await asyncio.wait_for(sqlpractice.sql_practice_provider.get(), timeout)
+                print(f"✅ SQL practice service: {(time.perf_counter() - ready) * 1000:.0f}ms after startup")
+            except Exception as e:
+                print(f"❌ SQL practice service unavailable after {(time.perf_counter() - ready) * 1000:.0f}ms: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure application startup time")
+    parser.add_argument("--wait-service", action="store_true", help="also wait for the SQL practice service")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    asyncio.run(measure(args.wait_service, args.timeout))
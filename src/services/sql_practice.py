@@ -2,17 +2,80 @@ import os
 import uuid
 import asyncio
 import re
+import time
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 import docker
 import mysql.connector
 import json
 
+from src.core.config import settings
+from src.core.database import SessionLocal
+from src.services.sql_practice_metrics import PracticeMetrics
+from src.services.sql_practice_pool import WarmPool
+from src.services.sql_practice_shared import SharedMySQLBackend
+from src.services.sql_practice_images import PracticeImageBuilder
+from src.services.sql_practice_connections import ConnectionPoolManager
+from src.services.sql_practice_registry import ContainerRegistry
+from src.services.sql_practice_reaper import ExpiryReaper
+from src.services.sql_practice_results import ResultLimiter, encode_line, estimate_total_rows
+from src.services.sql_practice_governor import QueryGovernor
+from src.services.sql_practice_grading import GradingEngine, GradingPending
+from src.services.sql_practice_embedded import EmbeddedSQLiteBackend
+from src.services.sql_practice_sessions import SessionManager
+from src.services.sql_practice_seeding import SeedingPipeline
+from src.services.sql_practice_datasets import DatasetGenerator, GENERATOR_VERSION, format_size
+from src.services.sql_practice_store import PracticeInstanceStore
+from src.services.sql_practice_hibernation import IdleHibernator
+from src.services.sql_practice_jobs import JobRunner, report_progress
+from src.services.sql_practice_admission import AdmissionController
+from src.services.sql_practice_readiness import MySQLReadiness, HEALTHCHECK
+from src.services.sql_practice_teardown import TeardownQueue, TEARDOWN_PREFIX
+from src.services.sql_practice_docker import AsyncDockerClient
+from src.services.sql_practice_eviction import MemoryEvictor
+from src.services.sql_practice_placement import DockerHost, PlacementScheduler, RoutedDockerClient
+from src.services.sql_practice_scripts import ScriptResult, parse_script
+
 class SQLPracticeService:
     """SQL练习服务，管理Docker容器中的MySQL数据库实例"""
     
     def __init__(self):
-        """初始化Docker客户端和基本配置"""
-        self.docker_client = docker.from_env()
+        """初始化基本配置；不访问Docker和文件系统，连接在首次使用时建立"""
+        self._docker_client = None
+        self.metrics = PracticeMetrics()
+        # 容器操作使用异步客户端；docker_client 只用于事件流和镜像构建
+        # 配置了多台主机时，新容器按负载放置，容器操作路由到所在主机
+        self.placement = None
+        if settings.SQL_PRACTICE_DOCKER_HOSTS:
+            self.placement = PlacementScheduler(
+                self,
+                [
+                    DockerHost(
+                        name,
+                        options["url"],
+                        address=options.get("address", "localhost"),
+                        capacity=options.get("capacity", settings.SQL_PRACTICE_HOST_CAPACITY),
+                        draining=options.get("draining", False),
+                        api_version=settings.SQL_PRACTICE_DOCKER_API_VERSION,
+                        timeout=settings.SQL_PRACTICE_DOCKER_TIMEOUT,
+                        max_connections=settings.SQL_PRACTICE_DOCKER_MAX_CONNECTIONS
+                    )
+                    for name, options in settings.SQL_PRACTICE_DOCKER_HOSTS.items()
+                ],
+                strategy=settings.SQL_PRACTICE_PLACEMENT_STRATEGY,
+                metrics=self.metrics
+            )
+            self.docker = RoutedDockerClient(self.placement)
+        else:
+            self.docker = AsyncDockerClient(
+                base_url=settings.SQL_PRACTICE_DOCKER_HOST or None,
+                api_version=settings.SQL_PRACTICE_DOCKER_API_VERSION,
+                timeout=settings.SQL_PRACTICE_DOCKER_TIMEOUT,
+                max_connections=settings.SQL_PRACTICE_DOCKER_MAX_CONNECTIONS
+            )
         self.mysql_image = "mysql:8.0"
         self.mysql_root_password = "practice_password"
         self.mysql_database = "practice_db"
@@ -20,15 +83,240 @@ class SQLPracticeService:
         self.mysql_password = "practice_password"
         self.container_expiry = timedelta(hours=1)  # 容器有效期1小时
         
-        # 初始化脚本和验证脚本
-        self.scripts_dir = os.path.join(os.path.dirname(__file__), "../scripts/sql_practice")
-        os.makedirs(self.scripts_dir, exist_ok=True)
+        # mysql.connector 是阻塞驱动，所有数据库I/O放到专用线程池，避免阻塞事件循环
+        # 也不与 asyncio.to_thread 的默认线程池争抢
+        self._db_executor = ThreadPoolExecutor(
+            max_workers=settings.SQL_PRACTICE_DB_WORKERS,
+            thread_name_prefix="sql-practice-db"
+        )
+        # 查询连接按实例复用，省去每次查询的TCP连接和认证握手
+        self.connections = ConnectionPoolManager(
+            max_size=settings.SQL_PRACTICE_CONN_POOL_SIZE,
+            idle_timeout=settings.SQL_PRACTICE_CONN_IDLE_TIMEOUT,
+            health_check_after=settings.SQL_PRACTICE_CONN_HEALTH_CHECK_AFTER,
+            metrics=self.metrics
+        )
+        # 练习会话模式：用户的修改保留在固定连接的事务中，重置和撤销只需回滚
+        self.sessions = None
+        if settings.SQL_PRACTICE_SESSION_MODE:
+            self.sessions = SessionManager(
+                max_undo=settings.SQL_PRACTICE_SESSION_MAX_UNDO,
+                metrics=self.metrics
+            )
+        # 执行用户查询使用的连接来源
+        self.query_connections = self.sessions or self.connections
+        
+        # 数据导入：解析脚本后批量执行，大表从CSV批量导入
+        self.seeder = SeedingPipeline(
+            batch_bytes=settings.SQL_PRACTICE_SEED_BATCH_BYTES,
+            load_batch_rows=settings.SQL_PRACTICE_SEED_LOAD_BATCH_ROWS,
+            metrics=self.metrics
+        )
+        
+        # 容器启动后等待MySQL就绪：跟随日志并以短间隔探测，容器退出时立即失败
+        self.readiness = MySQLReadiness(
+            self,
+            timeout=settings.SQL_PRACTICE_READY_TIMEOUT,
+            initial_delay=settings.SQL_PRACTICE_READY_INITIAL_DELAY,
+            max_delay=settings.SQL_PRACTICE_READY_MAX_DELAY,
+            metrics=self.metrics
+        )
         
-        # 确保初始化脚本存在
-        self._ensure_init_scripts()
+        # 查询时间上限、取消和每个用户的并发查询数
+        self.governor = QueryGovernor(
+            timeout=settings.SQL_PRACTICE_QUERY_TIMEOUT,
+            max_per_user=settings.SQL_PRACTICE_MAX_QUERIES_PER_USER,
+            metrics=self.metrics
+        )
+        self._background_tasks = []
+        
+        # 创建实例的准入控制，避免大量同时创建压垮主机
+        self.admission = AdmissionController(
+            max_in_flight=settings.SQL_PRACTICE_ADMISSION_MAX_IN_FLIGHT,
+            max_queue=settings.SQL_PRACTICE_ADMISSION_MAX_QUEUE,
+            host_capacity=self.placement.total_capacity if self.placement else settings.SQL_PRACTICE_HOST_CAPACITY,
+            host_load=self._host_container_count,
+            metrics=self.metrics
+        )
+        # 销毁实例：并行停止容器立即释放端口和内存，删除在后台完成
+        self.teardown = TeardownQueue(
+            self,
+            concurrency=settings.SQL_PRACTICE_TEARDOWN_CONCURRENCY,
+            force=settings.SQL_PRACTICE_TEARDOWN_FORCE,
+            deferred=settings.SQL_PRACTICE_TEARDOWN_DEFERRED,
+            metrics=self.metrics
+        )
+        # 创建和重置的后台作业
+        self.jobs = JobRunner(
+            concurrency=settings.SQL_PRACTICE_JOB_CONCURRENCY,
+            retention=settings.SQL_PRACTICE_JOB_RETENTION,
+            metrics=self.metrics
+        )
+        
+        # 实例状态以应用数据库为准，注册表和Docker标签只作为缓存
+        self.store = None
+        if settings.SQL_PRACTICE_INSTANCE_STORE:
+            self.store = PracticeInstanceStore(SessionLocal, metrics=self.metrics)
+        self._store_tasks = set()
+        
+        # 预热池容器使用的占位数据库，分配给用户时整体迁移到用户库
+        self.pool_database = "pool_template"
+        self.pool_container_prefix = "sql-pool-"
+        # 练习容器注册表，由Docker事件流保持最新，池容器分配后的归属信息也记录在其中
+        self.registry = ContainerRegistry(
+            self,
+            metrics=self.metrics,
+            on_change=self._on_container_change
+        )
+        self.pool = None
+        self._pool_ownership_restored = False
+        if settings.SQL_PRACTICE_POOL_ENABLED:
+            if not self.store:
+                raise ValueError("SQL_PRACTICE_POOL_ENABLED 需要启用 SQL_PRACTICE_INSTANCE_STORE，分配后的归属记录在实例存储中")
+            targets = {
+                difficulty: settings.SQL_PRACTICE_POOL_TARGETS.get(difficulty, settings.SQL_PRACTICE_POOL_SIZE)
+                for difficulty in ("easy", "medium", "hard")
+            }
+            self.pool = WarmPool(
+                self,
+                targets,
+                refill_concurrency=settings.SQL_PRACTICE_POOL_REFILL_CONCURRENCY,
+                check_interval=settings.SQL_PRACTICE_POOL_CHECK_INTERVAL,
+                metrics=self.metrics
+            )
+        
+        # 按 expires_at 回收过期实例，用户有活动时续租
+        self.reaper = None
+        if settings.SQL_PRACTICE_REAPER_ENABLED:
+            self.reaper = ExpiryReaper(
+                self,
+                self.container_expiry,
+                concurrency=settings.SQL_PRACTICE_REAPER_CONCURRENCY,
+                metrics=self.metrics
+            )
+        
+        # 空闲实例休眠，下次使用时自动恢复
+        self.hibernator = None
+        if settings.SQL_PRACTICE_HIBERNATE_ENABLED:
+            self.hibernator = IdleHibernator(
+                self,
+                idle_after=settings.SQL_PRACTICE_HIBERNATE_IDLE_AFTER,
+                mode=settings.SQL_PRACTICE_HIBERNATE_MODE,
+                check_interval=settings.SQL_PRACTICE_HIBERNATE_CHECK_INTERVAL,
+                metrics=self.metrics
+            )
         
-    async def _ensure_init_scripts(self):
+        # 容器资源限制
+        self.container_mem_limit = (
+            docker.utils.parse_bytes(settings.SQL_PRACTICE_CONTAINER_MEM_LIMIT)
+            if settings.SQL_PRACTICE_CONTAINER_MEM_LIMIT else 0
+        )
+        self.container_cpus = settings.SQL_PRACTICE_CONTAINER_CPUS
+        self.tmpfs_datadir = settings.SQL_PRACTICE_TMPFS_DATADIR
+        if self.tmpfs_datadir and self.hibernator and self.hibernator.mode == "stop":
+            raise ValueError("SQL_PRACTICE_TMPFS_DATADIR 不能与 stop 方式休眠同时使用，停止容器会丢失数据")
+        
+        # 内存预算：超出时按LRU回收空闲实例
+        self.evictor = None
+        if settings.SQL_PRACTICE_MEMORY_BUDGET:
+            self.evictor = MemoryEvictor(
+                self,
+                docker.utils.parse_bytes(settings.SQL_PRACTICE_MEMORY_BUDGET),
+                high_watermark=settings.SQL_PRACTICE_EVICTION_HIGH_WATERMARK,
+                low_watermark=settings.SQL_PRACTICE_EVICTION_LOW_WATERMARK,
+                min_idle=settings.SQL_PRACTICE_EVICTION_MIN_IDLE,
+                sample_interval=settings.SQL_PRACTICE_EVICTION_SAMPLE_INTERVAL,
+                metrics=self.metrics
+            )
+        
+        # 预烘焙镜像：初始化数据随镜像分发，容器启动后无需再执行初始化脚本
+        self.image_builder = None
+        if settings.SQL_PRACTICE_BAKED_IMAGES:
+            self.image_builder = PracticeImageBuilder(
+                self,
+                repository=settings.SQL_PRACTICE_IMAGE_REPOSITORY,
+                metrics=self.metrics
+            )
+        
+        # 共享MySQL后端：多个用户库共用少量长期运行的服务器
+        self.backend_mode = settings.SQL_PRACTICE_BACKEND
+        self.shared_backend = None
+        if settings.SQL_PRACTICE_SHARED_SERVERS:
+            self.shared_backend = SharedMySQLBackend(
+                self,
+                settings.SQL_PRACTICE_SHARED_SERVERS,
+                root_user=settings.SQL_PRACTICE_SHARED_ROOT_USER,
+                root_password=settings.SQL_PRACTICE_SHARED_ROOT_PASSWORD,
+                max_schemas_per_server=settings.SQL_PRACTICE_SHARED_MAX_SCHEMAS,
+                max_user_connections=settings.SQL_PRACTICE_SHARED_MAX_USER_CONNECTIONS
+            )
+        elif self.backend_mode == "shared":
+            raise ValueError("SQL_PRACTICE_BACKEND=shared 需要配置 SQL_PRACTICE_SHARED_SERVERS")
+        
+        # 内嵌SQLite后端：数据量很小的难度无需启动MySQL
+        self.embedded_backend = EmbeddedSQLiteBackend(
+            self,
+            data_dir=settings.SQL_PRACTICE_EMBEDDED_DATA_DIR,
+            max_instances=settings.SQL_PRACTICE_EMBEDDED_MAX_INSTANCES
+        )
+        
+        # 容器之外的后端，按实例ID前缀分派；各难度使用的后端可分别配置
+        self.backends = {self.embedded_backend.name: self.embedded_backend}
+        if self.shared_backend:
+            self.backends[self.shared_backend.name] = self.shared_backend
+        self.tier_backends = {
+            difficulty: settings.SQL_PRACTICE_TIER_BACKENDS.get(difficulty, self.backend_mode)
+            for difficulty in ("easy", "medium", "hard")
+        }
+        for difficulty, name in self.tier_backends.items():
+            if name != "container" and name not in self.backends:
+                raise ValueError(f"难度 {difficulty} 配置的后端 {name} 不可用")
+        
+        # 初始化脚本和验证脚本，首次读取时写入磁盘并缓存在内存中
+        self.scripts_dir = os.path.join(os.path.dirname(__file__), "../scripts/sql_practice")
+        self._init_scripts = {}
+        self._init_scripts_written = False
+        self._init_scripts_lock = threading.Lock()
+        # 大规模数据集（如 hard-1M）按需生成，CSV文件缓存在磁盘上
+        self.datasets = DatasetGenerator(
+            settings.SQL_PRACTICE_DATASET_DIR or os.path.join(self.scripts_dir, "datasets"),
+            seed=settings.SQL_PRACTICE_DATASET_SEED,
+            max_rows=settings.SQL_PRACTICE_DATASET_MAX_ROWS,
+            metrics=self.metrics
+        )
+        # 判题：预期结果指纹按数据集版本缓存到文件
+        self.grader = GradingEngine(
+            self,
+            settings.SQL_PRACTICE_GRADING_CACHE_PATH or os.path.join(self.scripts_dir, "grading_cache.json"),
+            metrics=self.metrics
+        )
+
+    @property
+    def docker_client(self):
+        """docker SDK 客户端（事件流和镜像构建），首次使用时连接守护进程"""
+        if self._docker_client is None:
+            self._docker_client = docker.from_env()
+        return self._docker_client
+
+    def _event_clients(self):
+        """订阅事件流的 docker SDK 客户端，主机名 -> 客户端"""
+        if self.placement:
+            return {name: host.docker_client for name, host in self.placement.hosts.items()}
+        return {"local": self.docker_client}
+
+    def _image_client(self, host=None):
+        """构建镜像所用的 docker SDK 客户端，镜像需要在容器所在的主机上"""
+        if self.placement:
+            return self.placement.hosts[host].docker_client
+        return self.docker_client
+
+    def _reserve_host(self):
+        """为新容器选择主机，创建期间计入主机负载；单主机时为None"""
+        return self.placement.reserve() if self.placement else nullcontext()
+        
+    def _ensure_init_scripts(self):
         """确保初始化脚本存在，如果不存在则创建"""
+        os.makedirs(self.scripts_dir, exist_ok=True)
         # 简单难度初始化脚本
         easy_script_path = os.path.join(self.scripts_dir, "init_easy.sql")
         if not os.path.exists(easy_script_path):
@@ -284,18 +572,196 @@ INSERT INTO time_records (employee_id, project_id, work_date, hours_worked, desc
         """获取对应难度的初始化脚本路径"""
         script_name = f"init_{difficulty}.sql"
         return os.path.join(self.scripts_dir, script_name)
-        
+
+    def _read_init_script(self, difficulty):
+        """读取对应难度的初始化脚本内容，进程内只读取一次磁盘"""
+        script = self._init_scripts.get(difficulty)
+        if script is not None:
+            return script
+        with self._init_scripts_lock:
+            if not self._init_scripts_written:
+                self._ensure_init_scripts()
+                self._init_scripts_written = True
+            if difficulty not in self._init_scripts:
+                with open(self._get_init_script_path(difficulty), 'r') as f:
+                    self._init_scripts[difficulty] = f.read()
+            return self._init_scripts[difficulty]
+
+    def _data_files(self, difficulty, rows=None):
+        """大表数据文件，返回 [(表名, 路径)]
+
+        固定数据放在 scripts/sql_practice/data/<难度>/<表名>.csv；
+        指定行数时追加对应的生成数据集，尚未生成时先生成，应在线程中调用。
+        """
+        files = []
+        data_dir = os.path.join(self.scripts_dir, "data", difficulty)
+        if os.path.isdir(data_dir):
+            files = [
+                (os.path.splitext(name)[0], os.path.join(data_dir, name))
+                for name in sorted(os.listdir(data_dir))
+                if name.endswith(".csv")
+            ]
+        if rows:
+            files += self.datasets.ensure(difficulty, rows)
+        return files
+
+    async def start(self):
+        """启动后台任务"""
+        for difficulty in ("easy", "medium", "hard"):
+            await asyncio.to_thread(self._read_init_script, difficulty)
+        await self.grader.start()
+        await self.registry.start()
+        await self.teardown.start()
+        self._pool_ownership_restored = await self._restore_pool_ownership()
+        await self._backfill_store()
+        if self.image_builder:
+            # 提前在每台主机上构建镜像，避免第一个用户承担构建耗时
+            for host in self.placement.hosts if self.placement else (None,):
+                for difficulty in ("easy", "medium", "hard"):
+                    try:
+                        await self.image_builder.ensure_image(difficulty, host)
+                    except Exception as e:
+                        print(f"Error building practice image ({difficulty}): {e}")
+        for backend in self.backends.values():
+            await backend.start()
+            if backend.embedded:
+                # 内嵌引擎的参考答案不依赖用户实例，启动时即在后台计算
+                for difficulty in ("easy", "medium", "hard"):
+                    await self.grader.precompute(difficulty, backend.compute_reference, engine="sqlite")
+        if self.pool:
+            await self.pool.start()
+        if self.reaper:
+            await self.reaper.start()
+        if self.hibernator:
+            await self.hibernator.start()
+        if self.evictor:
+            await self.evictor.start()
+        self._background_tasks.append(asyncio.create_task(self._evict_idle_connections()))
+        if self.placement:
+            self._background_tasks.append(asyncio.create_task(self._probe_hosts()))
+
+    async def stop(self):
+        """停止后台任务"""
+        await self.jobs.stop()
+        await self.grader.stop()
+        if self.evictor:
+            await self.evictor.stop()
+        if self.hibernator:
+            await self.hibernator.stop()
+        if self.reaper:
+            await self.reaper.stop()
+        if self.pool:
+            await self.pool.stop()
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks = []
+        await self.teardown.stop()
+        await self.registry.stop()
+        await self.docker.close()
+        for backend in self.backends.values():
+            await backend.stop()
+        if self.sessions:
+            await self._run_db(self.sessions.close_all)
+        await self._run_db(self.connections.close_all)
+        self._db_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _evict_idle_connections(self):
+        """定期关闭空闲过久的查询连接"""
+        interval = max(self.connections.idle_timeout / 2, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._run_db(self.connections.evict_idle)
+            except Exception as e:
+                print(f"Error evicting idle connections: {e}")
+
+    async def _probe_hosts(self):
+        """定期检查各Docker主机，连接恢复后主机重新参与放置"""
+        while True:
+            await asyncio.sleep(settings.SQL_PRACTICE_HOST_PROBE_INTERVAL)
+            unreachable = await self.docker.probe()
+            self.metrics.set_gauge("placement.unreachable_hosts", len(unreachable))
+
+    async def _run_db(self, func, *args, **kwargs):
+        """在数据库专用线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, functools.partial(func, *args, **kwargs))
+
+    def get_stats(self):
+        """获取服务运行指标"""
+        stats = self.metrics.snapshot()
+        stats["connections"] = self.connections.stats()
+        if self.sessions:
+            stats["sessions"] = self.sessions.stats()
+        stats["queries"] = self.governor.stats()
+        stats["jobs"] = self.jobs.stats()
+        stats["admission"] = self.admission.stats()
+        stats["teardown"] = self.teardown.stats()
+        if self.pool:
+            stats["pool"] = self.pool.stats()
+        if self.hibernator:
+            stats["hibernation"] = self.hibernator.stats()
+        if self.evictor:
+            stats["eviction"] = self.evictor.stats()
+        if self.placement:
+            stats["placement"] = self.placement.stats()
+        stats["backends"] = {name: backend.stats() for name, backend in self.backends.items()}
+        return stats
+
+    async def drain_host(self, host_name, draining=True):
+        """排空主机：不再放置新容器并回收其上的预热池容器，用户实例保留到删除或过期
+
+        draining 为 False 时恢复放置。返回主机当前状态，userContainers 为0时可以下线。
+        """
+        if not self.placement:
+            raise ValueError("未配置多台Docker主机")
+        if draining:
+            self.placement.drain(host_name)
+            if self.pool:
+                released = await self.pool.release_host(host_name)
+                print(f"Draining host {host_name}, released {released} pooled containers")
+        else:
+            self.placement.undrain(host_name)
+        return self.placement.stats()["hosts"][host_name]
+
+    def _backend_for(self, database_id):
+        """返回实例所属的非容器后端，容器实例返回None"""
+        for backend in self.backends.values():
+            if backend.owns(database_id):
+                return backend
+        return None
+
     async def get_user_database(self, user_id):
         """获取用户当前的数据库实例"""
         try:
-            containers = await asyncio.to_thread(
-                self.docker_client.containers.list,
-                all=True,
-                filters={"label": [f"user_id={user_id}"]}
-            )
-            
+            if self.store:
+                try:
+                    instance = await self._run_db(self.store.latest_for_user, user_id)
+                except Exception as e:
+                    # 应用数据库不可用时回退到注册表和Docker
+                    print(f"Error reading practice instance store: {e}")
+                else:
+                    if instance and instance["status"] == "evicted":
+                        return self._eviction_notice(instance)
+                    return await self._get_stored_instance(instance) if instance else None
+
+            # 没有实例存储可以确定后端时，才逐个询问各后端
+            db_info = await self._find_in_backends(user_id)
+            if db_info:
+                return db_info
+
+            if self.registry.synced:
+                records = self.registry.for_user(user_id)
+                if not records:
+                    return self.evictor.notice_for(user_id) if self.evictor else None
+                # 选择最新创建的容器
+                return self._format_record(max(records, key=lambda record: record["created"]))
+
+            containers = await self._list_user_containers(user_id)
+
             if not containers:
-                return None
+                return self.evictor.notice_for(user_id) if self.evictor else None
                 
             # 选择最新创建的容器
             containers.sort(key=lambda c: c.attrs['Created'], reverse=True)
@@ -306,8 +772,78 @@ INSERT INTO time_records (employee_id, project_id, work_date, hours_worked, desc
             print(f"Error getting user database: {e}")
             return None
             
-    async def create_database(self, user_id, username="default_user", difficulty="easy"):
-        """为用户创建新的数据库实例"""
+    def submit_create(self, user_id, username, difficulty="easy", rows=None, idempotency_key=None):
+        """以后台作业方式清理用户现有实例并创建新实例，返回 (作业, 是否新建)
+
+        排队已满时抛出 AdmissionRejected，不受理作业。
+        """
+        self.admission.check()
+        async def run():
+            report_progress("cleanup")
+            await self.cleanup_user_databases(user_id)
+            return await self.create_database(user_id, username, difficulty, rows)
+
+        return self.jobs.submit(
+            "create", user_id, run,
+            params={"username": username, "difficulty": difficulty, "rows": rows},
+            idempotency_key=idempotency_key
+        )
+
+    def submit_reset(self, user_id, database_id, difficulty="easy", idempotency_key=None):
+        """以后台作业方式重置实例，返回 (作业, 是否新建)"""
+        async def run():
+            await self.reset_database(database_id, difficulty)
+            return {"success": True, "message": "数据库已成功重置"}
+
+        return self.jobs.submit(
+            "reset", user_id, run,
+            key=("reset", database_id),
+            idempotency_key=idempotency_key
+        )
+
+    async def _find_in_backends(self, user_id):
+        """并行询问所有非容器后端，返回最新创建的实例；单个后端出错时记录并跳过"""
+        backends = list(self.backends.values())
+        results = await asyncio.gather(
+            *(backend.get_user_database(user_id) for backend in backends),
+            return_exceptions=True
+        )
+        found = []
+        for backend, result in zip(backends, results):
+            if isinstance(result, Exception):
+                print(f"Error getting user database from {backend.name} backend: {result}")
+            elif result:
+                found.append(result)
+        return max(found, key=lambda db_info: db_info["created"]) if found else None
+
+    async def _get_stored_instance(self, instance):
+        """按记录获取实例的最新信息，实例已不存在（如在Docker中被手动删除）时清理记录"""
+        try:
+            backend = self._backend_for(instance["id"])
+            if backend:
+                db_info = await backend.get_database_info(instance["id"])
+            else:
+                db_info = self._format_record(await self._get_record(instance["id"]))
+        except docker.errors.NotFound:
+            db_info = None
+        if db_info is None:
+            await self._store_call("delete", instance["id"])
+        return db_info
+
+    async def create_database(self, user_id, username="default_user", difficulty="easy", rows=None):
+        """为用户创建新的数据库实例，rows 指定大规模数据集的行数（如 hard-1M）"""
+        db_info = await self._create_database(user_id, username, difficulty, rows)
+        if self.evictor:
+            self.evictor.clear_notice(user_id)
+        backend = self._backend_for(db_info["id"])
+        await self._store_call("save", db_info, backend.name if backend else "container", rows)
+        if self._uses_sessions(db_info["id"]):
+            self.sessions.mark_pristine(db_info["id"])
+        if self.reaper and db_info.get("expiresAt"):
+            self.reaper.schedule(db_info["id"], db_info["expiresAt"])
+        return db_info
+
+    async def _create_database(self, user_id, username, difficulty, rows=None):
         try:
             # 清理用户名，确保可以作为数据库名称
             sanitized_username = self._sanitize_db_name(username)
@@ -318,40 +854,272 @@ INSERT INTO time_records (employee_id, project_id, work_date, hours_worked, desc
             
             # 设置容器过期时间
             expires_at = datetime.now() + self.container_expiry
-            
-            # 创建容器
-            container = await asyncio.to_thread(
-                self.docker_client.containers.run,
-                self.mysql_image,
-                name=container_name,
-                detach=True,
-                environment={
-                    "MYSQL_ROOT_PASSWORD": self.mysql_root_password,
-                    "MYSQL_DATABASE": db_name,  # 使用用户名创建数据库
-                    "MYSQL_USER": self.mysql_user,
-                    "MYSQL_PASSWORD": self.mysql_password
-                },
-                ports={'3306/tcp': None},  # 自动分配端口
-                labels={
-                    "user_id": str(user_id),
-                    "username": username,
-                    "db_name": db_name,
-                    "expires_at": expires_at.isoformat(),
-                    "difficulty": difficulty
-                }
-            )
-            
-            # 等待MySQL启动
-            await self._wait_for_mysql(container, db_name)
-            
-            # 初始化数据库
-            await self._initialize_database(container, difficulty, db_name)
-            
-            return await self._format_container_info(container)
+
+            backend_name = self.tier_backends.get(difficulty, self.backend_mode)
+            if backend_name != "container":
+                if rows:
+                    raise ValueError("大规模数据集只支持容器后端")
+                backend = self.backends[backend_name]
+                if backend.embedded:
+                    return await backend.create_database(user_id, username, db_name, difficulty, expires_at)
+                # 共享服务器上建库和导入数据同样占用资源，但不新增容器
+                async with self.admission.admit(user_id, containers=False):
+                    return await backend.create_database(user_id, username, db_name, difficulty, expires_at)
+
+            labels = {
+                "user_id": str(user_id),
+                "username": username,
+                "db_name": db_name,
+                "expires_at": expires_at.isoformat(),
+                "difficulty": difficulty
+            }
+            if rows:
+                labels["dataset_rows"] = str(rows)
+
+            # 优先从预热池中分配已初始化好的容器
+            if self.pool:
+                container = await self.pool.acquire(difficulty)
+                if container:
+                    report_progress("claiming_pooled_container")
+                    try:
+                        await self._claim_pooled_container(container, container_name, labels)
+                        if rows:
+                            await self._load_dataset(container, db_name, difficulty, rows)
+                        return await self._format_container_info(container)
+                    except Exception as e:
+                        print(f"Error claiming pooled container: {e}")
+                        await self._discard_container(container)
+
+            # 新建容器需要排队，同时进行的创建数和主机上的容器数都有上限
+            async with self.admission.admit(user_id):
+                if self.evictor and not await self.evictor.make_room():
+                    print("Memory budget exhausted, creating container anyway")
+                return await self._provision_container(container_name, db_name, labels, difficulty, rows)
         except Exception as e:
             print(f"Error creating database: {e}")
             raise
-    
+
+    async def _provision_container(self, container_name, db_name, labels, difficulty, rows=None):
+        """新建容器并导入数据"""
+        # 使用预烘焙镜像时，数据已在镜像内的默认库中，只需迁移到用户库
+        if self.image_builder:
+            report_progress("starting_container")
+            with self._reserve_host() as host:
+                image = await self.image_builder.ensure_image(difficulty, host)
+                container = await self._run_container(container_name, db_name, labels, image=image, host=host)
+            report_progress("waiting_for_mysql")
+            await self._wait_for_mysql(container, self.mysql_database)
+            await self._move_database(container, self.mysql_database, db_name)
+            if rows:
+                await self._load_dataset(container, db_name, difficulty, rows)
+            return await self._format_container_info(container)
+
+        # 创建容器
+        report_progress("starting_container")
+        with self._reserve_host() as host:
+            container = await self._run_container(container_name, db_name, labels, host=host)
+        
+        # 等待MySQL启动
+        report_progress("waiting_for_mysql")
+        await self._wait_for_mysql(container, db_name)
+        
+        # 初始化数据库
+        report_progress("seeding")
+        await self._initialize_database(container, difficulty, db_name, rows)
+        
+        return await self._format_container_info(container)
+
+    def _host_container_count(self):
+        """主机上占用资源的练习容器数（运行中或暂停，含预热池）；多主机时为总负载"""
+        if self.placement:
+            return self.placement.admission_load()
+        return sum(1 for record in self.registry.all() if record["status"] in ("running", "paused", "created"))
+
+    async def _run_container(self, container_name, db_name, labels, image=None, host=None):
+        """启动一个新的MySQL容器，多主机时 host 为选定的主机"""
+        kwargs = {"host": host} if self.placement else {}
+        return await self.docker.run(
+            image or self.mysql_image,
+            **kwargs,
+            name=container_name,
+            environment={
+                "MYSQL_ROOT_PASSWORD": self.mysql_root_password,
+                "MYSQL_DATABASE": db_name,  # 使用用户名创建数据库
+                "MYSQL_USER": self.mysql_user,
+                "MYSQL_PASSWORD": self.mysql_password
+            },
+            ports={'3306/tcp': None},  # 自动分配端口
+            labels={"sql_practice": "true", **labels},
+            healthcheck=HEALTHCHECK,
+            host_config=self._host_config(image)
+        )
+
+    def _host_config(self, image=None):
+        """容器的内存、CPU限制和tmpfs数据目录"""
+        host_config = {}
+        if self.container_mem_limit:
+            host_config["Memory"] = self.container_mem_limit
+            # 不使用swap，内存占用可预测
+            host_config["MemorySwap"] = self.container_mem_limit
+        if self.container_cpus:
+            host_config["NanoCpus"] = int(self.container_cpus * 1e9)
+        if self.tmpfs_datadir and not image:
+            # 预烘焙镜像的数据在镜像层中，不能挂载到tmpfs
+            host_config["Tmpfs"] = {"/var/lib/mysql": f"rw,size={settings.SQL_PRACTICE_TMPFS_SIZE}"}
+        return host_config
+
+    async def _create_pool_container(self, difficulty):
+        """创建并初始化一个预热池容器"""
+        container_name = f"{self.pool_container_prefix}{difficulty}-{uuid.uuid4().hex[:8]}"
+        image = None
+        source_db = self.pool_database
+        with self._reserve_host() as host:
+            if self.image_builder:
+                image = await self.image_builder.ensure_image(difficulty, host)
+                source_db = self.mysql_database
+
+            container = await self._run_container(container_name, source_db, {
+                "pool": difficulty,
+                "db_name": source_db,
+                "difficulty": difficulty
+            }, image=image, host=host)
+        try:
+            await self._wait_for_mysql(container, source_db)
+            if not image:
+                await self._initialize_database(container, difficulty, source_db)
+        except Exception:
+            await self._discard_container(container)
+            raise
+        return container
+
+    async def _list_pool_containers(self):
+        """列出所有预热池容器（包括已分配的）"""
+        return await self.docker.list(all=True, filters={"label": ["pool"]})
+
+    async def _restore_pool_ownership(self):
+        """重启后从实例存储恢复已分配池容器的归属信息（改名后标签中没有用户信息），返回是否恢复成功"""
+        if not self.store:
+            return False
+        try:
+            containers = await self._list_pool_containers()
+        except Exception as e:
+            print(f"Error listing pooled containers: {e}")
+            return False
+        claimed = [c for c in containers if not c.name.startswith(self.pool_container_prefix)]
+        if not claimed:
+            return True
+        rows = await self._store_call("get_many", [container.id for container in claimed])
+        if rows is None:
+            return False
+        for container in claimed:
+            row = rows.get(container.id)
+            if row:
+                self.registry.assign(container.id, self._owner_labels(row))
+        return True
+
+    def _owner_labels(self, row):
+        """实例存储中的记录转换为与分配时相同的归属标签"""
+        labels = {
+            "user_id": str(row["user_id"]),
+            "username": row["username"],
+            "db_name": row["db_name"],
+            "difficulty": row["difficulty"],
+        }
+        if row["expires_at"]:
+            labels["expires_at"] = row["expires_at"].isoformat()
+        if row["dataset_rows"]:
+            labels["dataset_rows"] = str(row["dataset_rows"])
+        return labels
+
+    async def _claim_pooled_container(self, container, container_name, labels):
+        """将池中容器分配给用户：把预置数据迁移到用户库并记录归属"""
+        source_db = container.labels.get("db_name", self.pool_database)
+        await self._move_database(container, source_db, labels["db_name"])
+
+        # 标签不可修改：改名后记录归属信息，名称与普通实例保持一致
+        await self.docker.rename(container.id, container_name)
+        self.registry.assign(container.id, labels)
+
+    async def _move_database(self, container, source_db, db_name):
+        """将已初始化的库整体迁移为用户库，并授权给练习账号"""
+        await self._run_db(
+            self._move_database_sync, self._get_mysql_host(container.id), self._get_port(container), source_db, db_name
+        )
+
+    def _move_database_sync(self, host, port, source_db, db_name):
+        conn = mysql.connector.connect(
+            host=host,
+            port=port,
+            user='root',
+            password=self.mysql_root_password,
+            database=source_db
+        )
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SHOW TABLES")
+            tables = [row[0] for row in cursor.fetchall()]
+
+            # RENAME TABLE 只修改元数据，与数据量无关
+            cursor.execute(f"CREATE DATABASE `{db_name}`")
+            if tables:
+                renames = ", ".join(
+                    f"`{source_db}`.`{table}` TO `{db_name}`.`{table}`" for table in tables
+                )
+                cursor.execute(f"RENAME TABLE {renames}")
+            cursor.execute(f"GRANT ALL PRIVILEGES ON `{db_name}`.* TO '{self.mysql_user}'@'%'")
+            cursor.execute(f"DROP DATABASE `{source_db}`")
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def _discard_container(self, container):
+        """强制删除容器，忽略错误"""
+        self.registry.remove(container.id)
+        try:
+            await self._remove_container(container.id, force=True, v=True)
+        except Exception as e:
+            print(f"Error discarding container: {e}")
+
+    async def _list_user_containers(self, user_id):
+        """列出属于用户的所有容器，包括从预热池分配的容器"""
+        containers = await self.docker.list(all=True, filters={"label": [f"user_id={user_id}"]})
+
+        # 正在销毁的容器仍带有 user_id 标签
+        containers = [container for container in containers if not container.name.startswith(TEARDOWN_PREFIX)]
+        known_ids = {container.id for container in containers}
+        for container_id in self.registry.assigned_to(user_id):
+            if container_id in known_ids:
+                continue
+            try:
+                containers.append(await self.docker.get(container_id))
+            except docker.errors.NotFound:
+                self.registry.remove(container_id)
+        return containers
+
+    def _get_labels(self, container):
+        """获取容器标签，合并分配时记录的归属信息"""
+        return self.registry.effective_labels(container.id, container.labels)
+
+    async def _stop_container(self, container_id, timeout=None):
+        """按ID停止容器"""
+        await self.docker.stop(container_id, timeout=timeout)
+
+    async def _remove_container(self, container_id, force=False, v=False):
+        """按ID删除容器，v 为 True 时同时删除匿名数据卷"""
+        await self.docker.remove(container_id, force=force, v=v)
+
+    async def _reload(self, container):
+        """刷新容器状态，返回新的容器对象"""
+        return await self.docker.get(container.id)
+
+    def _get_port(self, container):
+        """获取容器映射到主机的MySQL端口"""
+        return container.attrs['NetworkSettings']['Ports']['3306/tcp'][0]['HostPort']
+
+    def _get_mysql_host(self, container_id):
+        """容器映射端口所在的地址，多主机时为容器所在主机的地址"""
+        return self.placement.address_for(container_id) if self.placement else 'localhost'
+
     # 辅助方法：清理用户名，使其可作为数据库名称
     def _sanitize_db_name(self, username):
         # 移除非法字符，只保留字母、数字和下划线
@@ -362,78 +1130,99 @@ INSERT INTO time_records (employee_id, project_id, work_date, hours_worked, desc
         # 数据库名称长度限制
         return sanitized[:32]
         
-    async def _wait_for_mysql(self, container, db_name, max_retries=20):
-        """等待MySQL服务启动"""
-        container_info = await asyncio.to_thread(container.reload)
-        port = container_info.attrs['NetworkSettings']['Ports']['3306/tcp'][0]['HostPort']
-        
-        retries = 0
-        while retries < max_retries:
-            try:
-                # 尝试连接MySQL
-                conn = mysql.connector.connect(
-                    host='localhost',
-                    port=port,
-                    user='root',
-                    password=self.mysql_root_password,
-                    database=db_name,  # 使用创建的数据库名
-                    connection_timeout=2
-                )
-                conn.close()
-                return True  # 连接成功
-            except Exception:
-                # 连接失败，等待后重试
-                await asyncio.sleep(1)
-                retries += 1
-        
-        # 超出重试次数
-        raise Exception("MySQL服务启动超时")
+    async def _wait_for_mysql(self, container, db_name):
+        """等待MySQL服务启动，容器退出或超时时抛出异常"""
+        elapsed = await self.readiness.wait(container, db_name)
+        report_progress("mysql_ready", f"{elapsed:.0f}ms")
+        return True
+
+    def _ping_mysql(self, host, port, db_name):
+        conn = mysql.connector.connect(
+            host=host,
+            port=port,
+            user='root',
+            password=self.mysql_root_password,
+            database=db_name,  # 使用创建的数据库名
+            connection_timeout=2
+        )
+        conn.close()
             
-    async def _initialize_database(self, container, difficulty, db_name=None):
-        """使用初始化脚本初始化数据库"""
+    async def _initialize_database(self, container, difficulty, db_name=None, rows=None):
+        """使用初始化脚本初始化数据库，rows 不为空时同时导入生成的数据集"""
         try:
-            container_info = await asyncio.to_thread(container.reload)
-            port = container_info.attrs['NetworkSettings']['Ports']['3306/tcp'][0]['HostPort']
+            container = await self._reload(container)
+            port = self._get_port(container)
             
             # 如果没有提供数据库名，使用默认值
             database = db_name or self.mysql_database
             
-            # 读取初始化脚本
-            script_path = self._get_init_script_path(difficulty)
-            with open(script_path, 'r') as f:
-                init_script = f.read()
-            
-            # 连接MySQL并执行初始化脚本
-            conn = mysql.connector.connect(
-                host='localhost',
+            return await self._run_init_script(
+                host=self._get_mysql_host(container.id),
                 port=port,
                 user='root',
                 password=self.mysql_root_password,
-                database=database
+                database=database,
+                difficulty=difficulty,
+                enable_local_infile=True,
+                rows=rows
             )
-            cursor = conn.cursor()
-            
-            # 支持多语句执行
-            for statement in init_script.split(';'):
-                if statement.strip():
-                    cursor.execute(statement)
-                    
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return True
         except Exception as e:
             print(f"Error initializing database: {e}")
             raise
+
+    async def _load_dataset(self, container, db_name, difficulty, rows):
+        """在已有示例数据的库中追加导入生成的数据集（池容器和预烘焙镜像只包含示例数据）"""
+        report_progress("loading_dataset")
+        container = await self._reload(container)
+        data_files = await asyncio.to_thread(self.datasets.ensure, difficulty, rows)
+        return await self._run_db(
+            self._run_init_script_sync, self._get_mysql_host(container.id), self._get_port(container), 'root',
+            self.mysql_root_password, db_name, "", data_files, True
+        )
+
+    async def _run_init_script(self, host, port, user, password, database, difficulty,
+                               enable_local_infile=False, rows=None):
+        """连接指定MySQL并执行对应难度的初始化脚本，返回各阶段耗时
+
+        enable_local_infile 只用于独占的容器，共享服务器保持原有配置。
+        """
+        # 读取初始化脚本
+        init_script = self._read_init_script(difficulty)
+        # 数据集可能需要先生成，不占用数据库线程池
+        data_files = await asyncio.to_thread(self._data_files, difficulty, rows)
+        
+        return await self._run_db(
+            self._run_init_script_sync, host, port, user, password, database, init_script,
+            data_files, enable_local_infile
+        )
+
+    def _run_init_script_sync(self, host, port, user, password, database, init_script,
+                              data_files=None, enable_local_infile=False):
+        conn_params = {
+            "host": host,
+            "port": port,
+            "user": user,
+            "password": password,
+            "database": database
+        }
+        return self.seeder.seed(conn_params, init_script, data_files, enable_local_infile)
             
     async def get_database_info(self, database_id):
         """获取数据库容器信息"""
         try:
-            container = await asyncio.to_thread(
-                self.docker_client.containers.get,
-                database_id
-            )
+            backend = self._backend_for(database_id)
+            if backend:
+                return await backend.get_database_info(database_id)
+
+            if self.hibernator:
+                # 查看实例信息视为即将使用，休眠的容器先恢复
+                return self._format_record(await self._get_running_record(database_id))
+
+            record = self.registry.get(database_id) if self.registry.synced else None
+            if record:
+                return self._format_record(record)
+
+            container = await self.docker.get(database_id)
             return await self._format_container_info(container)
         except Exception as e:
             print(f"Error getting database info: {e}")
@@ -442,143 +1231,658 @@ INSERT INTO time_records (employee_id, project_id, work_date, hours_worked, desc
     async def reset_database(self, database_id, difficulty="easy"):
         """重置数据库到初始状态"""
         try:
-            container = await asyncio.to_thread(
-                self.docker_client.containers.get,
-                database_id
-            )
-            
-            # 确保容器正在运行
-            if container.status != 'running':
-                await asyncio.to_thread(container.start)
-                await self._wait_for_mysql(container)
-                
-            # 重新初始化数据库
-            await self._initialize_database(container, difficulty)
+            await self._wake(database_id)
+            # 会话模式下回滚会话事务即可；执行过DDL时回退到重新导入数据
+            if self._uses_sessions(database_id):
+                if await self._run_db(self.sessions.reset, database_id):
+                    return True
+                # 会话持有元数据锁，重建数据库前先结束会话
+                await self._run_db(self.sessions.close, database_id)
+
+            report_progress("reseeding")
+            backend = self._backend_for(database_id)
+            if backend:
+                await backend.reset_database(database_id, difficulty)
+            else:
+                await self._reseed_container(database_id, difficulty)
             
+            if self._uses_sessions(database_id):
+                self.sessions.mark_pristine(database_id)
+            if self.metrics:
+                self.metrics.incr("reset.reseeded")
             return True
         except Exception as e:
             print(f"Error resetting database: {e}")
             raise
+
+    async def _reseed_container(self, database_id, difficulty):
+        """删除并重建容器中的用户库，再执行初始化脚本"""
+        record = await self._get_record(database_id)
+        db_name = record["labels"].get("db_name", self.mysql_database)
+        difficulty = record["labels"].get("difficulty", difficulty)
+        rows = self._dataset_rows(record)
+        container = await self.docker.get(record["id"])
+        
+        # 确保容器正在运行
+        if container.status != 'running':
+            await self.docker.start(container.id)
+            await self._wait_for_mysql(container, db_name)
+        
+        container = await self._reload(container)
+        await self._run_db(self._close_query_connections, database_id)
+        await self._run_db(
+            self._recreate_database_sync, self._get_mysql_host(container.id), self._get_port(container), db_name
+        )
+        
+        # 重新初始化数据库
+        await self._initialize_database(container, difficulty, db_name, rows)
+
+    def _recreate_database_sync(self, host, port, db_name):
+        conn = mysql.connector.connect(
+            host=host,
+            port=port,
+            user='root',
+            password=self.mysql_root_password
+        )
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
+            cursor.execute(f"CREATE DATABASE `{db_name}`")
+            cursor.execute(f"GRANT ALL PRIVILEGES ON `{db_name}`.* TO '{self.mysql_user}'@'%'")
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def undo_last_statement(self, database_id):
+        """撤销上一条成功执行的写语句，没有可撤销的语句时返回False"""
+        if not self._uses_sessions(database_id):
+            raise Exception("当前实例未启用练习会话模式，无法撤销")
+        await self._wake(database_id)
+        return await self._run_db(self.sessions.undo, database_id)
+
+    async def _wake(self, database_id):
+        """直接操作会话连接或容器之前，确保休眠的容器已恢复"""
+        if self.hibernator and self._backend_for(database_id) is None:
+            await self._get_running_record(database_id)
+
+    def _has_uncommitted_session(self, database_id):
+        return self._uses_sessions(database_id) and self.sessions.has_uncommitted(database_id)
+
+    def _uses_sessions(self, database_id):
+        """会话模式只用于MySQL实例，内嵌实例的重置本身就很快"""
+        if not self.sessions:
+            return False
+        backend = self._backend_for(database_id)
+        return backend is None or not backend.embedded
+
+    def _close_query_connections(self, database_id):
+        """关闭实例的查询连接和会话"""
+        self.connections.close(database_id)
+        if self.sessions:
+            self.sessions.close(database_id)
             
-    async def execute_query(self, database_id, sql, question_id=None, difficulty=None):
+    async def execute_query(self, database_id, sql, question_id=None, difficulty=None, user_id=None):
         """执行SQL查询"""
         try:
-            container = await asyncio.to_thread(
-                self.docker_client.containers.get,
-                database_id
-            )
-            
-            # 确保容器正在运行
-            if container.status != 'running':
-                raise Exception("数据库实例未运行")
-                
-            # 获取端口
-            port = container.attrs['NetworkSettings']['Ports']['3306/tcp'][0]['HostPort']
+            backend = self._backend_for(database_id)
+            embedded = backend is not None and backend.embedded
+            # 连接数据库（内嵌后端在进程内执行，无需连接）
+            conn_params = None if embedded else await self._get_connection_params(database_id)
             
-            # 获取数据库名称
-            db_name = container.labels.get('db_name', self.mysql_database)
-            
-            # 连接数据库
-            conn = mysql.connector.connect(
-                host='localhost',
-                port=port,
-                user=self.mysql_user,
-                password=self.mysql_password,
-                database=db_name  # 使用容器标签中的数据库名
-            )
-            
-            cursor = conn.cursor(dictionary=True)
-            
-            # 执行查询，并测量执行时间
-            start_time = datetime.now()
-            cursor.execute(sql)
-            end_time = datetime.now()
+            # 提供了问题ID和难度时，读取结果的同时计算指纹用于判题
+            spec = self.grader.question(difficulty, question_id) if question_id and difficulty else None
+            fingerprint = self.grader.fingerprint(spec) if spec else None
             
-            # 如果是SELECT查询，获取结果
-            results = None
-            affected_rows = 0
+            async with self.governor.slot(user_id):
+                query = self.governor.begin(database_id, conn_params)
+                try:
+                    if embedded:
+                        outcome = await self._run_db(
+                            backend.execute_sync, database_id, sql, query, fingerprint,
+                            settings.SQL_PRACTICE_MAX_RESULT_ROWS, settings.SQL_PRACTICE_MAX_RESULT_BYTES
+                        )
+                    else:
+                        outcome = await self._run_db(
+                            self._execute_query_sync, database_id, conn_params, sql, query, fingerprint
+                        )
+                finally:
+                    self.governor.end(query)
+            results = outcome["results"]
+            await self._touch(database_id)
             
-            if cursor.description:  # SELECT查询
-                results = cursor.fetchall()
-            else:  # INSERT, UPDATE, DELETE等
-                affected_rows = cursor.rowcount
-                conn.commit()
-            
-            execution_time = (end_time - start_time).total_seconds() * 1000  # 毫秒
-            
-            # 检查查询是否正确（如果提供了问题ID和难度）
+            # 检查查询是否正确：与参考答案在原始数据集上的结果指纹比较
             is_correct = False
-            if question_id and difficulty:
-                # 这里可以实现与预期查询结果的比较
-                # 简单的实现：根据行数和列数检查
-                expected_result = await self._get_expected_result(difficulty, question_id)
-                if expected_result and results:
-                    # 简单检查：行数一致且关键列存在
-                    is_correct = (len(results) == len(expected_result))
-                    if is_correct and len(results) > 0:
-                        for key in expected_result[0].keys():
-                            if key not in results[0]:
-                                is_correct = False
-                                break
-            
-            cursor.close()
-            conn.close()
+            grading_pending = False
+            if fingerprint and fingerprint.columns is not None:
+                try:
+                    expected = await self._expected_fingerprint(database_id, difficulty, question_id)
+                    is_correct = fingerprint.matches(expected)
+                except GradingPending:
+                    # 预期结果在后台计算，本次不判题
+                    grading_pending = True
+                except Exception as e:
+                    print(f"Error computing expected result: {e}")
             
             # 返回结果
             return {
                 "results": results or [],
-                "executionTime": int(execution_time),
-                "affectedRows": affected_rows,
-                "isCorrect": is_correct
+                "executionTime": int(outcome["execution_time"]),
+                "affectedRows": outcome["affected_rows"],
+                "isCorrect": is_correct,
+                "gradingPending": grading_pending,
+                "rowCount": len(results or []),
+                "truncated": outcome["truncated"],
+                "totalRowsHint": outcome["total_rows_hint"]
             }
         except Exception as e:
             print(f"Error executing query: {e}")
             raise
+
+    def _execute_query_sync(self, database_id, conn_params, sql, query, fingerprint=None):
+        """在数据库线程池中执行查询，结果按行数和字节数上限截断
+
+        需要判题时读完全部结果计算指纹，超出上限的行只参与指纹计算，不保留在内存中。
+        """
+        limiter = ResultLimiter(settings.SQL_PRACTICE_MAX_RESULT_ROWS, settings.SQL_PRACTICE_MAX_RESULT_BYTES)
+        with self.query_connections.connection(database_id, conn_params) as conn:
+            try:
+                self.governor.attach(query, conn)
+                self._begin_statement(conn, sql)
+                # 非缓冲游标：结果边读边处理，超出上限后不再读取剩余行
+                cursor = conn.cursor(dictionary=True)
+                
+                # 执行查询，并测量执行时间
+                start_time = datetime.now()
+                cursor.execute(sql)
+                end_time = datetime.now()
+                
+                # 如果是SELECT查询，获取结果
+                results = None
+                affected_rows = 0
+                
+                exhausted = True
+                if cursor.description:  # SELECT查询
+                    results = []
+                    if fingerprint:
+                        fingerprint.set_columns(cursor.column_names)
+                    exhausted = False
+                    while fingerprint or not limiter.truncated:
+                        chunk = cursor.fetchmany(settings.SQL_PRACTICE_STREAM_CHUNK_ROWS)
+                        if not chunk:
+                            exhausted = True
+                            break
+                        for row in chunk:
+                            if fingerprint:
+                                fingerprint.update(row)
+                            if not limiter.truncated and limiter.accept(len(encode_line(row))):
+                                results.append(row)
+                else:  # INSERT, UPDATE, DELETE等
+                    affected_rows = cursor.rowcount
+                    self._commit(conn)
+                self._end_statement(conn, True)
+            except Exception as e:
+                self._end_statement(conn, False, e)
+                self._raise_query_error(query, conn, e)
+            finally:
+                self.governor.detach(query)
             
-    async def _get_expected_result(self, difficulty, question_id):
-        """获取预期的查询结果"""
-        # 这里可以从文件或者直接从代码中获取预期结果
-        # 简单实现：根据难度和问题ID返回预定义的结果
-        expected_results = {
-            "easy": {
-                1: [
-                    {"id": 1, "name": "张三", "email": "zhang@example.com"},
-                    {"id": 2, "name": "李四", "email": "li@example.com"},
-                    {"id": 3, "name": "王五", "email": "wang@example.com"}
-                ],
-                2: [
-                    {"id": 2, "name": "李四", "email": "li@example.com", "age": 28, "created_at": "2023-01-15 10:30:00"},
-                    {"id": 3, "name": "王五", "email": "wang@example.com", "age": 32, "created_at": "2023-02-20 14:45:00"}
-                ]
-            },
-            "medium": {
-                1: [
-                    {"id": 1, "name": "张三", "total_amount": 300.50},
-                    {"id": 2, "name": "李四", "total_amount": 150.75},
-                    {"id": 3, "name": "王五", "total_amount": 420.00}
-                ]
-            },
-            "hard": {
-                1: [
-                    {"id": 1, "name": "张三", "order_id": 1, "amount": 200.50},
-                    {"id": 3, "name": "王五", "order_id": 5, "amount": 320.00}
-                ]
-            }
+            if not exhausted:
+                # 剩余结果未读完，连接不能再复用
+                self.query_connections.discard(conn)
+            else:
+                cursor.close()
+            execution_time = (end_time - start_time).total_seconds() * 1000  # 毫秒
+
+        total_rows_hint = len(results) if results is not None else None
+        if fingerprint and exhausted and results is not None:
+            total_rows_hint = fingerprint.rows
+        elif limiter.truncated:
+            total_rows_hint = self._estimate_total_rows_sync(database_id, conn_params, sql)
+        return {
+            "results": results,
+            "affected_rows": affected_rows,
+            "execution_time": execution_time,
+            "truncated": limiter.truncated,
+            "total_rows_hint": total_rows_hint
         }
-        
-        return expected_results.get(difficulty, {}).get(int(question_id), [])
+
+    async def execute_script(self, database_id, sql, transaction=False, user_id=None):
+        """在一条连接上依次执行脚本中的多条语句，返回每条语句的结果、影响行数和耗时
+
+        遇到第一个错误即停止，之后的语句不执行。transaction 为 True 时整个脚本在一个事务中，
+        失败时回滚已执行的语句。脚本作为一次查询计入并发数和时间上限。
+        """
+        try:
+            statements = parse_script(sql, settings.SQL_PRACTICE_SCRIPT_MAX_STATEMENTS, transaction)
+            backend = self._backend_for(database_id)
+            embedded = backend is not None and backend.embedded
+            sessions = self._uses_sessions(database_id)
+            if sessions:
+                # 会话模式不允许的语句在执行前拒绝，避免脚本执行到一半
+                for statement in statements:
+                    self.sessions.check_statement(statement)
+            conn_params = None if embedded else await self._get_connection_params(database_id)
+
+            async with self.governor.slot(user_id):
+                query = self.governor.begin(database_id, conn_params)
+                try:
+                    if embedded:
+                        script = await self._run_db(
+                            backend.execute_script_sync, database_id, statements, query, transaction,
+                            settings.SQL_PRACTICE_MAX_RESULT_ROWS, settings.SQL_PRACTICE_MAX_RESULT_BYTES
+                        )
+                    else:
+                        script = await self._run_db(
+                            self._execute_script_sync, database_id, conn_params, statements, query, transaction
+                        )
+                finally:
+                    self.governor.end(query)
+
+            if transaction and script.failed and sessions:
+                # 会话事务不能整体回滚，逐条撤销本次脚本中成功的写语句
+                for _ in range(script.writes):
+                    if not await self._run_db(self.sessions.undo, database_id):
+                        break
+                script.rolled_back = True
+            await self._touch(database_id)
+            if self.metrics:
+                self.metrics.incr("script.executed")
+                self.metrics.incr("script.statements", len(script.entries))
+                if script.failed:
+                    self.metrics.incr("script.failed")
+            return script.to_dict()
+        except Exception as e:
+            print(f"Error executing script: {e}")
+            raise
+
+    def _execute_script_sync(self, database_id, conn_params, statements, query, transaction=False):
+        """在数据库线程池中依次执行语句，所有语句的结果共用行数和字节数上限"""
+        script = ScriptResult(statements, transaction)
+        limiter = ResultLimiter(settings.SQL_PRACTICE_MAX_RESULT_ROWS, settings.SQL_PRACTICE_MAX_RESULT_BYTES)
+        with self.query_connections.connection(database_id, conn_params) as conn:
+            session = self.sessions is not None and self.sessions.owns(conn)
+            self.governor.attach(query, conn)
+            try:
+                for statement in statements:
+                    start_time = time.perf_counter()
+                    try:
+                        self._begin_statement(conn, statement)
+                        cursor = conn.cursor(dictionary=True)
+                        cursor.execute(statement)
+                        results = None
+                        columns = None
+                        row_count = 0
+                        affected_rows = 0
+                        if cursor.description:
+                            columns = list(cursor.column_names)
+                            results = []
+                            # 超出上限的行也要读完，连接才能继续执行后面的语句
+                            for chunk in iter(lambda: cursor.fetchmany(settings.SQL_PRACTICE_STREAM_CHUNK_ROWS), []):
+                                for row in chunk:
+                                    row_count += 1
+                                    if not limiter.truncated and limiter.accept(len(encode_line(row))):
+                                        results.append(row)
+                        else:
+                            affected_rows = cursor.rowcount
+                            if not transaction:
+                                self._commit(conn)
+                        cursor.close()
+                        self._end_statement(conn, True)
+                    except Exception as e:
+                        self._end_statement(conn, False, e)
+                        if self.governor.translate(query, e) is not e:
+                            # 超时或取消：连接被丢弃，未提交的事务随之回滚
+                            self._raise_query_error(query, conn, e)
+                        script.error(e, (time.perf_counter() - start_time) * 1000)
+                        break
+                    script.ok(results, columns, row_count, affected_rows, (time.perf_counter() - start_time) * 1000)
+
+                if transaction and not session:
+                    if script.failed:
+                        conn.rollback()
+                        script.rolled_back = True
+                    else:
+                        conn.commit()
+            finally:
+                self.governor.detach(query)
+        return script
+
+    async def _expected_fingerprint(self, database_id, difficulty, question_id):
+        """在与实例相同的引擎上计算参考答案的指纹"""
+        backend = self._backend_for(database_id)
+        if backend is not None and backend.embedded:
+            return await self.grader.expected(difficulty, question_id, backend.compute_reference, engine="sqlite")
+        admin_params = await self._get_admin_params(database_id)
+        # 大规模数据集上的预期结果与示例数据不同，按数据集分别计算和缓存
+        rows = None if backend is not None else self._dataset_rows(await self._get_record(database_id))
+        variant = None
+        if rows:
+            variant = f"{format_size(rows)}-s{self.datasets.seed}-g{GENERATOR_VERSION}"
+        return await self.grader.expected(
+            difficulty, question_id, functools.partial(self.grader.compute_mysql, admin_params, rows=rows),
+            variant=variant, rows=rows
+        )
+
+    def _raise_query_error(self, query, conn, error):
+        """被中断的查询转换为超时/取消异常，连接中可能残留未读结果，直接丢弃"""
+        translated = self.governor.translate(query, error)
+        if translated is error:
+            raise error
+        self.query_connections.discard(conn)
+        raise translated from error
+
+    def _begin_statement(self, conn, sql):
+        if self.sessions:
+            self.sessions.begin_statement(conn, sql)
+
+    def _end_statement(self, conn, ok, error=None):
+        if self.sessions:
+            try:
+                self.sessions.end_statement(conn, ok, error)
+            except Exception as e:
+                print(f"Error tracking session savepoint: {e}")
+
+    def _commit(self, conn):
+        """会话连接上的修改保留在事务中，由重置或撤销回滚"""
+        if not (self.sessions and self.sessions.owns(conn)):
+            conn.commit()
+
+    async def cancel_queries(self, database_id):
+        """取消实例上正在执行的查询，返回取消的数量"""
+        return await self.governor.cancel(database_id)
+
+    def _estimate_total_rows_sync(self, database_id, conn_params, sql):
+        try:
+            with self.connections.connection(database_id, conn_params) as conn:
+                return estimate_total_rows(conn, sql)
+        except Exception:
+            return None
+
+    async def open_query_stream(self, database_id, sql, user_id=None):
+        """执行查询并返回逐行产出NDJSON的异步迭代器
+
+        执行阶段的错误（实例不存在、SQL错误等）在这里直接抛出，
+        开始输出后的错误以 {"type": "error"} 行的形式写入流中。
+        查询名额和时间上限覆盖整个读取过程。
+        """
+        backend = self._backend_for(database_id)
+        if backend is not None and backend.embedded:
+            return await self._open_embedded_stream(backend, database_id, sql, user_id)
+
+        self.governor.acquire(user_id)
+        conn = query = None
+        try:
+            conn_params = await self._get_connection_params(database_id)
+            conn = await self._run_db(self.query_connections.acquire, database_id, conn_params)
+            query = self.governor.begin(database_id, conn_params)
+            cursor, execution_time = await self._run_db(self._start_stream_sync, conn, sql, query)
+        except Exception:
+            if conn:
+                await self._run_db(self._finish_stream_sync, conn, query, True)
+            if query:
+                self.governor.end(query)
+            self.governor.release(user_id)
+            raise
+        await self._touch(database_id)
+        return self._stream_rows(database_id, conn_params, conn, cursor, sql, execution_time, query, user_id)
+
+    async def _open_embedded_stream(self, backend, database_id, sql, user_id):
+        """内嵌后端在进程内一次执行完毕（受流式上限约束），再按相同格式逐行输出"""
+        async with self.governor.slot(user_id):
+            query = self.governor.begin(database_id, None)
+            try:
+                outcome = await self._run_db(
+                    backend.execute_sync, database_id, sql, query, None,
+                    settings.SQL_PRACTICE_STREAM_MAX_ROWS, settings.SQL_PRACTICE_STREAM_MAX_BYTES
+                )
+            finally:
+                self.governor.end(query)
+        await self._touch(database_id)
+
+        async def lines():
+            if outcome["results"] is not None:
+                yield encode_line({"type": "columns", "columns": outcome["columns"]})
+                chunk = settings.SQL_PRACTICE_STREAM_CHUNK_ROWS
+                for start in range(0, len(outcome["results"]), chunk):
+                    yield b"".join(
+                        encode_line({"type": "row", "data": row})
+                        for row in outcome["results"][start:start + chunk]
+                    )
+            yield encode_line({
+                "type": "summary",
+                "rowCount": len(outcome["results"] or []),
+                "affectedRows": outcome["affected_rows"],
+                "executionTime": int(outcome["execution_time"]),
+                "truncated": outcome["truncated"],
+                "totalRowsHint": outcome["total_rows_hint"]
+            })
+
+        return lines()
+
+    def _start_stream_sync(self, conn, sql, query):
+        try:
+            self.governor.attach(query, conn)
+            self._begin_statement(conn, sql)
+            cursor = conn.cursor(dictionary=True)
+            start_time = datetime.now()
+            cursor.execute(sql)
+            execution_time = (datetime.now() - start_time).total_seconds() * 1000
+            if not cursor.description:
+                self._commit(conn)
+            self._end_statement(conn, True)
+            return cursor, execution_time
+        except Exception as e:
+            self._end_statement(conn, False, e)
+            self._raise_query_error(query, conn, e)
+
+    def _finish_stream_sync(self, conn, query, discard):
+        if query:
+            self.governor.detach(query)
+        self.query_connections.release(conn, discard=discard)
+
+    async def _stream_rows(self, database_id, conn_params, conn, cursor, sql, execution_time, query, user_id):
+        limiter = ResultLimiter(settings.SQL_PRACTICE_STREAM_MAX_ROWS, settings.SQL_PRACTICE_STREAM_MAX_BYTES)
+        discard = False
+        try:
+            if not cursor.description:  # INSERT, UPDATE, DELETE等
+                yield encode_line({
+                    "type": "summary",
+                    "rowCount": 0,
+                    "affectedRows": cursor.rowcount,
+                    "executionTime": int(execution_time),
+                    "truncated": False,
+                    "totalRowsHint": None
+                })
+                return
+
+            yield encode_line({"type": "columns", "columns": list(cursor.column_names)})
+            while not limiter.truncated:
+                chunk = await self._run_db(cursor.fetchmany, settings.SQL_PRACTICE_STREAM_CHUNK_ROWS)
+                if not chunk:
+                    break
+                lines = []
+                for row in chunk:
+                    line = encode_line({"type": "row", "data": row})
+                    if not limiter.accept(len(line)):
+                        break
+                    lines.append(line)
+                yield b"".join(lines)
+
+            total_rows_hint = limiter.rows
+            if limiter.truncated:
+                discard = True
+                total_rows_hint = await self._run_db(self._estimate_total_rows_sync, database_id, conn_params, sql)
+            yield encode_line({
+                "type": "summary",
+                "rowCount": limiter.rows,
+                "affectedRows": 0,
+                "executionTime": int(execution_time),
+                "truncated": limiter.truncated,
+                "totalRowsHint": total_rows_hint
+            })
+        except Exception as e:
+            discard = True
+            error = self.governor.translate(query, e)
+            print(f"Error streaming query: {error}")
+            yield encode_line({"type": "error", "error": str(error)})
+        finally:
+            await self._run_db(self._finish_stream_sync, conn, query, discard)
+            self.governor.end(query)
+            self.governor.release(user_id)
             
+    async def _get_connection_params(self, database_id):
+        """获取执行练习查询所用的连接参数"""
+        if self.shared_backend and self.shared_backend.owns(database_id):
+            return await self.shared_backend.get_connection_params(database_id)
+
+        record = await self._get_running_record(database_id)
+        
+        # 确保容器正在运行
+        if record["status"] != 'running' or not record["port"]:
+            raise Exception("数据库实例未运行")
+        
+        return {
+            "host": self._get_mysql_host(record["id"]),
+            "port": record["port"],
+            "user": self.mysql_user,
+            "password": self.mysql_password,
+            # 使用容器标签中的数据库名
+            "database": record["labels"].get('db_name', self.mysql_database)
+        }
+
+    async def _get_admin_params(self, database_id):
+        """获取实例所在MySQL服务器的管理员连接参数（不指定数据库）"""
+        if self.shared_backend and self.shared_backend.owns(database_id):
+            return self.shared_backend.get_admin_params(database_id)
+
+        record = await self._get_running_record(database_id)
+        if record["status"] != 'running' or not record["port"]:
+            raise Exception("数据库实例未运行")
+        return {
+            "host": self._get_mysql_host(record["id"]),
+            "port": record["port"],
+            "user": 'root',
+            "password": self.mysql_root_password
+        }
+
+    async def _touch(self, database_id):
+        """用户有活动时续租"""
+        if self.hibernator:
+            self.hibernator.mark_active(database_id)
+        if self.evictor:
+            self.evictor.mark_active(database_id)
+        if not self.reaper:
+            return
+        expires_at = self.reaper.extend(database_id)
+        if not expires_at:
+            return
+        try:
+            backend = self._backend_for(database_id)
+            if backend:
+                await backend.update_expiry(database_id, expires_at)
+            else:
+                self.registry.assign(database_id, {"expires_at": expires_at.isoformat()})
+        except Exception as e:
+            print(f"Error extending lease: {e}")
+        await self._store_call("touch", database_id, expires_at)
+
+    async def _list_leases(self):
+        """列出所有已分配实例的ID和到期时间，供回收任务登记
+
+        启用实例存储时以存储中的到期时间为准（续租只更新存储和本进程的注册表），
+        未启用时读取容器标签和各后端的记录。
+        """
+        if self.store:
+            return await self._run_db(self.store.leases)
+        leases = []
+        if self.registry.synced:
+            for record in self.registry.all():
+                if record["labels"].get("user_id"):
+                    leases.append((record["id"], record["labels"].get("expires_at")))
+        for backend in self.backends.values():
+            leases.extend(await backend.list_leases())
+        return leases
+
+    async def _expire_database(self, database_id):
+        """回收过期实例，容器可直接强制删除"""
+        await self._run_db(self._close_query_connections, database_id)
+        backend = self._backend_for(database_id)
+        if backend:
+            await backend.delete_database(database_id)
+        else:
+            await self.teardown.release([database_id])
+        await self._store_call("delete", database_id)
+        self._forget_activity(database_id)
+
+    async def _evict_database(self, database_id, reason):
+        """内存不足时回收实例；记录保留为 evicted 状态，用户查询实例时看到回收通知"""
+        record = await self._get_record(database_id)
+        if self.reaper:
+            self.reaper.cancel(database_id)
+        await self._run_db(self._close_query_connections, database_id)
+        await self.teardown.release([database_id])
+        notice = self.evictor.record_notice(record, reason)
+        await self._store_call("update_status", database_id, "evicted", None)
+        self._forget_activity(database_id)
+        print(f"Evicted practice database {database_id} of user {record['labels'].get('user_id')} ({reason})")
+        return notice
+
+    def _eviction_notice(self, instance):
+        """被回收实例的通知，用户需要重新创建实例"""
+        return {
+            "id": instance["id"],
+            "status": "evicted",
+            "dbName": instance["db_name"],
+            "difficulty": instance["difficulty"],
+            "eviction": {
+                "reason": "服务器资源不足，长时间未使用的练习实例已被回收，请重新创建",
+                "evictedAt": instance["updated_at"].isoformat() if instance["updated_at"] else None,
+            },
+        }
+
+    def _forget_activity(self, database_id):
+        """实例删除后清除休眠和回收的活动记录"""
+        if self.hibernator:
+            self.hibernator.forget(database_id)
+        if self.evictor:
+            self.evictor.forget(database_id)
+
+    async def _get_running_record(self, database_id):
+        """获取容器记录，已分配的容器处于暂停或停止状态时先恢复"""
+        record = await self._get_record(database_id)
+        if self.hibernator:
+            self.hibernator.mark_active(record["id"])
+            if record["status"] != "running" and record["labels"].get("user_id"):
+                record = await self.hibernator.resume(record)
+        return record
+
+    async def _get_record(self, database_id):
+        """从注册表获取容器记录，未命中时查询Docker并写入注册表"""
+        record = self.registry.get(database_id) if self.registry.synced else None
+        if record:
+            return record
+        container = await self.docker.get(database_id)
+        return self.registry.upsert(container.attrs)
+
     async def delete_database(self, database_id):
         """删除数据库实例"""
         try:
-            container = await asyncio.to_thread(
-                self.docker_client.containers.get,
-                database_id
-            )
+            if self.reaper:
+                self.reaper.cancel(database_id)
+            backend = self._backend_for(database_id)
+            if backend:
+                result = await backend.delete_database(database_id)
+                await self._store_call("delete", database_id)
+                return result
+
+            record = await self._get_record(database_id)
             
-            # 停止并删除容器
-            await asyncio.to_thread(container.stop)
-            await asyncio.to_thread(container.remove)
+            # 停止容器，删除在后台完成
+            await self.teardown.release([record["id"]])
+            await self._store_call("delete", record["id"])
+            self._forget_activity(record["id"])
+            await self._run_db(self._close_query_connections, database_id)
+            await self._run_db(self._close_query_connections, record["id"])
             
             return True
         except Exception as e:
@@ -588,53 +1892,111 @@ INSERT INTO time_records (employee_id, project_id, work_date, hours_worked, desc
     async def cleanup_user_databases(self, user_id):
         """清理用户的所有数据库实例"""
         try:
-            containers = await asyncio.to_thread(
-                self.docker_client.containers.list,
-                all=True,
-                filters={"label": [f"user_id={user_id}"]}
+            stored = await self._store_call("for_user", user_id)
+            if stored is None:
+                # 没有实例存储时不知道实例在哪个后端，逐个清理
+                for backend in self.backends.values():
+                    await backend.cleanup_user_databases(user_id)
+            else:
+                # 按实例ID路由到所属后端，只访问用户实例所在的后端
+                for instance in stored:
+                    backend = self._backend_for(instance["id"])
+                    if backend:
+                        await backend.delete_database(instance["id"])
+            if self.registry.synced:
+                container_ids = {record["id"] for record in self.registry.for_user(user_id)}
+            elif stored is not None:
+                container_ids = set()
+            else:
+                container_ids = {container.id for container in await self._list_user_containers(user_id)}
+            container_ids.update(
+                instance["id"] for instance in stored or ()
+                if instance["backend"] == "container" and instance["status"] != "evicted"
             )
             
-            for container in containers:
-                await asyncio.to_thread(container.stop, timeout=5)
-                await asyncio.to_thread(container.remove)
+            # 所有容器并行停止，返回时端口和内存已释放，新实例无需等待容器删除完成
+            await self.teardown.release(container_ids)
+            for container_id in container_ids:
+                await self._run_db(self._close_query_connections, container_id)
+                if self.reaper:
+                    self.reaper.cancel(container_id)
+                self._forget_activity(container_id)
+            await asyncio.gather(*(
+                self._store_call("delete", instance_id)
+                for instance_id in container_ids | {instance["id"] for instance in stored or ()}
+            ))
                 
             return True
         except Exception as e:
             print(f"Error cleaning up user databases: {e}")
             raise
             
+    async def _store_call(self, method, *args):
+        """在数据库线程池中调用实例存储，存储未启用或出错时返回None，不影响练习实例本身"""
+        if not self.store:
+            return None
+        try:
+            return await self._run_db(getattr(self.store, method), *args)
+        except Exception as e:
+            print(f"Error updating practice instance store ({method}): {e}")
+            return None
+
+    def _on_container_change(self, container_id, record):
+        """Docker事件引起的状态变化写入实例存储"""
+        if not self.store:
+            return
+        if record is None:
+            coro = self._store_call("delete", container_id)
+        elif record["labels"].get("user_id"):
+            coro = self._store_call("update_status", container_id, record["status"], record["port"])
+        else:
+            return
+        task = asyncio.create_task(coro)
+        self._store_tasks.add(task)
+        task.add_done_callback(self._store_tasks.discard)
+
+    async def _backfill_store(self):
+        """登记启用实例存储之前创建、只记录在Docker标签中的容器"""
+        if not self.store or not self.registry.synced:
+            return
+        records = [record for record in self.registry.all() if record["labels"].get("user_id")]
+        known = await self._store_call("known_ids", [record["id"] for record in records])
+        if known is None:
+            return
+        for record in records:
+            if record["id"] not in known:
+                await self._store_call("save", self._format_record(record), "container", self._dataset_rows(record))
+
     async def _format_container_info(self, container):
         """格式化容器信息为API响应格式"""
         try:
-            # 刷新容器信息
-            container_info = await asyncio.to_thread(container.reload)
-            
-            # 从标签中获取元数据
-            user_id = container_info.labels.get('user_id')
-            username = container_info.labels.get('username')
-            db_name = container_info.labels.get('db_name')
-            expires_at = container_info.labels.get('expires_at')
-            difficulty = container_info.labels.get('difficulty', 'easy')
-            
-            # 获取端口映射
-            port = None
-            if container_info.attrs['State']['Status'] == 'running':
-                ports = container_info.attrs['NetworkSettings']['Ports']
-                if '3306/tcp' in ports and ports['3306/tcp']:
-                    port = ports['3306/tcp'][0]['HostPort']
-                    
-            return {
-                "id": container_info.id,
-                "name": container_info.name,
-                "user_id": user_id,
-                "username": username,
-                "dbName": db_name,
-                "status": container_info.status,
-                "created": container_info.attrs['Created'],
-                "expiresAt": expires_at,
-                "difficulty": difficulty,
-                "port": port
-            }
+            # 刷新容器信息并写入注册表
+            container_info = await self._reload(container)
+            return self._format_record(self.registry.upsert(container_info.attrs))
         except Exception as e:
             print(f"Error formatting container info: {e}")
             raise
+
+    def _dataset_rows(self, record):
+        rows = record["labels"].get("dataset_rows")
+        return int(rows) if rows else None
+
+    def _format_record(self, record):
+        """将注册表记录格式化为API响应格式"""
+        # 从标签中获取元数据
+        labels = record["labels"]
+        rows = self._dataset_rows(record)
+        difficulty = labels.get('difficulty', 'easy')
+        return {
+            "id": record["id"],
+            "name": record["name"],
+            "user_id": labels.get('user_id'),
+            "username": labels.get('username'),
+            "dbName": labels.get('db_name'),
+            "status": record["status"],
+            "created": record["created"],
+            "expiresAt": labels.get('expires_at'),
+            "difficulty": difficulty,
+            "dataset": f"{difficulty}-{format_size(rows)}" if rows else difficulty,
+            "port": record["port"]
+        }
@@ -0,0 +1,147 @@
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from src.services.sql_practice_jobs import report_queue_position
+
+
+class AdmissionRejected(Exception):
+    """排队人数已满，请稍后重试"""
+
+    def __init__(self, message, retry_after=10):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    def __init__(self, user_id, containers):
+        self.user_id = str(user_id)
+        self.containers = containers
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """创建实例的准入控制：限制同时进行的创建数和每台主机的容器数，其余请求按先来先到排队
+
+    每个用户同一时间最多有一个创建作业，因此先来先到的队列对用户是公平的。
+    队首请求因主机容量不足无法执行时，后面的请求也不会越过它。
+    后台请求（如补充预热池）同样计入上限，但只在没有用户请求排队时放行，且不计入排队人数。
+    host_load() 返回主机上已有的练习容器数。
+    """
+
+    def __init__(self, max_in_flight=4, max_queue=500, host_capacity=0, host_load=None,
+                 poll_interval=1.0, metrics=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.host_capacity = host_capacity
+        self.host_load = host_load
+        self.poll_interval = poll_interval
+        self.metrics = metrics
+        self._queue = deque()
+        self._background = deque()
+        self._in_flight = 0
+        self._in_flight_containers = 0
+
+    def check(self):
+        """提交前检查队列是否已满，已满时抛出 AdmissionRejected"""
+        if len(self._queue) >= self.max_queue:
+            self._record("admission.rejected")
+            raise AdmissionRejected("创建请求过多，请稍后重试")
+
+    def position(self, ticket):
+        """排队位置（从1开始），已放行时返回None"""
+        try:
+            return self._queue.index(ticket) + 1
+        except ValueError:
+            return None
+
+    @asynccontextmanager
+    async def admit(self, user_id, containers=True, background=False):
+        """等待放行后执行创建；containers 为 True 时同时受主机容量限制，background 为 True 时低优先级"""
+        queue = self._background if background else self._queue
+        if not background:
+            self.check()
+        ticket = _Ticket(user_id, containers)
+        queue.append(ticket)
+        self._dispatch()
+        if not ticket.future.done() and not background:
+            report_queue_position(lambda: self.position(ticket))
+        try:
+            await self._wait(ticket)
+        except asyncio.CancelledError:
+            if ticket in queue:
+                queue.remove(ticket)
+                self._gauge()
+            elif ticket.future.done():
+                self._release(ticket)
+            raise
+        finally:
+            report_queue_position(None)
+
+        waited = time.monotonic() - ticket.enqueued_at
+        if self.metrics:
+            self.metrics.incr("admission.admitted")
+            self.metrics.observe("admission.wait_ms", round(waited * 1000, 2))
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def stats(self):
+        return {
+            "inFlight": self._in_flight,
+            "queued": len(self._queue),
+            "backgroundQueued": len(self._background),
+            "maxInFlight": self.max_in_flight,
+            "hostCapacity": self.host_capacity,
+            "hostLoad": self._host_load(),
+        }
+
+    async def _wait(self, ticket):
+        # 容量由其他地方（如删除容器）释放时不会收到通知，定期重新检查
+        while not ticket.future.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), self.poll_interval)
+            except asyncio.TimeoutError:
+                self._dispatch()
+
+    def _dispatch(self):
+        """按顺序放行队首可以执行的请求，用户请求全部放行后才放行后台请求"""
+        while True:
+            queue = self._queue or self._background
+            if not queue or not self._can_admit(queue[0]):
+                break
+            ticket = queue.popleft()
+            self._in_flight += 1
+            if ticket.containers:
+                self._in_flight_containers += 1
+            ticket.future.set_result(True)
+        self._gauge()
+
+    def _can_admit(self, ticket):
+        if self._in_flight >= self.max_in_flight:
+            return False
+        if ticket.containers and self.host_capacity:
+            # 正在创建的容器可能已出现在 host_load 中，这里宁可多算
+            return self._host_load() + self._in_flight_containers < self.host_capacity
+        return True
+
+    def _release(self, ticket):
+        self._in_flight -= 1
+        if ticket.containers:
+            self._in_flight_containers -= 1
+        self._dispatch()
+
+    def _host_load(self):
+        return self.host_load() if self.host_load else 0
+
+    def _gauge(self):
+        if self.metrics:
+            self.metrics.set_gauge("admission.queue_depth", len(self._queue))
+            self.metrics.set_gauge("admission.in_flight", self._in_flight)
+
+    def _record(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
@@ -0,0 +1,49 @@
+class PracticeBackend:
+    """练习实例后端接口
+
+    容器后端（每个实例一个MySQL容器）内置在 SQLPracticeService 中，
+    其他后端实现本接口，由服务按实例ID前缀分派。
+    """
+
+    name = None
+    ID_PREFIX = None
+    # 内嵌后端在进程内执行查询，不提供MySQL连接参数
+    embedded = False
+
+    def owns(self, database_id):
+        """判断实例ID是否属于该后端"""
+        return str(database_id).startswith(self.ID_PREFIX)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def create_database(self, user_id, username, db_name, difficulty, expires_at):
+        raise NotImplementedError
+
+    async def get_database_info(self, database_id):
+        raise NotImplementedError
+
+    async def get_user_database(self, user_id):
+        raise NotImplementedError
+
+    async def reset_database(self, database_id, difficulty="easy"):
+        raise NotImplementedError
+
+    async def delete_database(self, database_id):
+        raise NotImplementedError
+
+    async def cleanup_user_databases(self, user_id):
+        raise NotImplementedError
+
+    async def list_leases(self):
+        """返回 (实例ID, 到期时间) 列表，供回收任务登记"""
+        raise NotImplementedError
+
+    async def update_expiry(self, database_id, expires_at):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
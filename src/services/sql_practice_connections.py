@@ -0,0 +1,192 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+
+class _KeyedPool:
+    """单个实例的空闲连接池"""
+
+    def __init__(self, conn_params):
+        self.conn_params = dict(conn_params)
+        self.idle = deque()  # (conn, last_used)
+        self.in_use = 0
+        self.closed = False
+
+
+class ConnectionPoolManager:
+    """按实例（容器/端口）分别维护的小型MySQL连接池，支持空闲回收和健康检查
+
+    所有方法都是阻塞的，应在数据库线程池中调用。
+    """
+
+    # 连接层错误，出现后连接不可再复用
+    BROKEN_ERRORS = (mysql_errors.OperationalError, mysql_errors.InterfaceError)
+
+    def __init__(self, max_size=4, idle_timeout=60.0, health_check_after=5.0, metrics=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.metrics = metrics
+        self._pools = {}
+        self._owners = {}  # id(conn) -> 借出该连接的池
+        self._doomed = set()  # 归还时需要关闭的连接，如结果集未读完
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, key, conn_params):
+        """借出一个连接，用完自动归还；连接层出错时直接丢弃"""
+        conn = self.acquire(key, conn_params)
+        try:
+            yield conn
+        except self.BROKEN_ERRORS:
+            self.release(conn, discard=True)
+            raise
+        except Exception:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def acquire(self, key, conn_params):
+        stale = None
+        with self._lock:
+            pool = self._pools.get(key)
+            # 实例重启后端口等参数可能变化，旧连接全部作废
+            if pool and pool.conn_params != conn_params:
+                stale = self._pools.pop(key)
+                pool = None
+            if pool is None:
+                pool = self._pools[key] = _KeyedPool(conn_params)
+            pool.in_use += 1
+        if stale:
+            self._close_pool(stale)
+
+        while True:
+            with self._lock:
+                entry = pool.idle.pop() if pool.idle else None
+            if entry is None:
+                break
+            conn, last_used = entry
+            if self._is_healthy(conn, last_used):
+                self._record("conn.reused")
+                with self._lock:
+                    self._owners[id(conn)] = pool
+                return conn
+            self._record("conn.health_failed")
+            self._close(conn)
+
+        try:
+            conn = mysql.connector.connect(**conn_params)
+        except Exception:
+            with self._lock:
+                pool.in_use -= 1
+            raise
+        self._record("conn.created")
+        with self._lock:
+            self._owners[id(conn)] = pool
+        return conn
+
+    def discard(self, conn):
+        """标记连接在归还时关闭而不是放回池中"""
+        with self._lock:
+            self._doomed.add(id(conn))
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            if id(conn) in self._doomed:
+                self._doomed.discard(id(conn))
+                discard = True
+            pool = self._owners.pop(id(conn), None)
+            if pool:
+                pool.in_use -= 1
+            keep = (
+                not discard and pool is not None and not pool.closed
+                and len(pool.idle) + pool.in_use < self.max_size
+            )
+
+        if keep:
+            try:
+                # 重置会话状态并结束未提交的事务，效果等同于重新建立连接，但无需重新认证
+                conn.reset_session()
+            except Exception:
+                keep = False
+
+        if not keep:
+            self._close(conn)
+            return
+
+        with self._lock:
+            if pool.closed:
+                keep = False
+            else:
+                pool.idle.append((conn, time.monotonic()))
+        if not keep:
+            self._close(conn)
+
+    def close(self, key):
+        """关闭某个实例的全部空闲连接，正在使用的连接归还时关闭"""
+        with self._lock:
+            pool = self._pools.pop(key, None)
+        if pool:
+            self._close_pool(pool)
+
+    def close_all(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            self._close_pool(pool)
+
+    def evict_idle(self):
+        """关闭超过空闲时间的连接，并移除已无连接的池，返回关闭的连接数"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, pool in list(self._pools.items()):
+                while pool.idle and now - pool.idle[0][1] > self.idle_timeout:
+                    expired.append(pool.idle.popleft()[0])
+                if not pool.idle and pool.in_use == 0:
+                    del self._pools[key]
+        for conn in expired:
+            self._close(conn)
+        if expired:
+            self._record("conn.evicted", len(expired))
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pools": len(self._pools),
+                "idle": sum(len(pool.idle) for pool in self._pools.values()),
+                "inUse": sum(pool.in_use for pool in self._pools.values())
+            }
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close_pool(self, pool):
+        with self._lock:
+            pool.closed = True
+            conns = [conn for conn, _ in pool.idle]
+            pool.idle.clear()
+        for conn in conns:
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _record(self, name, value=1):
+        if self.metrics:
+            self.metrics.incr(name, value)
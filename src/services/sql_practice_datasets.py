@@ -0,0 +1,312 @@
+import os
+import re
+import csv
+import json
+import math
+import random
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+
+# 修改生成规则后需要递增，使已生成的数据集和判题缓存失效
+GENERATOR_VERSION = "1"
+
+DATASET_NAME = re.compile(r"^(easy|medium|hard)(?:-(\d+)([KkMm]?))?$")
+SIZE_UNITS = {"": 1, "K": 1000, "M": 1000 * 1000}
+
+# 生成的行ID从该值开始，避开初始化脚本中的示例数据
+ID_BASE = 1001
+CHUNK_ROWS = 10000
+
+FIRST_NAMES = ["伟", "芳", "娜", "敏", "静", "强", "磊", "洋", "艳", "勇", "军", "杰", "娟", "涛", "明", "超", "秀英", "华", "平", "刚"]
+LAST_NAMES = ["王", "李", "张", "刘", "陈", "杨", "赵", "黄", "周", "吴", "徐", "孙", "胡", "朱", "高", "林", "何", "郭", "马", "罗"]
+# 城市按近似人口比例加权
+CITIES = [("上海", 25), ("北京", 22), ("深圳", 18), ("广州", 16), ("成都", 14), ("杭州", 12),
+          ("重庆", 10), ("武汉", 9), ("西安", 8), ("南京", 8), ("苏州", 6), ("天津", 6)]
+CATEGORIES = [("电子产品", 30), ("服装", 25), ("家居", 15), ("图书", 12), ("食品", 10), ("运动", 8)]
+ORDER_STATUSES = [("completed", 70), ("shipped", 12), ("pending", 10), ("cancelled", 8)]
+PROJECT_STATUSES = [("completed", 40), ("in_progress", 45), ("planning", 15)]
+POSITIONS = [("工程师", 45, 15000), ("高级工程师", 20, 25000), ("产品经理", 10, 22000),
+             ("设计师", 10, 14000), ("测试工程师", 10, 12000), ("经理", 5, 35000)]
+ROLES = [("开发", 55), ("测试", 15), ("设计", 10), ("产品", 10), ("负责人", 10)]
+TASKS = ["功能开发", "缺陷修复", "代码评审", "需求分析", "系统测试", "技术方案", "文档编写", "部署上线"]
+
+EPOCH = date(2021, 1, 1)
+SPAN_DAYS = 3 * 365
+
+
+def parse_dataset(name):
+    """解析数据集名称，如 "hard"、"hard-1M"、"medium-50K"，返回 (难度, 行数)，行数为None表示示例数据"""
+    match = DATASET_NAME.match(str(name or "").strip())
+    if not match:
+        raise ValueError(f"无效的数据集: {name}")
+    difficulty, number, unit = match.groups()
+    if number is None:
+        return difficulty, None
+    rows = int(number) * SIZE_UNITS[unit.upper()]
+    if rows <= 0:
+        raise ValueError(f"无效的数据集大小: {name}")
+    return difficulty, rows
+
+
+def format_size(rows):
+    """行数格式化为数据集名称中的大小，如 1000000 -> "1M" """
+    for unit in ("M", "K"):
+        if rows % SIZE_UNITS[unit] == 0:
+            return f"{rows // SIZE_UNITS[unit]}{unit}"
+    return str(rows)
+
+
+def table_counts(difficulty, rows):
+    """按事实表的行数推算各表行数，保持示例数据中的表间比例"""
+    if difficulty == "easy":
+        return {"users": max(10, rows // 10), "orders": rows}
+    if difficulty == "medium":
+        return {
+            "users": max(10, rows // 40),
+            "products": max(50, rows // 200),
+            "orders": max(10, rows // 4),
+            "order_items": rows,
+        }
+    users = max(20, rows // 50)
+    return {
+        "users": users,
+        "departments": max(5, rows // 200000 + 5),
+        "employees": users,
+        "projects": max(10, rows // 1000),
+        "project_assignments": max(10, rows // 10),
+        "time_records": rows,
+    }
+
+
+class _Picker:
+    """按权重快速抽样"""
+
+    def __init__(self, rnd, weighted):
+        self.rnd = rnd
+        self.values = [item[0] for item in weighted]
+        self.cum_weights = []
+        total = 0
+        for item in weighted:
+            total += item[1]
+            self.cum_weights.append(total)
+
+    def __call__(self):
+        return self.rnd.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+class DatasetGenerator:
+    """生成大规模练习数据集
+
+    各表以CSV文件分块写入磁盘，不在内存中构建完整数据；同一随机种子和大小生成完全相同的数据。
+    外键只引用同一数据集中生成的行，用户活跃度、金额、薪资等使用偏斜分布。
+    数据集生成后保存在 data_root/<难度>-<大小>-s<种子>/ 中，manifest.json 最后写入，作为完成标记。
+    """
+
+    def __init__(self, data_root, seed=0, max_rows=10 * 1000 * 1000, metrics=None):
+        self.data_root = data_root
+        self.seed = seed
+        self.max_rows = max_rows
+        self.metrics = metrics
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def dataset_dir(self, difficulty, rows):
+        return os.path.join(self.data_root, f"{difficulty}-{format_size(rows)}-s{self.seed}")
+
+    def manifest(self, difficulty, rows):
+        """已生成数据集的描述，未生成时返回None"""
+        try:
+            with open(os.path.join(self.dataset_dir(difficulty, rows), "manifest.json"), "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        return manifest if manifest.get("version") == GENERATOR_VERSION else None
+
+    def ensure(self, difficulty, rows):
+        """返回数据集的 [(表名, CSV路径)]，尚未生成时先生成；阻塞方法，应在线程中调用"""
+        if rows > self.max_rows:
+            raise ValueError(f"数据集最多 {format_size(self.max_rows)} 行")
+        key = (difficulty, rows)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            manifest = self.manifest(difficulty, rows) or self.generate(difficulty, rows)
+        path = self.dataset_dir(difficulty, rows)
+        return [(table, os.path.join(path, f"{table}.csv")) for table in manifest["tables"]]
+
+    def generate(self, difficulty, rows):
+        counts = table_counts(difficulty, rows)
+        target = self.dataset_dir(difficulty, rows)
+        tmp_dir = f"{target}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            for table, count in counts.items():
+                rnd = random.Random(f"{self.seed}:{GENERATOR_VERSION}:{difficulty}:{rows}:{table}")
+                columns, generate_rows = getattr(self, f"_{table}")(rnd, count, counts)
+                self._write(os.path.join(tmp_dir, f"{table}.csv"), columns, generate_rows)
+            manifest = {
+                "version": GENERATOR_VERSION,
+                "difficulty": difficulty,
+                "rows": rows,
+                "seed": self.seed,
+                "tables": counts,
+            }
+            with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp_dir, target)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if self.metrics:
+            self.metrics.incr("dataset.generated")
+        return manifest
+
+    def _write(self, path, columns, generate_rows):
+        """分块写入CSV，NULL 写作不带引号的 NULL"""
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            chunk = []
+            for row in generate_rows:
+                chunk.append(row)
+                if len(chunk) >= CHUNK_ROWS:
+                    writer.writerows(chunk)
+                    chunk = []
+            writer.writerows(chunk)
+
+    # 偏斜分布：少数用户/员工产生大部分记录
+    def _skewed_id(self, rnd, count):
+        return ID_BASE + int(count * rnd.random() ** 2)
+
+    def _day(self, rnd):
+        return EPOCH + timedelta(days=rnd.randrange(SPAN_DAYS))
+
+    def _timestamp(self, rnd):
+        moment = datetime.combine(self._day(rnd), datetime.min.time()) + timedelta(seconds=rnd.randrange(86400))
+        return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+    def _money(self, rnd, median, sigma=0.8):
+        return f"{median * math.exp(rnd.gauss(0, sigma)):.2f}"
+
+    def _users(self, rnd, count, counts):
+        city = _Picker(rnd, CITIES)
+        with_city = "departments" in counts or "products" in counts
+        columns = ["id", "name", "email", "age"] + (["city"] if with_city else []) + ["created_at"]
+
+        def rows():
+            for i in range(count):
+                user_id = ID_BASE + i
+                row = [
+                    user_id,
+                    rnd.choice(LAST_NAMES) + rnd.choice(FIRST_NAMES),
+                    f"user{user_id}@example.com",
+                    # 约2%的用户未填写年龄
+                    "NULL" if rnd.random() < 0.02 else int(rnd.triangular(18, 65, 28)),
+                ]
+                if with_city:
+                    row.append(city())
+                row.append(self._timestamp(rnd))
+                yield row
+        return columns, rows()
+
+    def _orders(self, rnd, count, counts):
+        with_status = "products" in counts
+        status = _Picker(rnd, ORDER_STATUSES)
+        columns = ["id", "user_id", "amount"] + (["status"] if with_status else []) + ["created_at"]
+
+        def rows():
+            for i in range(count):
+                row = [ID_BASE + i, self._skewed_id(rnd, counts["users"]), self._money(rnd, 200)]
+                if with_status:
+                    row.append(status())
+                row.append(self._timestamp(rnd))
+                yield row
+        return columns, rows()
+
+    def _products(self, rnd, count, counts):
+        category = _Picker(rnd, CATEGORIES)
+
+        def rows():
+            for i in range(count):
+                kind = category()
+                yield [ID_BASE + i, f"{kind}{i + 1:06d}", self._money(rnd, 150, 1.0), kind, self._timestamp(rnd)]
+        return ["id", "name", "price", "category", "created_at"], rows()
+
+    def _order_items(self, rnd, count, counts):
+        orders = counts["orders"]
+
+        def rows():
+            for i in range(count):
+                # 按顺序分配订单，每个订单平均 count/orders 项
+                order_id = ID_BASE + min(orders - 1, i * orders // count)
+                yield [
+                    ID_BASE + i, order_id, self._skewed_id(rnd, counts["products"]),
+                    1 + int(rnd.expovariate(0.7)), self._money(rnd, 150, 1.0)
+                ]
+        return ["id", "order_id", "product_id", "quantity", "price"], rows()
+
+    def _departments(self, rnd, count, counts):
+        city = _Picker(rnd, CITIES)
+
+        def rows():
+            for i in range(count):
+                yield [ID_BASE + i, f"部门{i + 1:03d}", self._money(rnd, 2000000, 0.5), city()]
+        return ["id", "name", "budget", "city"], rows()
+
+    def _employees(self, rnd, count, counts):
+        departments = counts["departments"]
+        position = _Picker(rnd, [(item, item[1]) for item in POSITIONS])
+
+        def rows():
+            for i in range(count):
+                department = i % departments
+                # 每个部门的第一名员工是部门负责人，其余员工向其汇报
+                if i < departments:
+                    title, median = "经理", 35000
+                    manager_id = "NULL"
+                else:
+                    title, _, median = position()
+                    manager_id = ID_BASE + department
+                yield [
+                    ID_BASE + i, ID_BASE + i, ID_BASE + department, title,
+                    self._money(rnd, median, 0.25), self._day(rnd).isoformat(), manager_id
+                ]
+        return ["id", "user_id", "department_id", "position", "salary", "hire_date", "manager_id"], rows()
+
+    def _projects(self, rnd, count, counts):
+        status = _Picker(rnd, PROJECT_STATUSES)
+
+        def rows():
+            for i in range(count):
+                start = self._day(rnd)
+                state = status()
+                end = (start + timedelta(days=rnd.randrange(30, 400))).isoformat() if state == "completed" else "NULL"
+                yield [
+                    ID_BASE + i, f"项目{i + 1:05d}", self._money(rnd, 500000, 0.7), start.isoformat(), end,
+                    "NULL" if rnd.random() < 0.05 else ID_BASE + rnd.randrange(counts["departments"]), state
+                ]
+        return ["id", "name", "budget", "start_date", "end_date", "department_id", "status"], rows()
+
+    def _project_assignments(self, rnd, count, counts):
+        role = _Picker(rnd, ROLES)
+
+        def rows():
+            for i in range(count):
+                yield [
+                    ID_BASE + i, self._skewed_id(rnd, counts["projects"]), self._skewed_id(rnd, counts["employees"]),
+                    role(), self._day(rnd).isoformat(), rnd.choice((40, 80, 120, 160, 200, 320))
+                ]
+        return ["id", "project_id", "employee_id", "role", "assigned_date", "hours_allocated"], rows()
+
+    def _time_records(self, rnd, count, counts):
+        def rows():
+            for i in range(count):
+                yield [
+                    ID_BASE + i, self._skewed_id(rnd, counts["employees"]), self._skewed_id(rnd, counts["projects"]),
+                    self._day(rnd).isoformat(), f"{rnd.choice((2, 4, 6, 7.5, 8, 8, 8, 9.5)):.2f}",
+                    "NULL" if rnd.random() < 0.1 else rnd.choice(TASKS)
+                ]
+        return ["id", "employee_id", "project_id", "work_date", "hours_worked", "description"], rows()
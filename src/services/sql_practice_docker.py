@@ -0,0 +1,267 @@
+import os
+import json
+import struct
+import asyncio
+from collections import namedtuple
+from urllib.parse import quote
+
+import docker
+import httpx
+
+DEFAULT_DOCKER_HOST = "unix:///var/run/docker.sock"
+
+# docker.errors.APIError 格式化错误信息时需要的响应字段
+_ErrorResponse = namedtuple("_ErrorResponse", "status_code url reason")
+
+# docker SDK 风格的健康检查参数名 -> Engine API 字段名
+_HEALTHCHECK_FIELDS = {
+    "test": "Test",
+    "interval": "Interval",
+    "timeout": "Timeout",
+    "retries": "Retries",
+    "start_period": "StartPeriod",
+}
+
+
+class DockerContainer:
+    """Engine API inspect 结果，提供与 docker SDK 容器对象相同的只读属性"""
+
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    @property
+    def id(self):
+        return self.attrs["Id"]
+
+    @property
+    def short_id(self):
+        return self.id[:12]
+
+    @property
+    def name(self):
+        return self.attrs["Name"].lstrip("/")
+
+    @property
+    def status(self):
+        return self.attrs["State"]["Status"]
+
+    @property
+    def labels(self):
+        return self.attrs["Config"].get("Labels") or {}
+
+
+class AsyncDockerClient:
+    """基于 httpx 的异步 Docker Engine API 客户端
+
+    直接在事件循环中通过unix套接字（或TCP）访问Docker守护进程，连接保持复用；
+    容器操作不再占用线程池，慢的 stop 不会让其他后台工作排队。
+    出错时抛出与 docker SDK 相同的 docker.errors.NotFound / APIError。
+    """
+
+    def __init__(self, base_url=None, api_version="1.41", timeout=30.0, max_connections=32):
+        base_url = base_url or os.environ.get("DOCKER_HOST") or DEFAULT_DOCKER_HOST
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        if base_url.startswith("unix://"):
+            transport = httpx.AsyncHTTPTransport(uds=base_url[len("unix://"):], limits=limits)
+            base_url = "http://docker"
+        else:
+            transport = httpx.AsyncHTTPTransport(limits=limits)
+            if base_url.startswith("tcp://"):
+                base_url = "http://" + base_url[len("tcp://"):]
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            base_url=f"{base_url.rstrip('/')}/v{api_version}",
+            timeout=timeout
+        )
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def ping(self):
+        """检查守护进程是否可达"""
+        await self._request("GET", "/_ping")
+
+    async def get(self, container_id):
+        """inspect 容器"""
+        response = await self._request("GET", f"/containers/{quote(container_id)}/json")
+        return DockerContainer(response.json())
+
+    async def list(self, all=False, filters=None):
+        """列出容器，返回完整的 inspect 结果（与 docker SDK 一致）"""
+        params = {"all": "1" if all else "0"}
+        if filters:
+            params["filters"] = json.dumps(_normalize_filters(filters))
+        response = await self._request("GET", "/containers/json", params=params)
+        containers = await asyncio.gather(
+            *(self.get(summary["Id"]) for summary in response.json()),
+            return_exceptions=True
+        )
+        # 列出后被删除的容器直接跳过
+        for container in containers:
+            if isinstance(container, Exception) and not isinstance(container, docker.errors.NotFound):
+                raise container
+        return [container for container in containers if isinstance(container, DockerContainer)]
+
+    async def run(self, image, name=None, environment=None, ports=None, labels=None,
+                  healthcheck=None, host_config=None):
+        """创建并启动容器，镜像不存在时先拉取；返回启动后的 inspect 结果"""
+        body = {
+            "Image": image,
+            "Env": [f"{key}={value}" for key, value in (environment or {}).items()],
+            "Labels": labels or {},
+            "ExposedPorts": {port: {} for port in ports or {}},
+            "HostConfig": {
+                "PortBindings": {
+                    port: [{"HostPort": "" if host_port is None else str(host_port)}]
+                    for port, host_port in (ports or {}).items()
+                },
+                **(host_config or {}),
+            },
+        }
+        if healthcheck:
+            body["Healthcheck"] = {_HEALTHCHECK_FIELDS.get(key, key): value for key, value in healthcheck.items()}
+        params = {"name": name} if name else None
+        try:
+            response = await self._request("POST", "/containers/create", params=params, json=body)
+        except docker.errors.ImageNotFound:
+            await self.pull(image)
+            response = await self._request("POST", "/containers/create", params=params, json=body)
+        container_id = response.json()["Id"]
+        try:
+            await self.start(container_id)
+        except Exception:
+            await self.remove(container_id, force=True, v=True)
+            raise
+        return await self.get(container_id)
+
+    async def pull(self, image):
+        repository, _, tag = image.partition(":")
+        params = {"fromImage": repository, "tag": tag or "latest"}
+        async with self._client.stream("POST", "/images/create", params=params, timeout=None) as response:
+            await _raise_for_status(response)
+            # 拉取进度逐行返回，出错时最后一行带有 error 字段
+            async for line in response.aiter_lines():
+                if line.strip() and "error" in json.loads(line):
+                    raise docker.errors.APIError(f"拉取镜像 {image} 失败", explanation=json.loads(line)["error"])
+
+    async def start(self, container_id):
+        await self._request("POST", f"/containers/{quote(container_id)}/start")
+
+    async def stop(self, container_id, timeout=None):
+        params = None
+        request_timeout = self.timeout
+        if timeout is not None:
+            params = {"t": str(timeout)}
+            # 守护进程最多等待 timeout 秒后强制停止
+            request_timeout = self.timeout + timeout
+        await self._request("POST", f"/containers/{quote(container_id)}/stop", params=params, timeout=request_timeout)
+
+    async def kill(self, container_id):
+        await self._request("POST", f"/containers/{quote(container_id)}/kill")
+
+    async def remove(self, container_id, force=False, v=False):
+        params = {"force": "1" if force else "0", "v": "1" if v else "0"}
+        await self._request("DELETE", f"/containers/{quote(container_id)}", params=params)
+
+    async def rename(self, container_id, name):
+        await self._request("POST", f"/containers/{quote(container_id)}/rename", params={"name": name})
+
+    async def pause(self, container_id):
+        await self._request("POST", f"/containers/{quote(container_id)}/pause")
+
+    async def unpause(self, container_id):
+        await self._request("POST", f"/containers/{quote(container_id)}/unpause")
+
+    async def stats(self, container_id):
+        """单次读取容器资源统计"""
+        response = await self._request(
+            "GET",
+            f"/containers/{quote(container_id)}/stats",
+            params={"stream": "0", "one-shot": "1"}
+        )
+        return response.json()
+
+    async def logs(self, container_id, follow=False, since=None):
+        """逐行返回容器输出（stdout和stderr），follow 为 True 时直到容器停止才结束"""
+        params = {"stdout": "1", "stderr": "1", "follow": "1" if follow else "0"}
+        if since is not None:
+            params["since"] = str(since)
+        timeout = httpx.Timeout(self.timeout, read=None) if follow else self.timeout
+        async with self._client.stream(
+            "GET", f"/containers/{quote(container_id)}/logs", params=params, timeout=timeout
+        ) as response:
+            await _raise_for_status(response)
+            buffer = b""
+            async for chunk in _demultiplex(response.aiter_bytes()):
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line.decode("utf-8", errors="replace")
+            if buffer:
+                yield buffer.decode("utf-8", errors="replace")
+
+    async def _request(self, method, path, params=None, json=None, timeout=None):
+        response = await self._client.request(
+            method, path, params=params, json=json, timeout=timeout or self.timeout
+        )
+        await _raise_for_status(response)
+        return response
+
+
+def memory_usage(stats):
+    """容器当前的内存占用（不含可回收的文件缓存），stats 为 stats 接口的返回值"""
+    memory = stats.get("memory_stats") or {}
+    details = memory.get("stats") or {}
+    # cgroup v2 为 inactive_file，v1 为 cache
+    cache = details.get("inactive_file", details.get("cache", 0))
+    return max(memory.get("usage", 0) - cache, 0)
+
+
+def cpu_times(stats):
+    """返回 (容器累计CPU时间, 主机累计CPU时间, CPU数)，两次采样之差用于计算CPU占用"""
+    cpu = stats.get("cpu_stats") or {}
+    return (
+        (cpu.get("cpu_usage") or {}).get("total_usage", 0),
+        cpu.get("system_cpu_usage", 0),
+        cpu.get("online_cpus") or 1,
+    )
+
+
+def _normalize_filters(filters):
+    """docker SDK 风格的过滤条件（值可以是字符串或列表）转为 Engine API 格式"""
+    return {key: value if isinstance(value, list) else [value] for key, value in filters.items()}
+
+
+async def _raise_for_status(response):
+    if response.status_code < 400:
+        return
+    await response.aread()
+    try:
+        explanation = response.json().get("message")
+    except ValueError:
+        explanation = response.text.strip()
+    cls = docker.errors.APIError
+    if response.status_code == 404:
+        if "no such image" in (explanation or "").lower():
+            cls = docker.errors.ImageNotFound
+        else:
+            cls = docker.errors.NotFound
+    raise cls(
+        f"{response.status_code} {response.reason_phrase}",
+        response=_ErrorResponse(response.status_code, str(response.url), response.reason_phrase),
+        explanation=explanation
+    )
+
+
+async def _demultiplex(chunks):
+    """拆分非TTY容器日志的多路复用帧：8字节帧头（流类型、3字节填充、4字节长度）+ 数据"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= 8:
+            size = struct.unpack(">I", buffer[4:8])[0]
+            if len(buffer) < 8 + size:
+                break
+            yield buffer[8:8 + size]
+            buffer = buffer[8 + size:]
@@ -0,0 +1,489 @@
+import os
+import re
+import json
+import uuid
+import sqlite3
+import hashlib
+import time
+import threading
+from datetime import datetime, date
+from src.services.sql_practice_backend import PracticeBackend
+from src.services.sql_practice_grading import iter_rows
+from src.services.sql_practice_results import ResultLimiter, encode_line
+from src.services.sql_practice_scripts import ScriptResult
+
+# 初始化脚本中需要改写的MySQL建表语法
+SCHEMA_REWRITES = [
+    (re.compile(r"\bINT(?:EGER)?\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bAUTO_INCREMENT\s*=\s*\d+", re.I), ""),
+    (re.compile(r"\b(?:ENGINE|DEFAULT\s+CHARSET|CHARSET|COLLATE)\s*=\s*\w+", re.I), ""),
+    (re.compile(r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.I), ""),
+    (re.compile(r"\bUNSIGNED\b", re.I), ""),
+]
+
+# 常用的MySQL查看表结构命令，改写为SQLite的等价查询
+SHOW_TABLES = re.compile(r"^\s*SHOW\s+TABLES\s*;?\s*$", re.I)
+DESCRIBE_TABLE = re.compile(
+    r"^\s*(?:DESCRIBE|DESC|SHOW\s+COLUMNS\s+FROM)\s+`?(\w+)`?\s*;?\s*$", re.I
+)
+
+# SQLite中没有对应实现的MySQL语法，出错时用于提示用户
+MYSQL_ONLY_SYNTAX = [
+    (re.compile(r"\bINTERVAL\b", re.I), "INTERVAL 日期运算，可改用 date(列, '+1 day')"),
+    (re.compile(r"\bDATE_(?:ADD|SUB)\s*\(", re.I), "DATE_ADD/DATE_SUB，可改用 date(列, '+1 day')"),
+    (re.compile(r"\b(?:TIMESTAMPDIFF|STR_TO_DATE|UNIX_TIMESTAMP|FROM_UNIXTIME|LAST_DAY)\s*\(", re.I), "MySQL日期函数"),
+    (re.compile(r"\bREGEXP\b|\bRLIKE\b", re.I), "REGEXP 正则匹配"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\b", re.I), "ON DUPLICATE KEY UPDATE，可改用 ON CONFLICT"),
+    (re.compile(r"\bSEPARATOR\b", re.I), "GROUP_CONCAT 的 SEPARATOR，可改用 group_concat(列, '分隔符')"),
+    (re.compile(r"\b(?:FORCE|USE|IGNORE)\s+INDEX\b|\bSTRAIGHT_JOIN\b", re.I), "索引提示"),
+    (re.compile(r"\bSQL_CALC_FOUND_ROWS\b|\bFOUND_ROWS\s*\(", re.I), "SQL_CALC_FOUND_ROWS"),
+    (re.compile(r"\b(?:MODIFY|CHANGE)\s+COLUMN\b", re.I), "ALTER TABLE 修改列定义"),
+    (re.compile(r"\bCREATE\s+(?:PROCEDURE|FUNCTION|EVENT)\b", re.I), "存储过程和函数"),
+    (re.compile(r"^\s*SHOW\b", re.I), "SHOW 命令"),
+]
+
+# DATE_FORMAT 格式符到 strftime 的映射
+DATE_FORMAT_CODES = {
+    "%Y": "%Y", "%y": "%y", "%m": "%m", "%c": "%m", "%d": "%d", "%e": "%d",
+    "%H": "%H", "%k": "%H", "%i": "%M", "%s": "%S", "%S": "%S", "%W": "%A",
+    "%M": "%B", "%b": "%b", "%a": "%a", "%j": "%j", "%%": "%%",
+}
+
+
+class DialectError(Exception):
+    """内嵌引擎不支持用户使用的MySQL语法"""
+
+
+def mysql_to_sqlite(script):
+    """把初始化脚本中的MySQL建表语法改写为SQLite可执行的形式"""
+    for pattern, replacement in SCHEMA_REWRITES:
+        script = pattern.sub(replacement, script)
+    return script
+
+
+def rewrite_command(sql):
+    """SHOW TABLES / DESCRIBE 改写为查询SQLite系统表"""
+    if SHOW_TABLES.match(sql):
+        return (
+            "SELECT name AS Tables FROM sqlite_master "
+            "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    match = DESCRIBE_TABLE.match(sql)
+    if match:
+        return (
+            "SELECT name AS Field, type AS Type, "
+            "CASE \"notnull\" WHEN 1 THEN 'NO' ELSE 'YES' END AS \"Null\", "
+            "CASE pk WHEN 0 THEN '' ELSE 'PRI' END AS \"Key\", dflt_value AS \"Default\" "
+            f"FROM pragma_table_info('{match.group(1)}')"
+        )
+    return sql
+
+
+def _parse_date(value):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _date_part(attr):
+    def part(value):
+        parsed = _parse_date(value)
+        return getattr(parsed, attr) if parsed else None
+    return part
+
+
+def _date_format(value, fmt):
+    parsed = _parse_date(value)
+    if parsed is None or fmt is None:
+        return None
+    return parsed.strftime(re.sub(r"%.", lambda m: DATE_FORMAT_CODES.get(m.group(0), m.group(0)), fmt))
+
+
+def _datediff(left, right):
+    left, right = _parse_date(left), _parse_date(right)
+    if left is None or right is None:
+        return None
+    return (left.date() - right.date()).days
+
+
+def _concat(*values):
+    if any(value is None for value in values):
+        return None
+    return "".join(str(value) for value in values)
+
+
+def register_mysql_functions(conn):
+    """注册常用的MySQL函数，减少两种方言的差异"""
+    conn.create_function("NOW", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    conn.create_function("CURDATE", 0, lambda: date.today().isoformat())
+    conn.create_function("YEAR", 1, _date_part("year"), deterministic=True)
+    conn.create_function("MONTH", 1, _date_part("month"), deterministic=True)
+    conn.create_function("DAY", 1, _date_part("day"), deterministic=True)
+    conn.create_function("DATEDIFF", 2, _datediff, deterministic=True)
+    conn.create_function("DATE_FORMAT", 2, _date_format, deterministic=True)
+    if sqlite3.sqlite_version_info < (3, 44, 0):
+        conn.create_function("CONCAT", -1, _concat, deterministic=True)
+
+
+class _Instance:
+    def __init__(self, meta, conn):
+        self.meta = meta
+        self.conn = conn
+        # sqlite3 连接不能被多个线程同时使用
+        self.lock = threading.Lock()
+
+
+class EmbeddedSQLiteBackend(PracticeBackend):
+    """进程内SQLite后端：每个实例是从预先构建的模板库克隆出的独立数据库
+
+    模板按难度从初始化脚本构建一次，克隆通过 SQLite 在线备份完成，只需几毫秒。
+    未配置数据目录时实例保存在内存中，服务重启后丢失；
+    配置数据目录时每个实例保存为一个文件，元数据写在同名的 .json 文件中。
+    """
+
+    name = "embedded"
+    ID_PREFIX = "embedded-"
+    embedded = True
+
+    def __init__(self, service, data_dir="", max_instances=500):
+        self.service = service
+        self.data_dir = data_dir
+        self.max_instances = max_instances
+        self._templates = {}  # 难度 -> (脚本哈希, 模板连接)
+        self._instances = {}
+        self._reserved = 0  # 已通过上限检查、正在克隆模板的实例数
+        self._lock = threading.Lock()
+
+    async def start(self):
+        if self.data_dir:
+            await self.service._run_db(self._load_instances)
+
+    async def stop(self):
+        await self.service._run_db(self._close_all)
+
+    def _connect(self, path=":memory:"):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        register_mysql_functions(conn)
+        return conn
+
+    def _template(self, difficulty):
+        """返回当前初始化脚本对应的模板库，脚本变化时重新构建"""
+        init_script = self.service._read_init_script(difficulty)
+        digest = hashlib.sha256(init_script.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._templates.get(difficulty)
+            if cached and cached[0] == digest:
+                return cached[1]
+            template = self._connect()
+            template.executescript(mysql_to_sqlite(init_script))
+            template.commit()
+            self._templates[difficulty] = (digest, template)
+            if cached:
+                cached[1].close()
+            return template
+
+    def _clone(self, difficulty, target):
+        template = self._template(difficulty)
+        # 模板连接被多个线程共享，备份时加锁
+        with self._lock:
+            template.backup(target)
+
+    def _path(self, database_id, suffix=".db"):
+        return os.path.join(self.data_dir, f"{database_id}{suffix}")
+
+    def _format_instance(self, meta):
+        return {
+            "id": meta["id"],
+            "name": meta["db_name"],
+            "user_id": meta["user_id"],
+            "username": meta["username"],
+            "dbName": meta["db_name"],
+            "status": "running",
+            "created": meta["created_at"],
+            "expiresAt": meta["expires_at"],
+            "difficulty": meta["difficulty"],
+            "engine": "sqlite",
+            "port": None
+        }
+
+    async def create_database(self, user_id, username, db_name, difficulty, expires_at):
+        meta = await self.service._run_db(
+            self._create_sync, user_id, username, db_name, difficulty, expires_at
+        )
+        return self._format_instance(meta)
+
+    def _create_sync(self, user_id, username, db_name, difficulty, expires_at):
+        # 检查上限和占用名额在同一临界区内完成，并发创建不会超出上限
+        with self._lock:
+            if len(self._instances) + self._reserved >= self.max_instances:
+                raise Exception("内嵌练习库数量已达上限")
+            self._reserved += 1
+
+        try:
+            database_id = f"{self.ID_PREFIX}{uuid.uuid4().hex[:12]}"
+            meta = {
+                "id": database_id,
+                "user_id": str(user_id),
+                "username": username,
+                "db_name": db_name,
+                "difficulty": difficulty,
+                "created_at": datetime.now().isoformat(),
+                "expires_at": expires_at.isoformat()
+            }
+            conn = self._connect(self._path(database_id) if self.data_dir else ":memory:")
+            try:
+                self._clone(difficulty, conn)
+            except Exception:
+                conn.close()
+                self._remove_files(database_id)
+                raise
+
+            with self._lock:
+                self._instances[database_id] = _Instance(meta, conn)
+                self._reserved -= 1
+        except Exception:
+            with self._lock:
+                self._reserved -= 1
+            raise
+        self._save_meta(meta)
+        if self.service.metrics:
+            self.service.metrics.incr(f"embedded.created.{difficulty}")
+        return meta
+
+    def _get(self, database_id):
+        instance = self._instances.get(database_id)
+        if not instance:
+            raise Exception("数据库实例不存在")
+        return instance
+
+    async def get_database_info(self, database_id):
+        instance = self._instances.get(database_id)
+        return self._format_instance(instance.meta) if instance else None
+
+    async def get_user_database(self, user_id):
+        metas = [
+            instance.meta for instance in list(self._instances.values())
+            if instance.meta["user_id"] == str(user_id)
+        ]
+        if not metas:
+            return None
+        return self._format_instance(max(metas, key=lambda meta: meta["created_at"]))
+
+    async def reset_database(self, database_id, difficulty="easy"):
+        """用模板覆盖实例数据"""
+        await self.service._run_db(self._reset_sync, database_id, difficulty)
+        return True
+
+    def _reset_sync(self, database_id, difficulty):
+        instance = self._get(database_id)
+        with instance.lock:
+            instance.conn.rollback()
+            self._clone(instance.meta["difficulty"] or difficulty, instance.conn)
+
+    async def delete_database(self, database_id):
+        return await self.service._run_db(self._delete_sync, database_id)
+
+    def _delete_sync(self, database_id):
+        with self._lock:
+            instance = self._instances.pop(database_id, None)
+        if instance:
+            with instance.lock:
+                instance.conn.close()
+        self._remove_files(database_id)
+        return True
+
+    async def cleanup_user_databases(self, user_id):
+        for database_id, instance in list(self._instances.items()):
+            if instance.meta["user_id"] == str(user_id):
+                await self.delete_database(database_id)
+        return True
+
+    async def list_leases(self):
+        return [(database_id, instance.meta["expires_at"]) for database_id, instance in list(self._instances.items())]
+
+    async def update_expiry(self, database_id, expires_at):
+        instance = self._instances.get(database_id)
+        if instance:
+            instance.meta["expires_at"] = expires_at.isoformat()
+            await self.service._run_db(self._save_meta, instance.meta)
+
+    def execute_sync(self, database_id, sql, query, fingerprint=None, max_rows=None, max_bytes=None):
+        """在数据库线程池中执行查询，返回与MySQL查询相同结构的结果"""
+        instance = self._get(database_id)
+        governor = self.service.governor
+        limiter = ResultLimiter(max_rows, max_bytes)
+        sql = rewrite_command(sql)
+        with instance.lock:
+            conn = instance.conn
+            try:
+                governor.attach_interrupt(query, conn.interrupt)
+                start_time = datetime.now()
+                cursor = conn.execute(sql)
+                end_time = datetime.now()
+
+                results = None
+                columns = []
+                affected_rows = 0
+                if cursor.description:  # SELECT查询
+                    columns = [column[0] for column in cursor.description]
+                    results = []
+                    if fingerprint:
+                        fingerprint.set_columns(columns)
+                    total_rows = 0
+                    # 进程内读取很快，超出上限的行继续读完以得到准确的总行数
+                    for chunk in iter(lambda: cursor.fetchmany(500), []):
+                        for values in chunk:
+                            row = dict(zip(columns, values))
+                            total_rows += 1
+                            if fingerprint:
+                                fingerprint.update(row)
+                            if not limiter.truncated and limiter.accept(len(encode_line(row))):
+                                results.append(row)
+                else:  # INSERT, UPDATE, DELETE等
+                    affected_rows = max(cursor.rowcount, 0)
+                    conn.commit()
+                cursor.close()
+            except sqlite3.Error as e:
+                conn.rollback()
+                translated = governor.translate(query, e)
+                if translated is not e:
+                    raise translated from e
+                raise self._dialect_error(sql, e) from e
+            finally:
+                governor.detach(query)
+
+        return {
+            "results": results,
+            "columns": columns,
+            "affected_rows": affected_rows,
+            "execution_time": (end_time - start_time).total_seconds() * 1000,
+            "truncated": limiter.truncated,
+            "total_rows_hint": total_rows if results is not None else None
+        }
+
+    def execute_script_sync(self, database_id, statements, query, transaction=False, max_rows=None, max_bytes=None):
+        """在数据库线程池中依次执行脚本中的语句，遇到第一个错误即停止，返回 ScriptResult"""
+        instance = self._get(database_id)
+        governor = self.service.governor
+        script = ScriptResult(statements, transaction)
+        limiter = ResultLimiter(max_rows, max_bytes)
+        with instance.lock:
+            conn = instance.conn
+            governor.attach_interrupt(query, conn.interrupt)
+            try:
+                for statement in statements:
+                    start_time = time.perf_counter()
+                    try:
+                        cursor = conn.execute(rewrite_command(statement))
+                        results = None
+                        columns = None
+                        row_count = 0
+                        affected_rows = 0
+                        if cursor.description:
+                            columns = [column[0] for column in cursor.description]
+                            results = []
+                            for chunk in iter(lambda: cursor.fetchmany(500), []):
+                                for values in chunk:
+                                    row = dict(zip(columns, values))
+                                    row_count += 1
+                                    if not limiter.truncated and limiter.accept(len(encode_line(row))):
+                                        results.append(row)
+                        else:
+                            affected_rows = max(cursor.rowcount, 0)
+                            if not transaction:
+                                conn.commit()
+                        cursor.close()
+                    except sqlite3.Error as e:
+                        translated = governor.translate(query, e)
+                        if translated is not e:
+                            conn.rollback()
+                            raise translated from e
+                        if not transaction:
+                            conn.rollback()
+                        script.error(self._dialect_error(statement, e), (time.perf_counter() - start_time) * 1000)
+                        break
+                    script.ok(results, columns, row_count, affected_rows, (time.perf_counter() - start_time) * 1000)
+
+                if transaction:
+                    if script.failed:
+                        conn.rollback()
+                        script.rolled_back = True
+                    else:
+                        conn.commit()
+            finally:
+                governor.detach(query)
+        return script
+
+    def _dialect_error(self, sql, error):
+        """SQL执行失败时检查是否使用了SQLite不支持的MySQL语法，给出明确提示"""
+        for pattern, feature in MYSQL_ONLY_SYNTAX:
+            if pattern.search(sql):
+                return DialectError(f"当前练习库使用SQLite引擎，不支持MySQL语法：{feature}（{error}）")
+        return DialectError(f"SQL执行错误（当前练习库使用SQLite引擎，部分MySQL语法不可用）：{error}")
+
+    def compute_reference(self, difficulty, init_script):
+        """在模板的内存副本上运行参考答案"""
+        conn = self._connect()
+        try:
+            self._clone(difficulty, conn)
+
+            def fetch(sql):
+                cursor = conn.execute(sql)
+                columns = [column[0] for column in cursor.description]
+                return columns, iter_rows(cursor, columns=columns)
+
+            return self.service.grader.reference_fingerprints(difficulty, fetch)
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {"instances": len(self._instances), "templates": len(self._templates)}
+
+    def _save_meta(self, meta):
+        if not self.data_dir:
+            return
+        tmp_path = self._path(meta["id"], ".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(meta["id"], ".json"))
+
+    def _remove_files(self, database_id):
+        if not self.data_dir:
+            return
+        for suffix in (".db", ".db-journal", ".json"):
+            try:
+                os.remove(self._path(database_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _load_instances(self):
+        """创建数据目录并重新打开其中已有的实例"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        for filename in os.listdir(self.data_dir):
+            if not filename.startswith(self.ID_PREFIX) or not filename.endswith(".json"):
+                continue
+            database_id = filename[:-len(".json")]
+            if database_id in self._instances or not os.path.exists(self._path(database_id)):
+                continue
+            try:
+                with open(self._path(database_id, ".json"), "r") as f:
+                    meta = json.load(f)
+                self._instances[database_id] = _Instance(meta, self._connect(self._path(database_id)))
+            except Exception as e:
+                print(f"Error loading embedded practice database {database_id}: {e}")
+
+    def _close_all(self):
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+            templates = [template for _, template in self._templates.values()]
+            self._templates.clear()
+        for instance in instances:
+            with instance.lock:
+                instance.conn.close()
+        for template in templates:
+            template.close()
@@ -0,0 +1,198 @@
+import time
+import asyncio
+from datetime import datetime, timedelta
+
+from src.services.sql_practice_docker import memory_usage, cpu_times
+
+# 占用内存的容器状态（stop 方式休眠的容器不占内存）
+RESIDENT_STATUSES = ("running", "paused")
+
+
+class MemoryEvictor:
+    """内存压力下按最近最少使用（LRU）回收空闲实例
+
+    定期通过stats接口采样每个练习容器的内存和CPU占用。容器总内存超过预算的
+    high_watermark 时，从最久未使用的空闲实例开始回收，直到降到 low_watermark 以下；
+    创建实例前也会先腾出新容器需要的内存，避免创建在内存耗尽的主机上失败。
+    预热池容器由预热池维护，不在回收范围内；正在执行查询或 min_idle 秒内有活动的实例不回收。
+    """
+
+    def __init__(self, service, budget_bytes, high_watermark=0.9, low_watermark=0.8, min_idle=300.0,
+                 sample_interval=15.0, concurrency=8, default_container_bytes=512 * 1024 * 1024,
+                 notice_ttl=timedelta(days=1), metrics=None):
+        self.service = service
+        self.budget_bytes = budget_bytes
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.min_idle = min_idle
+        self.sample_interval = sample_interval
+        self.concurrency = concurrency
+        self.default_container_bytes = default_container_bytes
+        self.notice_ttl = notice_ttl
+        self.metrics = metrics
+
+        self._usage = {}  # 容器ID -> {"memory", "cpu", "cpuTimes", "sampledAt"}
+        self._last_active = {}  # 容器ID -> 最近活动时间（monotonic）
+        self._notices = {}  # 用户ID -> 回收通知，实例存储未启用时使用
+        self._lock = None
+        self._task = None
+        self._last_purge = 0.0
+
+    async def start(self):
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def mark_active(self, container_id):
+        self._last_active[container_id] = time.monotonic()
+
+    def forget(self, container_id):
+        self._last_active.pop(container_id, None)
+        self._usage.pop(container_id, None)
+
+    def usage_bytes(self):
+        return sum(entry["memory"] for entry in self._usage.values())
+
+    def notice_for(self, user_id):
+        """用户最近被回收的实例通知，没有时返回None"""
+        notice = self._notices.get(str(user_id))
+        if notice and datetime.fromisoformat(notice["evictedAt"]) + self.notice_ttl < datetime.now():
+            self._notices.pop(str(user_id), None)
+            return None
+        return notice
+
+    def clear_notice(self, user_id):
+        self._notices.pop(str(user_id), None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sample_interval)
+            try:
+                await self.sample()
+                await self.enforce()
+                if time.monotonic() - self._last_purge >= 600:
+                    self._last_purge = time.monotonic()
+                    await self.service._store_call("purge_status", "evicted", datetime.now() - self.notice_ttl)
+            except Exception as e:
+                print(f"Error enforcing memory budget: {e}")
+
+    async def sample(self):
+        """采样所有占用内存的练习容器"""
+        records = [record for record in self.service.registry.all() if record["status"] in RESIDENT_STATUSES]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sample_one(container_id):
+            async with semaphore:
+                try:
+                    return container_id, await self.service.docker.stats(container_id)
+                except Exception as e:
+                    print(f"Error sampling container {container_id}: {e}")
+                    return container_id, None
+
+        results = await asyncio.gather(*(sample_one(record["id"]) for record in records))
+        now = time.monotonic()
+        usage = {}
+        for container_id, stats in results:
+            if stats is None:
+                continue
+            times = cpu_times(stats)
+            cpu = 0.0
+            previous = self._usage.get(container_id)
+            if previous:
+                cpu_delta = times[0] - previous["cpuTimes"][0]
+                system_delta = times[1] - previous["cpuTimes"][1]
+                if cpu_delta > 0 and system_delta > 0:
+                    cpu = round(cpu_delta / system_delta * times[2] * 100, 2)
+            usage[container_id] = {"memory": memory_usage(stats), "cpu": cpu, "cpuTimes": times, "sampledAt": now}
+        self._usage = usage
+        if self.metrics:
+            self.metrics.set_gauge("eviction.memory_bytes", self.usage_bytes())
+            self.metrics.set_gauge("eviction.cpu_percent", round(sum(entry["cpu"] for entry in usage.values()), 2))
+        return usage
+
+    async def enforce(self):
+        """总内存超过高水位时回收到低水位以下，返回回收的实例数"""
+        if self.usage_bytes() <= self.budget_bytes * self.high_watermark:
+            return 0
+        return await self._evict_until(self.budget_bytes * self.low_watermark, reason="memory_pressure")
+
+    async def make_room(self, needed_bytes=None):
+        """创建实例前腾出内存，回收后仍不足时返回False（仍可尝试创建）"""
+        needed = needed_bytes or self._expected_container_bytes()
+        if self.usage_bytes() + needed <= self.budget_bytes:
+            return True
+        await self._evict_until(self.budget_bytes - needed, reason="capacity")
+        return self.usage_bytes() + needed <= self.budget_bytes
+
+    def has_room(self, needed_bytes=None):
+        """不回收任何实例时能否再容纳一个新容器（如用于补充预热池）"""
+        needed = needed_bytes or self._expected_container_bytes()
+        return self.usage_bytes() + needed <= self.budget_bytes * self.high_watermark
+
+    def stats(self):
+        return {
+            "budgetBytes": self.budget_bytes,
+            "usageBytes": self.usage_bytes(),
+            "containers": len(self._usage),
+            "cpuPercent": round(sum(entry["cpu"] for entry in self._usage.values()), 2),
+        }
+
+    def _expected_container_bytes(self):
+        """新容器预计占用的内存：配置了内存上限时按上限，否则按已有容器的平均值"""
+        if self.service.container_mem_limit:
+            return self.service.container_mem_limit
+        if self._usage:
+            return self.usage_bytes() // len(self._usage)
+        return self.default_container_bytes
+
+    async def _evict_until(self, target_bytes, reason):
+        # 同一时间只有一轮回收，避免多个创建请求同时回收过多实例
+        async with self._lock:
+            evicted = 0
+            for container_id in self._candidates():
+                if self.usage_bytes() <= target_bytes:
+                    break
+                try:
+                    await self.service._evict_database(container_id, reason)
+                except Exception as e:
+                    print(f"Error evicting container {container_id}: {e}")
+                    continue
+                self._usage.pop(container_id, None)
+                evicted += 1
+            if evicted and self.metrics:
+                self.metrics.incr(f"eviction.evicted.{reason}", evicted)
+                self.metrics.set_gauge("eviction.memory_bytes", self.usage_bytes())
+            return evicted
+
+    def _candidates(self):
+        """可回收的实例，最久未使用的在前"""
+        now = time.monotonic()
+        candidates = []
+        for container_id in self._usage:
+            record = self.service.registry.get(container_id)
+            if not record or not record["labels"].get("user_id"):
+                continue
+            # 服务启动前就存在的容器从现在开始计时
+            last_active = self._last_active.setdefault(container_id, now)
+            if now - last_active < self.min_idle or self.service.governor.is_busy(container_id):
+                continue
+            candidates.append((last_active, container_id))
+        return [container_id for _, container_id in sorted(candidates)]
+
+    def record_notice(self, record, reason):
+        """记录回收通知，返回通知内容"""
+        labels = record["labels"]
+        notice = {
+            "databaseId": record["id"],
+            "dbName": labels.get("db_name"),
+            "difficulty": labels.get("difficulty"),
+            "reason": reason,
+            "evictedAt": datetime.now().isoformat(),
+        }
+        self._notices[labels["user_id"]] = notice
+        return notice
@@ -0,0 +1,196 @@
+import uuid
+import sqlite3
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+# 查询被 KILL QUERY 中断 / 超过 MAX_EXECUTION_TIME
+ER_QUERY_INTERRUPTED = 1317
+ER_QUERY_TIMEOUT = 3024
+
+
+class QueryLimitExceeded(Exception):
+    """用户同时执行的查询数超过上限"""
+
+
+class QueryTimeout(Exception):
+    """查询超过时间限制被终止"""
+
+
+class QueryCancelled(Exception):
+    """查询被用户取消"""
+
+
+class _RunningQuery:
+    def __init__(self, database_id, conn_params):
+        self.token = uuid.uuid4().hex
+        self.database_id = database_id
+        self.conn_params = conn_params
+        self.connection_id = None
+        self.interrupt = None  # 内嵌引擎的中断函数，代替 KILL QUERY
+        self.reason = None  # "timeout" / "cancelled"
+        self.timer = None
+        # KILL 与连接归还互斥，避免误杀归还后被其他查询复用的连接
+        self.lock = threading.Lock()
+
+
+class QueryGovernor:
+    """限制练习查询的执行时间和每个用户的并发查询数，并支持取消正在执行的查询
+
+    超时由两层保证：SELECT 语句在MySQL侧设置 max_execution_time，
+    其他语句（以及流式读取阶段）到期后通过另一条连接执行 KILL QUERY。
+    并发计数只在当前进程内有效。
+    """
+
+    def __init__(self, timeout, max_per_user, metrics=None):
+        self.timeout = timeout
+        self.max_per_user = max_per_user
+        self.metrics = metrics
+        self._active = {}  # 用户ID -> 正在执行的查询数
+        self._running = {}  # token -> _RunningQuery
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def slot(self, user_id):
+        """在查询期间占用用户的一个名额"""
+        self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    def acquire(self, user_id):
+        """占用用户的一个查询名额，超过上限时直接拒绝而不是排队"""
+        if user_id is None or not self.max_per_user:
+            return
+        key = str(user_id)
+        if self._active.get(key, 0) >= self.max_per_user:
+            self._record("query.rejected")
+            raise QueryLimitExceeded(f"同时执行的查询不能超过 {self.max_per_user} 个")
+        self._active[key] = self._active.get(key, 0) + 1
+
+    def release(self, user_id):
+        if user_id is None or not self.max_per_user:
+            return
+        key = str(user_id)
+        self._active[key] -= 1
+        if not self._active[key]:
+            del self._active[key]
+
+    def begin(self, database_id, conn_params):
+        """登记一个查询并在到期时终止它，返回查询句柄"""
+        query = _RunningQuery(database_id, conn_params)
+        with self._lock:
+            self._running[query.token] = query
+        if self.timeout:
+            query.timer = asyncio.get_running_loop().call_later(self.timeout, self._expire, query)
+        self._gauge()
+        return query
+
+    def end(self, query):
+        if query.timer:
+            query.timer.cancel()
+        with self._lock:
+            self._running.pop(query.token, None)
+        self._gauge()
+
+    def attach(self, query, conn):
+        """在数据库线程中记录查询所用的连接，并设置服务端执行时间上限"""
+        if query.reason:
+            # 排队等待线程期间已超时或被取消
+            raise self.translate(query, None)
+        with query.lock:
+            query.connection_id = conn.connection_id
+        if self.timeout:
+            cursor = conn.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {int(self.timeout * 1000)}")
+            cursor.close()
+
+    def attach_interrupt(self, query, interrupt):
+        """内嵌引擎的查询：到期或取消时调用 interrupt 中断执行"""
+        if query.reason:
+            raise self.translate(query, None)
+        with query.lock:
+            query.interrupt = interrupt
+
+    def detach(self, query):
+        """连接归还前调用，之后不会再对该连接执行 KILL"""
+        with query.lock:
+            query.connection_id = None
+            query.interrupt = None
+
+    async def cancel(self, database_id):
+        """取消实例上正在执行的全部查询，返回取消的数量"""
+        with self._lock:
+            queries = [query for query in self._running.values() if query.database_id == database_id]
+        for query in queries:
+            query.reason = query.reason or "cancelled"
+        killed = await asyncio.gather(*(self._kill(query) for query in queries))
+        self._record("query.cancelled", sum(killed))
+        return sum(killed)
+
+    def is_busy(self, database_id):
+        """实例上是否有正在执行的查询"""
+        with self._lock:
+            return any(query.database_id == database_id for query in self._running.values())
+
+    def translate(self, query, error):
+        """把被中断查询的MySQL错误转换为超时或取消异常，其余错误原样返回"""
+        if error is not None and not self.is_interrupted(error):
+            return error
+        if query.reason == "timeout" or getattr(error, "errno", None) == ER_QUERY_TIMEOUT:
+            return QueryTimeout(f"查询执行超过 {self.timeout:g} 秒，已被终止")
+        return QueryCancelled("查询已被取消")
+
+    def is_interrupted(self, error):
+        if isinstance(error, sqlite3.OperationalError):
+            return str(error) == "interrupted"
+        return isinstance(error, mysql_errors.Error) and error.errno in (ER_QUERY_INTERRUPTED, ER_QUERY_TIMEOUT)
+
+    def _expire(self, query):
+        query.reason = query.reason or "timeout"
+        self._record("query.timeout")
+        asyncio.ensure_future(self._kill(query))
+
+    async def _kill(self, query):
+        # 不走数据库线程池：池可能正被失控的查询占满
+        return await asyncio.to_thread(self._kill_sync, query)
+
+    def _kill_sync(self, query):
+        with query.lock:
+            if query.interrupt:
+                query.interrupt()
+                return True
+            if query.connection_id is None:
+                return False
+            # 用户总可以终止自己账号的线程，无需额外权限
+            try:
+                conn = mysql.connector.connect(**query.conn_params)
+            except Exception as e:
+                print(f"Error connecting to kill query {query.token}: {e}")
+                return False
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"KILL QUERY {int(query.connection_id)}")
+                cursor.close()
+                return True
+            except Exception as e:
+                print(f"Error killing query {query.token}: {e}")
+                return False
+            finally:
+                conn.close()
+
+    def stats(self):
+        with self._lock:
+            running = len(self._running)
+        return {"running": running, "activeUsers": len(self._active)}
+
+    def _gauge(self):
+        if self.metrics:
+            self.metrics.set_gauge("query.running", len(self._running))
+
+    def _record(self, name, value=1):
+        if self.metrics and value:
+            self.metrics.incr(name, value)
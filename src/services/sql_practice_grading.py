@@ -0,0 +1,303 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta
+import mysql.connector
+
+# 修改规范化规则后需要递增，使已缓存的指纹失效
+GRADER_VERSION = "1"
+
+# 各难度题目的参考答案
+# ordered: 题目要求排序时按行顺序比较，否则忽略行顺序
+# ignore_columns: 不参与比较的列（如初始化时写入的时间戳）
+REFERENCE_QUERIES = {
+    "easy": {
+        1: {
+            "sql": "SELECT id, name, email FROM users",
+        },
+        2: {
+            "sql": "SELECT * FROM users WHERE age > 25",
+            "ignore_columns": ["created_at"],
+        },
+    },
+    "medium": {
+        1: {
+            "sql": (
+                "SELECT u.id, u.name, SUM(o.amount) AS total_amount "
+                "FROM users u JOIN orders o ON o.user_id = u.id "
+                "GROUP BY u.id, u.name"
+            ),
+        },
+    },
+    "hard": {
+        1: {
+            "sql": (
+                "SELECT u.id, u.name, e.id AS employee_id, e.salary "
+                "FROM users u JOIN employees e ON e.user_id = u.id "
+                "WHERE e.salary > 20000"
+            ),
+        },
+    },
+}
+
+
+def canonical_value(value):
+    """规范化单个值：数值统一为去掉多余零的十进制字符串，使 300.5、300.50 和 Decimal('300.50') 相等"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float, Decimal)):
+        number = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+        return ["n", format(number.normalize(), "f")]
+    if isinstance(value, timedelta):
+        return ["n", format(Decimal(str(value.total_seconds())).normalize(), "f")]
+    if isinstance(value, (datetime, date, time)):
+        return ["t", value.isoformat()]
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, set):
+        return ["s", ",".join(sorted(value))]
+    return ["s", str(value)]
+
+
+def iter_rows(cursor, batch_size=1000, columns=None):
+    """用 fetchmany 分批读取结果并逐行产出，读完后关闭游标；指定 columns 时把元组行转换为字典"""
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row)) if columns is not None else row
+    finally:
+        cursor.close()
+
+
+class ResultFingerprint:
+    """结果集的流式指纹，逐行更新，只占用常数内存
+
+    列按名称（不区分大小写）排序，与SELECT中的列顺序无关。
+    不要求顺序时使用行哈希之和（多重集合哈希），要求顺序时使用链式哈希。
+    """
+
+    MODULUS = 1 << 256
+
+    def __init__(self, ordered=False, ignore_columns=()):
+        self.ordered = ordered
+        self.ignore_columns = {column.lower() for column in ignore_columns}
+        self.columns = None
+        self.rows = 0
+        self._chain = hashlib.sha256()
+        self._sum = 0
+
+    def set_columns(self, columns):
+        self.columns = sorted(
+            column.lower() for column in columns if column.lower() not in self.ignore_columns
+        )
+
+    def update(self, row):
+        values = {
+            column.lower(): canonical_value(value)
+            for column, value in row.items()
+            if column.lower() not in self.ignore_columns
+        }
+        if self.columns is None:
+            self.set_columns(row.keys())
+        encoded = json.dumps([values.get(column) for column in self.columns], ensure_ascii=False)
+        row_digest = hashlib.sha256(encoded.encode("utf-8")).digest()
+        if self.ordered:
+            self._chain.update(row_digest)
+        else:
+            self._sum = (self._sum + int.from_bytes(row_digest, "big")) % self.MODULUS
+        self.rows += 1
+
+    def result(self):
+        digest = self._chain.hexdigest() if self.ordered else f"{self._sum:064x}"
+        return {"columns": self.columns or [], "rows": self.rows, "digest": digest}
+
+    def matches(self, expected):
+        return bool(expected) and self.result() == expected
+
+
+class GradingPending(Exception):
+    """题目的预期结果尚未计算完成（已在后台计算），稍后重新提交即可判题"""
+
+
+class GradingEngine:
+    """按参考答案判题：预期指纹在原始数据集上计算一次，按数据集版本缓存到内存和磁盘
+
+    预期指纹在后台任务中计算，不占用用户查询的并发名额和时间上限；尚未计算完成时
+    判题请求得到 GradingPending。
+    """
+
+    def __init__(self, service, cache_path, metrics=None):
+        self.service = service
+        self.cache_path = cache_path
+        self.metrics = metrics
+        self._cache = {}
+        self._computing = {}  # 缓存键 -> 正在计算的后台任务
+        self._data_digests = {}  # 数据文件路径 -> 内容哈希
+        self._save_lock = asyncio.Lock()
+
+    async def start(self):
+        """在线程中读取磁盘缓存"""
+        loaded = await asyncio.to_thread(self._read_cache)
+        self._cache = {**loaded, **self._cache}
+
+    async def stop(self):
+        tasks = list(self._computing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def question(self, difficulty, question_id):
+        try:
+            return REFERENCE_QUERIES.get(difficulty, {}).get(int(question_id))
+        except (TypeError, ValueError):
+            return None
+
+    def fingerprint(self, spec):
+        """为用户查询创建与参考答案同样规则的指纹"""
+        return ResultFingerprint(spec.get("ordered", False), spec.get("ignore_columns", ()))
+
+    def dataset_version(self, difficulty, init_script, variant=None, data_files=()):
+        """初始化脚本、数据文件、参考答案、规范化规则或生成的数据集变化时版本随之变化"""
+        digest = hashlib.sha256()
+        catalog = json.dumps(REFERENCE_QUERIES.get(difficulty, {}), sort_keys=True)
+        for part in (GRADER_VERSION, init_script, catalog, variant or "", self._data_digest(data_files)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    def _data_digest(self, data_files):
+        """数据文件的表名和内容哈希，进程内每个文件只读取一次"""
+        digest = hashlib.sha256()
+        for table, path in data_files:
+            file_digest = self._data_digests.get(path)
+            if file_digest is None:
+                file_hash = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        file_hash.update(chunk)
+                file_digest = self._data_digests[path] = file_hash.hexdigest()
+            digest.update(f"{table}\0{file_digest}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def expected(self, difficulty, question_id, compute, engine="mysql", variant=None, rows=None):
+        """获取题目的预期指纹，当前版本未缓存时在后台计算该难度的全部题目并抛出 GradingPending
+
+        compute(difficulty, init_script) 在数据库线程池中执行，返回 {题目ID: 指纹}。
+        不同引擎的类型和计算结果可能不同，缓存按引擎区分；variant 区分同一难度的不同规模数据集，
+        rows 为该数据集的行数，其数据文件内容计入版本。
+        """
+        cache_key, version = await self._cache_key(difficulty, engine, variant, rows)
+        entry = self._cache.get(cache_key)
+        if entry and entry["version"] == version:
+            return entry["fingerprints"].get(str(int(question_id)))
+        await self.precompute(difficulty, compute, engine, variant, rows)
+        raise GradingPending("参考答案正在计算，请稍后重新提交")
+
+    async def precompute(self, difficulty, compute, engine="mysql", variant=None, rows=None):
+        """当前版本未缓存且没有在计算时启动后台计算，返回计算任务（已缓存时为None）"""
+        cache_key, version = await self._cache_key(difficulty, engine, variant, rows)
+        entry = self._cache.get(cache_key)
+        if entry and entry["version"] == version:
+            return None
+        task = self._computing.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._compute(cache_key, version, difficulty, compute, engine))
+            self._computing[cache_key] = task
+            task.add_done_callback(lambda _: self._computing.pop(cache_key, None))
+        return task
+
+    async def _cache_key(self, difficulty, engine, variant, rows=None):
+        init_script = self.service._read_init_script(difficulty)
+        # 列出数据文件可能需要先生成数据集，首次计算文件哈希需要读取整个文件，在线程中执行
+        version = await asyncio.to_thread(
+            lambda: self.dataset_version(difficulty, init_script, variant, self.service._data_files(difficulty, rows))
+        )
+        return f"{engine}:{difficulty}" + (f":{variant}" if variant else ""), version
+
+    async def _compute(self, cache_key, version, difficulty, compute, engine):
+        init_script = self.service._read_init_script(difficulty)
+        try:
+            fingerprints = await self.service._run_db(compute, difficulty, init_script)
+        except Exception as e:
+            # 下一次判题请求会重新启动计算
+            print(f"Error computing expected results ({cache_key}): {e}")
+            if self.metrics:
+                self.metrics.incr(f"grading.failed.{engine}.{difficulty}")
+            return
+        self._cache[cache_key] = {"version": version, "fingerprints": fingerprints}
+        await self._save_cache()
+        if self.metrics:
+            self.metrics.incr(f"grading.computed.{engine}.{difficulty}")
+
+    def reference_fingerprints(self, difficulty, fetch):
+        """运行该难度的全部参考答案；fetch(sql) 返回 (列名, 按字典产出行的迭代器)，迭代器需读完"""
+        fingerprints = {}
+        for question_id, spec in REFERENCE_QUERIES.get(difficulty, {}).items():
+            fingerprint = self.fingerprint(spec)
+            columns, rows = fetch(spec["sql"])
+            fingerprint.set_columns(columns)
+            for row in rows:
+                fingerprint.update(row)
+            fingerprints[str(question_id)] = fingerprint.result()
+        return fingerprints
+
+    def compute_mysql(self, admin_params, difficulty, init_script, rows=None):
+        """在临时库中执行初始化脚本得到原始数据集，运行参考答案后删除临时库"""
+        database = f"sql_practice_ref_{uuid.uuid4().hex[:12]}"
+        conn = mysql.connector.connect(**admin_params)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"CREATE DATABASE `{database}`")
+            self.service._run_init_script_sync(
+                admin_params["host"], admin_params["port"], admin_params["user"],
+                admin_params["password"], database, init_script,
+                self.service._data_files(difficulty, rows)
+            )
+            conn.database = database
+
+            def fetch(sql):
+                # 非缓冲游标：大数据集上的参考结果边读边计算指纹，不整体载入内存
+                query_cursor = conn.cursor(dictionary=True)
+                query_cursor.execute(sql)
+                return query_cursor.column_names, iter_rows(query_cursor)
+
+            return self.reference_fingerprints(difficulty, fetch)
+        finally:
+            try:
+                cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            except Exception as e:
+                print(f"Error dropping reference database {database}: {e}")
+            cursor.close()
+            conn.close()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading grading cache: {e}")
+        return {}
+
+    async def _save_cache(self):
+        content = json.dumps(self._cache)
+        async with self._save_lock:
+            try:
+                await asyncio.to_thread(self._write_cache, content)
+            except Exception as e:
+                print(f"Error saving grading cache: {e}")
+
+    def _write_cache(self, content):
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,172 @@
+import time
+import asyncio
+import docker
+
+from src.services.sql_practice_docker import memory_usage
+
+HIBERNATE_MODES = ("pause", "stop")
+
+
+class IdleHibernator:
+    """空闲实例休眠：超过空闲时间的练习容器被暂停或停止，下次使用时透明恢复
+
+    pause：冻结容器内的进程，恢复在毫秒级，内存仍然被占用（可被换出）；
+    stop：停止容器释放全部内存，数据保存在容器文件系统中，恢复需要重新启动MySQL。
+    """
+
+    def __init__(self, service, idle_after, mode="pause", check_interval=30.0, concurrency=4, metrics=None):
+        if mode not in HIBERNATE_MODES:
+            raise ValueError(f"无效的休眠方式: {mode}")
+        self.service = service
+        self.idle_after = idle_after
+        self.mode = mode
+        self.check_interval = check_interval
+        self.concurrency = concurrency
+        self.metrics = metrics
+
+        self._last_active = {}  # 容器ID -> 最近活动时间（monotonic）
+        self._hibernated = {}  # 容器ID -> {"mode", "since", "memory"}
+        self._locks = {}
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def mark_active(self, container_id):
+        self._last_active[container_id] = time.monotonic()
+
+    def forget(self, container_id):
+        """实例被删除后清除记录"""
+        self._last_active.pop(container_id, None)
+        self._hibernated.pop(container_id, None)
+        self._locks.pop(container_id, None)
+        self._gauge()
+
+    def is_hibernated(self, container_id):
+        return container_id in self._hibernated
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.hibernate_idle()
+            except Exception as e:
+                print(f"Error hibernating idle instances: {e}")
+
+    async def hibernate_idle(self):
+        """休眠所有空闲超时的已分配容器，返回休眠的数量"""
+        now = time.monotonic()
+        candidates = []
+        for record in self.service.registry.all():
+            if record["status"] != "running" or not record["labels"].get("user_id"):
+                continue
+            # 服务启动前就存在的容器从现在开始计时
+            if now - self._last_active.setdefault(record["id"], now) >= self.idle_after:
+                candidates.append(record["id"])
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def hibernate(container_id):
+            async with semaphore:
+                try:
+                    return await self.hibernate(container_id)
+                except Exception as e:
+                    print(f"Error hibernating container {container_id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(hibernate(container_id) for container_id in candidates))
+        return sum(results)
+
+    async def hibernate(self, container_id):
+        async with self._lock_for(container_id):
+            last_active = self._last_active.get(container_id, 0)
+            if time.monotonic() - last_active < self.idle_after or container_id in self._hibernated:
+                return False
+            if self.service.governor.is_busy(container_id):
+                return False
+            if self.mode == "stop" and self.service._has_uncommitted_session(container_id):
+                # 停止会丢失会话事务中未提交的修改
+                return False
+
+            memory = await self._memory_usage(container_id)
+            if self.mode == "stop":
+                await self.service._run_db(self.service._close_query_connections, container_id)
+                await self.service._stop_container(container_id, timeout=10)
+            else:
+                await self.service.docker.pause(container_id)
+            self._hibernated[container_id] = {"mode": self.mode, "since": time.time(), "memory": memory}
+        self._record("hibernation.paused" if self.mode == "pause" else "hibernation.stopped")
+        self._gauge()
+        return True
+
+    async def resume(self, record):
+        """恢复暂停或停止的容器，返回恢复后的注册表记录；多个请求同时恢复时只执行一次"""
+        container_id = record["id"]
+        async with self._lock_for(container_id):
+            container = await self.service.docker.get(container_id)
+            status = container.status
+            if status == "running":
+                return self.service.registry.upsert(container.attrs)
+
+            started = time.perf_counter()
+            if status == "paused":
+                await self.service.docker.unpause(container_id)
+            else:
+                await self.service.docker.start(container_id)
+                db_name = self.service._get_labels(container).get("db_name", self.service.mysql_database)
+                await self.service._wait_for_mysql(container, db_name)
+            container = await self.service._reload(container)
+            record = self.service.registry.upsert(container.attrs)
+            elapsed = round((time.perf_counter() - started) * 1000, 2)
+
+            mode = "pause" if status == "paused" else "stop"
+            self._hibernated.pop(container_id, None)
+            self.mark_active(container_id)
+        if self.metrics:
+            self.metrics.incr("hibernation.resumed")
+            self.metrics.observe(f"hibernation.resume_ms.{mode}", elapsed)
+        self._gauge()
+        return record
+
+    def stats(self):
+        reclaimed = sum(entry["memory"] for entry in self._hibernated.values() if entry["mode"] == "stop")
+        frozen = sum(entry["memory"] for entry in self._hibernated.values() if entry["mode"] == "pause")
+        return {
+            "mode": self.mode,
+            "idleAfter": self.idle_after,
+            "hibernated": len(self._hibernated),
+            # stop 释放的内存；pause 的内存仍属于容器，只是不再活动
+            "memoryReclaimedBytes": reclaimed,
+            "memoryFrozenBytes": frozen,
+        }
+
+    async def _memory_usage(self, container_id):
+        """容器当前的内存占用（不含可回收的文件缓存），获取失败时返回0"""
+        try:
+            stats = await self.service.docker.stats(container_id)
+        except docker.errors.APIError as e:
+            print(f"Error reading container memory {container_id}: {e}")
+            return 0
+        return memory_usage(stats)
+
+    def _lock_for(self, container_id):
+        lock = self._locks.get(container_id)
+        if lock is None:
+            lock = self._locks[container_id] = asyncio.Lock()
+        return lock
+
+    def _gauge(self):
+        if self.metrics:
+            stats = self.stats()
+            self.metrics.set_gauge("hibernation.hibernated", stats["hibernated"])
+            self.metrics.set_gauge("hibernation.memory_reclaimed_bytes", stats["memoryReclaimedBytes"])
+
+    def _record(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
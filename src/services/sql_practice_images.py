@@ -0,0 +1,172 @@
+import io
+import csv
+import time
+import asyncio
+import hashlib
+import tarfile
+import docker
+
+# 修改Dockerfile模板后需要递增，使已有镜像失效
+BUILDER_VERSION = "2"
+BAKED_DATADIR = "/var/lib/mysql-baked"
+# 官方镜像 secure_file_priv 指向的目录，服务器端 LOAD DATA INFILE 只能读取其中的文件
+SEED_FILES_DIR = "/var/lib/mysql-files"
+
+DOCKERFILE_TEMPLATE = """
+FROM {base_image} AS seed
+ENV MYSQL_ROOT_PASSWORD={root_password} \\
+    MYSQL_DATABASE={database} \\
+    MYSQL_USER={user} \\
+    MYSQL_PASSWORD={password}
+COPY init.sql load_data.sql /docker-entrypoint-initdb.d/
+COPY --chown=mysql:mysql data/ {files_dir}/
+# 只执行官方入口脚本的初始化流程，完成后不启动常驻服务
+RUN sed -i 's/exec "$@"/echo "seed finished"/' /usr/local/bin/docker-entrypoint.sh \\
+    && /usr/local/bin/docker-entrypoint.sh mysqld --datadir={datadir}
+
+FROM {base_image}
+# 数据目录不在基础镜像声明的VOLUME中，才能随镜像层保存
+COPY --from=seed --chown=mysql:mysql {datadir} {datadir}
+CMD ["mysqld", "--datadir={datadir}"]
+"""
+
+
+class PracticeImageBuilder:
+    """将各难度的初始化数据预先烘焙进派生镜像，镜像标签由初始化脚本和CSV数据内容的哈希决定"""
+
+    def __init__(self, service, repository="sql-practice", metrics=None):
+        self.service = service
+        self.repository = repository
+        self.metrics = metrics
+        self._known_tags = set()
+        self._locks = {}
+        self._data_digests = {}
+
+    def image_tag(self, difficulty, init_script, data_files=()):
+        """根据基础镜像、构建模板版本、脚本内容和数据文件内容计算镜像标签"""
+        digest = hashlib.sha256()
+        for part in (self.service.mysql_image, BUILDER_VERSION, init_script):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(self._data_digest(data_files).encode("utf-8"))
+        return f"{self.repository}:{difficulty}-{digest.hexdigest()[:12]}"
+
+    def _data_digest(self, data_files):
+        """数据文件的表名和内容哈希，进程内每个文件只读取一次"""
+        digest = hashlib.sha256()
+        for table, path in data_files:
+            file_digest = self._data_digests.get(path)
+            if file_digest is None:
+                file_hash = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        file_hash.update(chunk)
+                file_digest = self._data_digests[path] = file_hash.hexdigest()
+            digest.update(f"{table}\0{file_digest}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def ensure_image(self, difficulty, host=None):
+        """返回当前脚本对应的镜像标签，不存在时构建；脚本内容变化会自动得到新镜像
+
+        多主机时 host 为容器所在的主机，镜像在每台主机上分别构建。
+        """
+        init_script = self.service._read_init_script(difficulty)
+        data_files = await asyncio.to_thread(self.service._data_files, difficulty)
+        tag = await asyncio.to_thread(self.image_tag, difficulty, init_script, data_files)
+        if (host, tag) in self._known_tags:
+            return tag
+
+        lock = self._locks.setdefault((host, tag), asyncio.Lock())
+        async with lock:
+            if (host, tag) in self._known_tags:
+                return tag
+            client = self.service._image_client(host)
+            try:
+                await asyncio.to_thread(client.images.get, tag)
+            except docker.errors.ImageNotFound:
+                await self._build(client, difficulty, tag, init_script, data_files)
+                await self._remove_stale_images(client, difficulty, tag)
+            self._known_tags.add((host, tag))
+        return tag
+
+    async def _build(self, client, difficulty, tag, init_script, data_files=()):
+        print(f"Building practice image {tag}")
+        start_time = time.monotonic()
+        context = await asyncio.to_thread(self._build_context, init_script, data_files)
+        await asyncio.to_thread(
+            client.images.build,
+            fileobj=context,
+            custom_context=True,
+            tag=tag,
+            rm=True,
+            labels={"sql_practice.difficulty": difficulty}
+        )
+        if self.metrics:
+            self.metrics.incr(f"image.built.{difficulty}")
+            self.metrics.observe("image.build_seconds", time.monotonic() - start_time)
+
+    def _build_context(self, init_script, data_files=()):
+        """生成包含Dockerfile、初始化脚本和CSV数据的构建上下文"""
+        dockerfile = DOCKERFILE_TEMPLATE.format(
+            base_image=self.service.mysql_image,
+            root_password=self.service.mysql_root_password,
+            database=self.service.mysql_database,
+            user=self.service.mysql_user,
+            password=self.service.mysql_password,
+            datadir=BAKED_DATADIR,
+            files_dir=SEED_FILES_DIR
+        )
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            files = (
+                ("Dockerfile", dockerfile),
+                ("init.sql", init_script),
+                ("load_data.sql", self._load_data_script(data_files)),
+            )
+            for name, content in files:
+                data = content.encode("utf-8")
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+            # 没有数据文件时也需要 data 目录，COPY 才不会失败
+            data_dir = tarfile.TarInfo("data")
+            data_dir.type = tarfile.DIRTYPE
+            data_dir.mode = 0o755
+            tar.addfile(data_dir)
+            for table, path in data_files:
+                tar.add(path, arcname=f"data/{table}.csv")
+        buffer.seek(0)
+        return buffer
+
+    def _load_data_script(self, data_files):
+        """在初始化脚本之后执行：用服务器端 LOAD DATA INFILE 导入CSV，格式与 DatabaseSeeder 相同"""
+        statements = []
+        for table, path in data_files:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                columns = next(csv.reader(f))
+            column_list = ", ".join(f"`{column}`" for column in columns)
+            statements.append(
+                f"LOAD DATA INFILE '{SEED_FILES_DIR}/{table}.csv' INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+                f"({column_list});"
+            )
+        return "\n".join(statements) + "\n"
+
+    async def _remove_stale_images(self, client, difficulty, current_tag):
+        """删除同一难度下旧脚本版本的镜像，仍被容器使用的镜像会删除失败，忽略即可"""
+        try:
+            images = await asyncio.to_thread(
+                client.images.list,
+                filters={"label": f"sql_practice.difficulty={difficulty}"}
+            )
+        except Exception as e:
+            print(f"Error listing practice images: {e}")
+            return
+        for image in images:
+            if current_tag in image.tags:
+                continue
+            try:
+                await asyncio.to_thread(client.images.remove, image.id)
+            except Exception:
+                pass
@@ -0,0 +1,221 @@
+import json
+import time
+import uuid
+import asyncio
+import contextvars
+
+_current_job = contextvars.ContextVar("sql_practice_job", default=None)
+
+
+class JobConflict(Exception):
+    """同一用户已有参数不同的同类作业正在执行"""
+
+
+def report_progress(stage, message=None):
+    """更新当前作业的进度；在作业之外调用（如同步接口）时不做任何事，只能在事件循环中调用"""
+    job = _current_job.get()
+    if job is not None:
+        job.advance(stage, message)
+
+
+def report_queue_position(position):
+    """当前作业开始/结束排队；position 为返回排队位置的函数，None 表示不再排队"""
+    job = _current_job.get()
+    if job is not None:
+        job.position = position
+        if position is not None:
+            job.advance("waiting_for_capacity")
+
+
+class ProvisioningJob:
+    """一次创建或重置操作，状态 queued -> running -> succeeded / failed"""
+
+    def __init__(self, kind, user_id, key, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = str(user_id)
+        self.key = key
+        self.params = params
+        self.status = "queued"
+        self.stage = "queued"
+        self.history = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self.position = None  # 排队时返回排队位置的函数
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def advance(self, stage, message=None):
+        self.stage = stage
+        self.history.append({"stage": stage, "message": message, "at": time.time()})
+        self._notify()
+
+    def start(self):
+        self.status = "running"
+        self.started_at = time.time()
+        self.advance("running")
+
+    def succeed(self, result):
+        self.status = "succeeded"
+        self.result = result
+        self.finished_at = time.time()
+        self.advance("done")
+
+    def fail(self, error):
+        self.status = "failed"
+        self.error = error
+        self.finished_at = time.time()
+        self.advance("failed", error)
+
+    async def wait_change(self, timeout):
+        """等待下一次状态变化，超时返回False"""
+        event = self._changed
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "queuePosition": self.position() if self.position else None,
+            "history": self.history,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+    def _notify(self):
+        # 唤醒当前等待者，之后的等待使用新的事件
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+async def job_events(job, keepalive=15):
+    """作业进度的Server-Sent Events：每次变化推送一条 progress 事件，结束时推送最终状态"""
+    while True:
+        payload = json.dumps(job.to_dict(), ensure_ascii=False, default=str)
+        if job.finished:
+            yield f"event: {job.status}\ndata: {payload}\n\n"
+            return
+        yield f"event: progress\ndata: {payload}\n\n"
+        # 没有变化时定期发送注释行，避免代理关闭空闲连接
+        while not await job.wait_change(timeout=keepalive):
+            yield ": keepalive\n\n"
+
+
+class JobRunner:
+    """进程内作业执行器：限制同时执行的作业数，合并重复请求
+
+    同一用户同类作业（key）执行期间重复提交返回同一个作业。客户端提供幂等键时，
+    retention 秒内同一用户同类作业的同一幂等键总是返回同一个作业，作业完成后的重试（如代理超时）也不会重复执行。
+    """
+
+    def __init__(self, concurrency=8, retention=600.0, metrics=None):
+        self.concurrency = concurrency
+        self.retention = retention
+        self.metrics = metrics
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._jobs = {}
+        self._by_key = {}
+        self._by_idempotency_key = {}
+
+    def submit(self, kind, user_id, func, key=None, params=None, idempotency_key=None):
+        """提交作业，返回 (作业, 是否新建)；func 为无参数的协程函数，返回值作为作业结果"""
+        self._prune()
+        user_id = str(user_id)
+        if idempotency_key:
+            job = self._by_idempotency_key.get((user_id, kind, idempotency_key))
+            if job is not None:
+                self._record("job.deduplicated")
+                return job, False
+
+        key = key or (kind, user_id)
+        params = params or {}
+        job = self._by_key.get(key)
+        if job is not None and not job.finished:
+            if job.params != params:
+                raise JobConflict("已有正在执行的操作，请等待其完成")
+            self._record("job.deduplicated")
+            return job, False
+
+        job = ProvisioningJob(kind, user_id, key, params)
+        job.position = lambda: self._queued_position(job)
+        self._jobs[job.id] = job
+        self._by_key[key] = job
+        if idempotency_key:
+            self._by_idempotency_key[(user_id, kind, idempotency_key)] = job
+        job.task = asyncio.create_task(self._run(job, func))
+        self._record(f"job.submitted.{kind}")
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def stop(self):
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    async def _run(self, job, func):
+        # 作业在自己的任务上下文中执行，服务代码通过 report_progress 更新进度
+        _current_job.set(job)
+        try:
+            async with self._semaphore:
+                job.position = None
+                job.start()
+                result = await func()
+            job.succeed(result)
+            self._record(f"job.succeeded.{job.kind}")
+        except asyncio.CancelledError:
+            job.fail("服务停止，操作已取消")
+            raise
+        except Exception as e:
+            job.fail(str(e))
+            self._record(f"job.failed.{job.kind}")
+        if self.metrics and job.started_at:
+            self.metrics.observe(f"job.duration_ms.{job.kind}", round((job.finished_at - job.started_at) * 1000, 2))
+            self.metrics.observe(f"job.queued_ms.{job.kind}", round((job.started_at - job.created_at) * 1000, 2))
+
+    def _queued_position(self, job):
+        # 信号量按等待顺序唤醒，排在前面的是更早创建的排队作业
+        return 1 + sum(
+            1 for other in self._jobs.values()
+            if other.status == "queued" and other.created_at < job.created_at
+        )
+
+    def _prune(self):
+        """丢弃完成超过 retention 秒的作业"""
+        cutoff = time.time() - self.retention
+        expired = [job for job in self._jobs.values() if job.finished and job.finished_at < cutoff]
+        for job in expired:
+            self._jobs.pop(job.id, None)
+            if self._by_key.get(job.key) is job:
+                self._by_key.pop(job.key)
+        for key, job in list(self._by_idempotency_key.items()):
+            if job.id not in self._jobs:
+                self._by_idempotency_key.pop(key)
+
+    def _record(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
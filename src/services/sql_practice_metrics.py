@@ -0,0 +1,48 @@
+from collections import defaultdict, deque
+
+
+class PracticeMetrics:
+    """SQL练习服务的进程内指标：计数器、瞬时值和耗时分布"""
+
+    def __init__(self, max_samples=1024):
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._observed = defaultdict(int)
+
+    def incr(self, name, value=1):
+        """累加计数器"""
+        self._counters[name] += value
+
+    def set_gauge(self, name, value):
+        """记录瞬时值（如队列长度）"""
+        self._gauges[name] = value
+
+    def observe(self, name, value):
+        """记录一次观测值（如耗时），只保留最近的样本用于计算分位数"""
+        self._samples[name].append(value)
+        self._observed[name] += 1
+
+    def get_counter(self, name):
+        return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """导出当前指标快照"""
+        distributions = {}
+        for name, samples in self._samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            distributions[name] = {
+                "count": self._observed[name],
+                "min": ordered[0],
+                "max": ordered[-1],
+                "avg": sum(ordered) / len(ordered),
+                "p50": ordered[int(len(ordered) * 0.5)],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            }
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "distributions": distributions,
+        }
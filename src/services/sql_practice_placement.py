@@ -0,0 +1,297 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+
+import docker
+import httpx
+
+from src.services.sql_practice_docker import AsyncDockerClient
+
+# 计入主机负载的容器状态
+LOADED_STATUSES = ("running", "paused", "created")
+
+STRATEGIES = ("least_loaded", "binpack")
+
+
+class PlacementError(Exception):
+    """没有可以放置新容器的主机（都已满、正在排空或不可达）"""
+
+
+class DockerHost:
+    """一台Docker主机：异步客户端、练习容器MySQL端口所在的地址和容器数上限"""
+
+    def __init__(self, name, url, address="localhost", capacity=0, draining=False,
+                 api_version="1.41", timeout=30.0, max_connections=32):
+        self.name = name
+        self.url = url
+        self.address = address
+        self.capacity = capacity
+        self.draining = draining
+        self.api_version = api_version
+        self.client = AsyncDockerClient(
+            base_url=url,
+            api_version=api_version,
+            timeout=timeout,
+            max_connections=max_connections
+        )
+        self.last_error = None  # 最近一次请求的连接错误，请求成功后清除
+        self._docker_client = None
+
+    @property
+    def docker_client(self):
+        """docker SDK 客户端（事件流和镜像构建），首次使用时连接"""
+        if self._docker_client is None:
+            url = self.url.replace("http://", "tcp://", 1)
+            self._docker_client = docker.DockerClient(base_url=url, version=self.api_version)
+        return self._docker_client
+
+
+class PlacementScheduler:
+    """多台Docker主机上的容器放置
+
+    新容器放到负载最低（least_loaded，按容器数占上限的比例）或最满但仍有空位
+    （binpack）的主机上；已有容器按所在主机路由。负载来自注册表中各主机的容器，
+    加上正在创建、注册表还没有记录的容器。正在排空的主机不再放置新容器，
+    已有实例保留到用户删除或过期。
+    """
+
+    def __init__(self, service, hosts, strategy="least_loaded", metrics=None):
+        if not hosts:
+            raise ValueError("至少需要一台Docker主机")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"不支持的放置策略: {strategy}")
+        self.service = service
+        self.hosts = {host.name: host for host in hosts}
+        self.strategy = strategy
+        self.metrics = metrics
+        self._owners = {}  # 容器ID -> 主机名
+        self._reserved = defaultdict(int)  # 主机名 -> 正在创建的容器数
+
+    @property
+    def total_capacity(self):
+        """所有主机的容器数上限之和，有主机不限制时为0"""
+        if any(not host.capacity for host in self.hosts.values()):
+            return 0
+        return sum(host.capacity for host in self.hosts.values())
+
+    def owner(self, container_id):
+        return self._owners.get(container_id)
+
+    def claim(self, container_id, host_name):
+        self._owners[container_id] = host_name
+
+    def forget(self, container_id):
+        self._owners.pop(container_id, None)
+
+    def address_for(self, container_id):
+        """容器MySQL端口所在的地址"""
+        return self.hosts[self._owners[container_id]].address
+
+    def load(self, host_name):
+        count = sum(
+            1 for record in self.service.registry.all()
+            if record["status"] in LOADED_STATUSES and self._owners.get(record["id"]) == host_name
+        )
+        return count + self._reserved[host_name]
+
+    def admission_load(self):
+        """准入控制使用的总负载：排空中或不可达的主机按已满计算"""
+        total = 0
+        for host in self.hosts.values():
+            if host.draining or host.last_error:
+                total += host.capacity
+            else:
+                total += min(self.load(host.name), host.capacity) if host.capacity else self.load(host.name)
+        return total
+
+    def choose(self):
+        """按放置策略选择主机，没有可用主机时抛出 PlacementError"""
+        candidates = []
+        for host in self.hosts.values():
+            if host.draining or host.last_error:
+                continue
+            load = self.load(host.name)
+            if host.capacity and load >= host.capacity:
+                continue
+            ratio = load / host.capacity if host.capacity else load
+            candidates.append((ratio, load, host.name))
+        if not candidates:
+            if self.metrics:
+                self.metrics.incr("placement.unavailable")
+            raise PlacementError("没有可用的主机，请稍后重试")
+        if self.strategy == "binpack":
+            # 先填满负载最高的主机，空闲主机可以排空下线
+            _, _, name = min(candidates, key=lambda item: (-item[0], -item[1], item[2]))
+        else:
+            _, _, name = min(candidates)
+        return self.hosts[name]
+
+    @contextmanager
+    def reserve(self, host_name=None):
+        """选择主机并在创建期间计入其负载，返回主机名"""
+        host_name = host_name or self.choose().name
+        self._reserved[host_name] += 1
+        try:
+            yield host_name
+        finally:
+            self._reserved[host_name] -= 1
+        if self.metrics:
+            self.metrics.incr(f"placement.placed.{host_name}")
+
+    def drain(self, host_name):
+        self._host(host_name).draining = True
+
+    def undrain(self, host_name):
+        self._host(host_name).draining = False
+
+    def containers_on(self, host_name):
+        """主机上的练习容器记录"""
+        return [
+            record for record in self.service.registry.all()
+            if self._owners.get(record["id"]) == host_name
+        ]
+
+    def stats(self):
+        result = {"strategy": self.strategy, "hosts": {}}
+        for host in self.hosts.values():
+            records = self.containers_on(host.name)
+            result["hosts"][host.name] = {
+                "address": host.address,
+                "capacity": host.capacity,
+                "load": self.load(host.name),
+                "userContainers": sum(1 for record in records if record["labels"].get("user_id")),
+                "draining": host.draining,
+                "lastError": host.last_error,
+            }
+        return result
+
+    def _host(self, host_name):
+        try:
+            return self.hosts[host_name]
+        except KeyError:
+            raise ValueError(f"主机 {host_name} 不存在")
+
+
+class RoutedDockerClient:
+    """与 AsyncDockerClient 接口相同，把容器操作路由到容器所在的主机
+
+    列出容器时汇总所有主机并记录容器归属；不可达的主机被跳过并记录错误，
+    不影响其他主机上的实例。归属未知的容器ID并行在所有主机上查找。
+    每次请求都更新主机的 last_error：连接失败时记录，收到守护进程的响应
+    （包括容器不存在等错误）时清除；没有请求的主机由 probe() 定期检查。
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    async def close(self):
+        await asyncio.gather(*(host.client.close() for host in self.scheduler.hosts.values()))
+
+    async def probe(self):
+        """ping所有主机并更新其状态，返回不可达的主机名"""
+        hosts = list(self.scheduler.hosts.values())
+        await asyncio.gather(*(self._call(host, host.client.ping()) for host in hosts), return_exceptions=True)
+        return [host.name for host in hosts if host.last_error]
+
+    async def get(self, container_id):
+        host_name = self.scheduler.owner(container_id)
+        if host_name:
+            host = self.scheduler.hosts[host_name]
+            return await self._call(host, host.client.get(container_id))
+        hosts = list(self.scheduler.hosts.values())
+        results = await asyncio.gather(
+            *(self._call(host, host.client.get(container_id)) for host in hosts),
+            return_exceptions=True
+        )
+        for host, result in zip(hosts, results):
+            if not isinstance(result, Exception):
+                self.scheduler.claim(result.id, host.name)
+                return result
+        for result in results:
+            if not isinstance(result, docker.errors.NotFound):
+                raise result
+        raise results[0]
+
+    async def list(self, all=False, filters=None):
+        hosts = list(self.scheduler.hosts.values())
+        results = await asyncio.gather(
+            *(self._call(host, host.client.list(all=all, filters=filters)) for host in hosts),
+            return_exceptions=True
+        )
+        containers = []
+        for host, result in zip(hosts, results):
+            if isinstance(result, Exception):
+                print(f"Error listing containers on host {host.name}: {result}")
+                continue
+            for container in result:
+                self.scheduler.claim(container.id, host.name)
+                containers.append(container)
+        return containers
+
+    async def run(self, image, host=None, **kwargs):
+        """在指定主机上创建容器，未指定时按放置策略选择"""
+        if host:
+            target = self.scheduler.hosts[host]
+            container = await self._call(target, target.client.run(image, **kwargs))
+        else:
+            with self.scheduler.reserve() as host:
+                target = self.scheduler.hosts[host]
+                container = await self._call(target, target.client.run(image, **kwargs))
+        self.scheduler.claim(container.id, host)
+        return container
+
+    async def remove(self, container_id, force=False, v=False):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.remove(container_id, force=force, v=v))
+        self.scheduler.forget(container_id)
+
+    async def start(self, container_id):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.start(container_id))
+
+    async def stop(self, container_id, timeout=None):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.stop(container_id, timeout=timeout))
+
+    async def kill(self, container_id):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.kill(container_id))
+
+    async def rename(self, container_id, name):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.rename(container_id, name))
+
+    async def pause(self, container_id):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.pause(container_id))
+
+    async def unpause(self, container_id):
+        host = await self._host_for(container_id)
+        await self._call(host, host.client.unpause(container_id))
+
+    async def stats(self, container_id):
+        host = await self._host_for(container_id)
+        return await self._call(host, host.client.stats(container_id))
+
+    async def logs(self, container_id, follow=False, since=None):
+        host = await self._host_for(container_id)
+        async for line in host.client.logs(container_id, follow=follow, since=since):
+            yield line
+
+    async def _host_for(self, container_id):
+        if not self.scheduler.owner(container_id):
+            await self.get(container_id)
+        return self.scheduler.hosts[self.scheduler.owner(container_id)]
+
+    async def _call(self, host, coro):
+        """执行主机上的请求并更新主机状态"""
+        try:
+            result = await coro
+        except httpx.TransportError as e:
+            host.last_error = str(e) or type(e).__name__
+            raise
+        except docker.errors.APIError:
+            host.last_error = None
+            raise
+        host.last_error = None
+        return result
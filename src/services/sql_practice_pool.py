@@ -0,0 +1,150 @@
+import asyncio
+from collections import defaultdict, deque
+
+
+class WarmPool:
+    """按难度维护一组已启动并完成初始化的MySQL容器，创建数据库时直接分配"""
+
+    def __init__(self, service, targets, refill_concurrency=2, check_interval=10.0, metrics=None):
+        self.service = service
+        self.targets = dict(targets)
+        self.refill_concurrency = refill_concurrency
+        self.check_interval = check_interval
+        self.metrics = metrics
+
+        self._ready = {difficulty: deque() for difficulty in self.targets}
+        self._provisioning = defaultdict(int)
+        self._refill_tasks = set()
+        self._semaphore = None
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        """接管已有的空闲池容器并启动后台补充任务"""
+        self._semaphore = asyncio.Semaphore(self.refill_concurrency)
+        self._wakeup = asyncio.Event()
+        await self._adopt_existing()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台补充任务，已就绪的容器保留给下次启动接管"""
+        tasks = list(self._refill_tasks)
+        if self._task:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def acquire(self, difficulty):
+        """取出一个就绪容器，池为空时返回None"""
+        ready = self._ready.get(difficulty)
+        container = None
+        while ready:
+            candidate = ready.popleft()
+            try:
+                candidate = await self.service._reload(candidate)
+                if candidate.status == 'running':
+                    container = candidate
+                    break
+            except Exception as e:
+                print(f"Error checking pooled container: {e}")
+            await self.service._discard_container(candidate)
+
+        self._record("hit" if container else "miss", difficulty)
+        if self._wakeup:
+            self._wakeup.set()
+        return container
+
+    async def release_host(self, host_name):
+        """丢弃指定主机上的就绪容器（主机排空时），之后由其他主机补充，返回丢弃的数量"""
+        released = []
+        for ready in self._ready.values():
+            for container in [c for c in ready if self.service.placement.owner(c.id) == host_name]:
+                ready.remove(container)
+                released.append(container)
+        await asyncio.gather(*(self.service._discard_container(container) for container in released))
+        if self._wakeup:
+            self._wakeup.set()
+        return len(released)
+
+    def stats(self):
+        """各难度池的目标大小、就绪数、补充中数量及命中情况"""
+        result = {}
+        for difficulty, target in self.targets.items():
+            result[difficulty] = {
+                "target": target,
+                "ready": len(self._ready[difficulty]),
+                "provisioning": self._provisioning[difficulty],
+                "hits": self.metrics.get_counter(f"pool.hit.{difficulty}") if self.metrics else None,
+                "misses": self.metrics.get_counter(f"pool.miss.{difficulty}") if self.metrics else None,
+            }
+        return result
+
+    async def _adopt_existing(self):
+        """接管上次运行留下的空闲池容器
+
+        已分配的容器保留（归属信息在服务启动时从实例存储恢复），只清理存储中没有
+        归属记录的已分配容器；存储读取失败时无法区分，全部保留到下次启动。
+        """
+        try:
+            containers = await self.service._list_pool_containers()
+        except Exception as e:
+            print(f"Error listing pooled containers: {e}")
+            return
+
+        for container in containers:
+            difficulty = container.labels.get('pool')
+            ready = self._ready.get(difficulty)
+            if not container.name.startswith(self.service.pool_container_prefix):
+                labels = self.service.registry.effective_labels(container.id, container.labels)
+                if labels.get('user_id') or not self.service._pool_ownership_restored:
+                    continue
+                await self.service._discard_container(container)
+            elif ready is not None and container.status == 'running' \
+                    and len(ready) < self.targets[difficulty]:
+                ready.append(container)
+            else:
+                await self.service._discard_container(container)
+
+    async def _run(self):
+        while True:
+            self._fill()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fill(self):
+        evictor = self.service.evictor
+        if evictor and not evictor.has_room():
+            # 不为补充预热池回收用户实例
+            return
+        for difficulty, target in self.targets.items():
+            deficit = target - len(self._ready[difficulty]) - self._provisioning[difficulty]
+            for _ in range(max(deficit, 0)):
+                self._provisioning[difficulty] += 1
+                task = asyncio.create_task(self._provision(difficulty))
+                self._refill_tasks.add(task)
+                task.add_done_callback(self._refill_tasks.discard)
+
+    async def _provision(self, difficulty):
+        try:
+            # 补充同样占用创建名额和主机容量，但让位于排队中的用户请求
+            async with self._semaphore, self.service.admission.admit("pool", background=True):
+                container = await self.service._create_pool_container(difficulty)
+                self._ready[difficulty].append(container)
+                self._record("refilled", difficulty)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 失败后等待下一轮检查再重试，避免持续占满并发名额
+            print(f"Error refilling pool ({difficulty}): {e}")
+            self._record("refill_failed", difficulty)
+        finally:
+            self._provisioning[difficulty] -= 1
+
+    def _record(self, event, difficulty):
+        if self.metrics:
+            self.metrics.incr(f"pool.{event}.{difficulty}")
@@ -0,0 +1,99 @@
+import time
+import asyncio
+
+from src.services.sql_practice import SQLPracticeService
+
+
+class SQLPracticeUnavailable(Exception):
+    """SQL练习服务无法初始化（如Docker不可用），稍后重试"""
+
+    def __init__(self, message, retry_after=10):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SQLPracticeServiceProvider:
+    """延迟创建并启动SQL练习服务
+
+    导入模块和应用启动时不访问Docker：lifespan 中调用 warm_up() 在后台初始化，
+    请求通过 get() 获取服务，初始化未完成时等待同一次初始化。
+    初始化失败不影响应用的其他接口，retry_after 秒后的下一次请求重新尝试。
+    """
+
+    def __init__(self, factory=SQLPracticeService, retry_after=10.0):
+        self.factory = factory
+        self.retry_after = retry_after
+        self.init_ms = None
+        self._service = None
+        self._lock = None
+        self._warm_up_task = None
+        self._last_error = None
+        self._failed_at = None
+
+    @property
+    def service(self):
+        """已启动的服务，尚未初始化时为None"""
+        return self._service
+
+    def warm_up(self):
+        """在后台开始初始化，不等待完成"""
+        self._warm_up_task = asyncio.create_task(self._warm_up())
+
+    async def get(self):
+        if self._service is not None:
+            return self._service
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after:
+            raise self._unavailable()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._service is None:
+                await self._initialize()
+        return self._service
+
+    async def shutdown(self):
+        if self._warm_up_task:
+            self._warm_up_task.cancel()
+            await asyncio.gather(self._warm_up_task, return_exceptions=True)
+            self._warm_up_task = None
+        if self._service is not None:
+            service, self._service = self._service, None
+            await service.stop()
+
+    def stats(self):
+        return {
+            "ready": self._service is not None,
+            "initMs": self.init_ms,
+            "lastError": self._last_error,
+        }
+
+    async def _warm_up(self):
+        try:
+            await self.get()
+        except SQLPracticeUnavailable:
+            pass
+
+    async def _initialize(self):
+        started = time.perf_counter()
+        service = None
+        try:
+            service = self.factory()
+            await service.start()
+        except Exception as e:
+            self._last_error = str(e)
+            self._failed_at = time.monotonic()
+            print(f"Error starting SQL practice service: {e}")
+            if service is not None:
+                try:
+                    await service.stop()
+                except Exception as stop_error:
+                    print(f"Error stopping SQL practice service: {stop_error}")
+            raise self._unavailable()
+        self.init_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._last_error = None
+        self._failed_at = None
+        self._service = service
+        print(f"SQL practice service ready in {self.init_ms}ms")
+
+    def _unavailable(self):
+        return SQLPracticeUnavailable(f"SQL练习服务暂不可用: {self._last_error}", retry_after=max(int(self.retry_after), 1))
@@ -0,0 +1,144 @@
+import re
+import time
+import asyncio
+from collections import deque
+
+# 官方镜像初始化时先以 port: 0（不监听TCP）启动临时服务器，正式启动后输出 port: 3306
+READY_LINE = re.compile(r"ready for connections.*port: (\d+)", re.I)
+FAILED_STATUSES = ("exited", "dead")
+
+# 由Docker定期执行，docker ps 中可以看到实例是否健康
+HEALTHCHECK = {
+    "test": ["CMD-SHELL", "mysqladmin ping -h 127.0.0.1 -uroot -p\"$MYSQL_ROOT_PASSWORD\" --silent"],
+    "interval": 2 * 1000 * 1000 * 1000,
+    "timeout": 2 * 1000 * 1000 * 1000,
+    "retries": 3,
+    "start_period": 120 * 1000 * 1000 * 1000,
+}
+
+
+class MySQLReadiness:
+    """等待容器中的MySQL就绪
+
+    后台任务跟随容器日志，出现正式服务器的 ready for connections 时立即探测；
+    同时以指数退避（从 initial_delay 起，最长 max_delay）连接探测。
+    容器退出或健康检查失败时立即报错并附上最后几行日志，不必等到超时。
+    """
+
+    def __init__(self, service, timeout=60.0, initial_delay=0.025, max_delay=0.5,
+                 status_interval=2.0, metrics=None):
+        self.service = service
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.status_interval = status_interval
+        self.metrics = metrics
+
+    async def wait(self, container, db_name):
+        started = time.perf_counter()
+        labels = self.service._get_labels(container)
+        image = container.attrs.get("Config", {}).get("Image") or self.service.mysql_image
+        metric_suffix = f"{image}.{labels.get('difficulty', 'unknown')}"
+        watcher = _LogWatcher(self.service.docker, container.id, since=int(time.time()) - 1)
+        watcher.start()
+        try:
+            await self._wait(container, db_name, watcher, started)
+        except Exception:
+            if self.metrics:
+                self.metrics.incr(f"readiness.failed.{metric_suffix}")
+            raise
+        finally:
+            await watcher.stop()
+        elapsed = round((time.perf_counter() - started) * 1000, 2)
+        if self.metrics:
+            self.metrics.observe(f"readiness.time_to_ready_ms.{metric_suffix}", elapsed)
+        return elapsed
+
+    async def _wait(self, container, db_name, watcher, started):
+        deadline = started + self.timeout
+        delay = self.initial_delay
+        port = None
+        checked_at = 0.0
+        log_ended_seen = False
+        while True:
+            now = time.perf_counter()
+            # 端口映射在容器启动后才出现；定期检查容器状态以便容器退出时尽快失败
+            if port is None or now - checked_at >= self.status_interval or (watcher.ended and not log_ended_seen):
+                log_ended_seen = watcher.ended
+                checked_at = now
+                container = await self.service._reload(container)
+                self._check_state(container, watcher)
+                port = self.service._get_port(container) if container.status == "running" else None
+
+            if port:
+                try:
+                    await self.service._run_db(
+                        self.service._ping_mysql, self.service._get_mysql_host(container.id), port, db_name
+                    )
+                    return
+                except Exception:
+                    pass
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise Exception(f"MySQL服务启动超时{watcher.describe()}")
+            watcher.signal.clear()
+            try:
+                await asyncio.wait_for(watcher.signal.wait(), min(delay, remaining))
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_delay)
+
+    def _check_state(self, container, watcher):
+        state = container.attrs.get("State", {})
+        if container.status in FAILED_STATUSES:
+            raise Exception(f"MySQL容器已退出（退出码 {state.get('ExitCode')}）{watcher.describe()}")
+        if (state.get("Health") or {}).get("Status") == "unhealthy":
+            raise Exception(f"MySQL容器健康检查失败{watcher.describe()}")
+
+
+class _LogWatcher:
+    """跟随容器日志，就绪或日志结束（容器停止）时唤醒等待者"""
+
+    def __init__(self, docker_client, container_id, since):
+        self.docker = docker_client
+        self.container_id = container_id
+        self.since = since
+        self.signal = asyncio.Event()
+        self.ready = False
+        self.ended = False
+        self.tail = deque(maxlen=5)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def describe(self):
+        if not self.tail:
+            return ""
+        return "：" + " | ".join(self.tail)
+
+    async def _run(self):
+        try:
+            async for line in self.docker.logs(self.container_id, follow=True, since=self.since):
+                self._on_line(line.strip())
+        except Exception:
+            pass
+        finally:
+            self.ended = True
+            self.signal.set()
+
+    def _on_line(self, line):
+        if not line:
+            return
+        self.tail.append(line[:300])
+        match = READY_LINE.search(line)
+        if match and match.group(1) != "0":
+            self.ready = True
+            self.signal.set()
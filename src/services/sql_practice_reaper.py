@@ -0,0 +1,157 @@
+import time
+import heapq
+import asyncio
+from datetime import datetime
+
+
+class ExpiryReaper:
+    """按 expires_at 回收过期实例：最小堆保存到期时间，到期后分批并行删除"""
+
+    def __init__(self, service, lease, concurrency=8, reconcile_interval=60.0,
+                 min_extend_interval=60.0, retry_backoff=5.0, max_retry_backoff=300.0, metrics=None):
+        self.service = service
+        self.lease = lease
+        self.concurrency = concurrency
+        self.reconcile_interval = reconcile_interval
+        self.min_extend_interval = min_extend_interval
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.metrics = metrics
+
+        self._heap = []
+        self._deadlines = {}  # 实例ID -> 当前有效的到期时间戳，堆中其余条目视为作废
+        self._failures = {}  # 实例ID -> 连续回收失败次数
+        self._reaping = set()  # 正在回收的实例ID，回收期间被取消时移除
+        self._wakeup = None
+        self._task = None
+        self._last_reconcile = 0.0
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        await self._reconcile()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def schedule(self, database_id, expires_at):
+        """登记或更新实例的到期时间"""
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        deadline = expires_at.timestamp()
+        previous = self._deadlines.get(database_id)
+        self._deadlines[database_id] = deadline
+        heapq.heappush(self._heap, (deadline, database_id))
+        self._gauge()
+        # 新的到期时间早于当前等待目标时唤醒调度循环
+        if self._wakeup and (previous is None or deadline < previous):
+            self._wakeup.set()
+
+    def extend(self, database_id):
+        """用户有活动时续租，返回新的到期时间；距上次续租太近时返回None"""
+        current = self._deadlines.get(database_id)
+        new_expires_at = datetime.now() + self.lease
+        if current is None or new_expires_at.timestamp() - current < self.min_extend_interval:
+            return None
+        self.schedule(database_id, new_expires_at)
+        if self.metrics:
+            self.metrics.incr("reaper.extended")
+        return new_expires_at
+
+    def cancel(self, database_id):
+        """实例被主动删除后取消登记"""
+        self._deadlines.pop(database_id, None)
+        self._failures.pop(database_id, None)
+        self._reaping.discard(database_id)
+        self._gauge()
+
+    def pending(self):
+        return len(self._deadlines)
+
+    async def _run(self):
+        while True:
+            timeout = self.reconcile_interval
+            if self._heap:
+                timeout = min(timeout, max(self._heap[0][0] - time.time(), 0))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            expired = self._pop_expired()
+            if expired:
+                await self._teardown(expired)
+            if time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                await self._reconcile()
+
+    def _pop_expired(self):
+        now = time.time()
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, database_id = heapq.heappop(self._heap)
+            if self._deadlines.get(database_id) != deadline:
+                continue  # 已续租或已取消
+            del self._deadlines[database_id]
+            self._reaping.add(database_id)
+            expired.append((database_id, deadline))
+        self._gauge()
+        return expired
+
+    async def _teardown(self, expired):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def teardown_one(database_id, deadline):
+            async with semaphore:
+                try:
+                    await self.service._expire_database(database_id)
+                    self._failures.pop(database_id, None)
+                    if self.metrics:
+                        self.metrics.incr("reaper.torn_down")
+                        self.metrics.observe("reaper.lag_seconds", time.time() - deadline)
+                except Exception as e:
+                    print(f"Error reaping expired database {database_id}: {e}")
+                    if self.metrics:
+                        self.metrics.incr("reaper.failed")
+                    self._retry_later(database_id)
+                finally:
+                    self._reaping.discard(database_id)
+
+        await asyncio.gather(*(teardown_one(database_id, deadline) for database_id, deadline in expired))
+
+    def _retry_later(self, database_id):
+        """回收失败后按指数退避重新登记，期间被续租或取消的实例不再重试"""
+        if database_id not in self._reaping or database_id in self._deadlines:
+            return
+        failures = self._failures.get(database_id, 0) + 1
+        self._failures[database_id] = failures
+        delay = min(self.retry_backoff * 2 ** (failures - 1), self.max_retry_backoff)
+        self.schedule(database_id, datetime.fromtimestamp(time.time() + delay))
+
+    async def _reconcile(self):
+        """登记其他途径创建（如其他进程）但尚未登记的实例，并同步其他进程的续租"""
+        self._last_reconcile = time.monotonic()
+        try:
+            leases = await self.service._list_leases()
+        except Exception as e:
+            print(f"Error listing practice leases: {e}")
+            return
+        for database_id, expires_at in leases:
+            if not expires_at:
+                continue
+            try:
+                if isinstance(expires_at, str):
+                    expires_at = datetime.fromisoformat(expires_at)
+            except ValueError:
+                print(f"Invalid expires_at for {database_id}: {expires_at}")
+                continue
+            current = self._deadlines.get(database_id)
+            if current is None or expires_at.timestamp() > current:
+                self.schedule(database_id, expires_at)
+
+    def _gauge(self):
+        if self.metrics:
+            self.metrics.set_gauge("reaper.scheduled", len(self._deadlines))
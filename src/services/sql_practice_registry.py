@@ -0,0 +1,254 @@
+import time
+import asyncio
+import threading
+from collections import defaultdict
+import docker
+
+from src.services.sql_practice_teardown import TEARDOWN_PREFIX
+
+# 事件中出现这些标签之一即视为练习容器（早期创建的容器只有 user_id 标签）
+PRACTICE_LABEL_KEYS = ("sql_practice", "pool", "user_id")
+
+# 只改变状态、不需要重新 inspect 的事件
+STATUS_EVENTS = {
+    "die": "exited",
+    "stop": "exited",
+    "kill": "exited",
+    "pause": "paused",
+    "unpause": "running",
+}
+
+
+def record_from_attrs(attrs):
+    """从 inspect 结果中提取注册表记录"""
+    state = attrs['State']['Status']
+    ports = attrs['NetworkSettings'].get('Ports') or {}
+    binding = ports.get('3306/tcp')
+    return {
+        "id": attrs['Id'],
+        "name": attrs['Name'].lstrip('/'),
+        "labels": dict(attrs['Config'].get('Labels') or {}),
+        "status": state,
+        "created": attrs['Created'],
+        "port": binding[0]['HostPort'] if state == 'running' and binding else None,
+    }
+
+
+class ContainerRegistry:
+    """进程内的练习容器注册表：启动时全量同步，之后通过Docker事件流保持最新
+
+    按容器ID和用户ID查询都是O(1)，不访问Docker守护进程。
+    on_change(容器ID, 记录) 在事件引起状态变化时于事件循环中调用，容器被删除时记录为None。
+    """
+
+    def __init__(self, service, metrics=None, reconnect_delay=2.0, on_change=None):
+        self.service = service
+        self.metrics = metrics
+        self.reconnect_delay = reconnect_delay
+        self.on_change = on_change
+        self.synced = False
+
+        self._records = {}
+        self._by_user = defaultdict(set)
+        # Docker标签创建后不可修改，分配后的归属等信息记录在这里并覆盖原标签
+        self._overrides = {}
+        # 正在销毁的容器，销毁完成（destroy 事件）前忽略其事件
+        self._discarded = set()
+
+        self._loop = None
+        self._streams = {}
+        self._stopping = threading.Event()
+        self._watchers = []
+        self._pending = set()
+
+    async def start(self):
+        """全量同步并开始订阅事件流，多主机时每台主机一个事件流"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping.clear()
+        try:
+            await self.resync()
+        except Exception as e:
+            print(f"Error syncing container registry: {e}")
+        self._watchers = [
+            threading.Thread(
+                target=self._watch_events,
+                args=(name, client),
+                name=f"sql-practice-events-{name}",
+                daemon=True
+            )
+            for name, client in self.service._event_clients().items()
+        ]
+        for watcher in self._watchers:
+            watcher.start()
+
+    async def stop(self):
+        self._stopping.set()
+        for stream in list(self._streams.values()):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        for task in list(self._pending):
+            task.cancel()
+        self.synced = False
+
+    async def resync(self):
+        """从Docker全量重建注册表"""
+        containers = {}
+        for key in PRACTICE_LABEL_KEYS:
+            for container in await self.service.docker.list(all=True, filters={"label": [key]}):
+                containers[container.id] = container
+
+        self._records.clear()
+        self._by_user.clear()
+        for container in containers.values():
+            if container.id in self._discarded or container.name.startswith(TEARDOWN_PREFIX):
+                continue
+            self.upsert(container.attrs)
+        self._discarded &= set(containers)
+        for container_id in list(self._overrides):
+            if container_id not in self._records:
+                self._overrides.pop(container_id)
+
+        self.synced = True
+        self._record_metric("registry.resync")
+
+    def get(self, container_id):
+        record = self._records.get(container_id)
+        self._record_metric("registry.hit" if record else "registry.miss")
+        return record
+
+    def for_user(self, user_id):
+        return [self._records[container_id] for container_id in self._by_user.get(str(user_id), ())]
+
+    def all(self):
+        return list(self._records.values())
+
+    def upsert(self, attrs):
+        """写入或更新一条记录，返回合并了归属信息后的记录"""
+        record = record_from_attrs(attrs)
+        record["labels"].update(self._overrides.get(record["id"], {}))
+        self._unindex(record["id"])
+        self._records[record["id"]] = record
+        user_id = record["labels"].get("user_id")
+        if user_id:
+            self._by_user[user_id].add(record["id"])
+        return record
+
+    def assign(self, container_id, labels):
+        """记录覆盖原标签的信息（分配给用户、续租等），与已有覆盖合并"""
+        self._overrides.setdefault(container_id, {}).update(labels)
+        record = self._records.get(container_id)
+        if record:
+            self._unindex(container_id)
+            record["labels"].update(labels)
+            user_id = record["labels"].get("user_id")
+            if user_id:
+                self._by_user[user_id].add(container_id)
+
+    def effective_labels(self, container_id, labels):
+        return {**(labels or {}), **self._overrides.get(container_id, {})}
+
+    def assigned_to(self, user_id):
+        """通过覆盖标签分配给用户的容器ID（未同步时用于回退查询）"""
+        return [
+            container_id for container_id, labels in self._overrides.items()
+            if labels.get("user_id") == str(user_id)
+        ]
+
+    def remove(self, container_id):
+        self._unindex(container_id)
+        self._records.pop(container_id, None)
+        self._overrides.pop(container_id, None)
+
+    def discard(self, container_id):
+        """移除正在销毁的容器，之后停止等事件不会把它重新加入注册表"""
+        self.remove(container_id)
+        self._discarded.add(container_id)
+
+    def _unindex(self, container_id):
+        record = self._records.get(container_id)
+        if not record:
+            return
+        user_id = record["labels"].get("user_id")
+        if user_id and user_id in self._by_user:
+            self._by_user[user_id].discard(container_id)
+            if not self._by_user[user_id]:
+                del self._by_user[user_id]
+
+    def _watch_events(self, name, client):
+        """在独立线程中阻塞读取一台主机的事件流，断开后重新同步并重连"""
+        needs_resync = False
+        while not self._stopping.is_set():
+            try:
+                stream = self._streams[name] = client.events(
+                    decode=True,
+                    filters={"type": "container"}
+                )
+                if needs_resync:
+                    asyncio.run_coroutine_threadsafe(self.resync(), self._loop)
+                for event in stream:
+                    self._loop.call_soon_threadsafe(self._on_event, event)
+            except Exception as e:
+                if not self._stopping.is_set():
+                    print(f"Docker event stream error ({name}): {e}")
+            finally:
+                self._streams.pop(name, None)
+            if self._stopping.is_set():
+                break
+            # 断线期间可能丢失事件，重连后全量同步
+            self.synced = False
+            needs_resync = True
+            time.sleep(self.reconnect_delay)
+
+    def _on_event(self, event):
+        actor = event.get("Actor") or {}
+        container_id = actor.get("ID") or event.get("id")
+        attributes = actor.get("Attributes") or {}
+        if not container_id:
+            return
+        if container_id not in self._records and not any(key in attributes for key in PRACTICE_LABEL_KEYS):
+            return
+
+        action = (event.get("Action") or event.get("status") or "").split(":")[0]
+        self._record_metric("registry.events")
+        if container_id in self._discarded:
+            if action == "destroy":
+                self._discarded.discard(container_id)
+            return
+        if action == "destroy":
+            self.remove(container_id)
+            self._notify(container_id)
+        elif action in STATUS_EVENTS and container_id in self._records:
+            record = self._records[container_id]
+            record["status"] = STATUS_EVENTS[action]
+            if record["status"] == "exited":
+                record["port"] = None
+            self._notify(container_id)
+        elif action in ("create", "start", "rename", "restart") or action in STATUS_EVENTS:
+            task = asyncio.create_task(self._refresh(container_id))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _refresh(self, container_id):
+        try:
+            container = await self.service.docker.get(container_id)
+            self.upsert(container.attrs)
+        except docker.errors.NotFound:
+            self.remove(container_id)
+        except Exception as e:
+            print(f"Error refreshing container {container_id}: {e}")
+            return
+        self._notify(container_id)
+
+    def _notify(self, container_id):
+        if not self.on_change:
+            return
+        try:
+            self.on_change(container_id, self._records.get(container_id))
+        except Exception as e:
+            print(f"Error handling container change {container_id}: {e}")
+
+    def _record_metric(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
@@ -0,0 +1,64 @@
+import json
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta
+
+
+def json_default(value):
+    """序列化MySQL返回的特殊类型，与FastAPI默认编码保持一致"""
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_line(payload):
+    """编码为一行NDJSON"""
+    return (json.dumps(payload, default=json_default, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class ResultLimiter:
+    """按行数和字节数限制返回给用户的结果"""
+
+    def __init__(self, max_rows, max_bytes):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+        self.truncated = False
+
+    def accept(self, size):
+        """记录一行的大小，超出限制时返回False并标记截断"""
+        if self.rows >= self.max_rows or self.bytes + size > self.max_bytes:
+            self.truncated = True
+            return False
+        self.rows += 1
+        self.bytes += size
+        return True
+
+
+def estimate_total_rows(conn, sql):
+    """通过EXPLAIN估算查询的结果行数，仅作为截断时的提示，无法估算时返回None"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"EXPLAIN {sql}")
+        plan = cursor.fetchall()
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+
+    # 嵌套循环连接：最外层查询各表的扫描行数与过滤比例相乘
+    estimate = None
+    for step in plan:
+        if str(step.get("id")) != "1" or step.get("rows") is None:
+            continue
+        rows = float(step["rows"]) * float(step.get("filtered") or 100) / 100
+        estimate = rows if estimate is None else estimate * max(rows, 1)
+    return int(estimate) if estimate is not None else None
@@ -0,0 +1,76 @@
+from src.services.sql_practice_seeding import split_statements
+from src.services.sql_practice_sessions import classify_statement
+
+
+class ScriptError(Exception):
+    """脚本不能执行（没有语句、语句过多或与事务选项冲突），此时不执行任何语句"""
+
+
+def parse_script(sql, max_statements, transaction=False):
+    """拆分脚本中的语句（字符串、标识符和注释中的分号不拆分），执行前检查整个脚本"""
+    statements = split_statements(sql)
+    if not statements:
+        raise ScriptError("脚本中没有可执行的语句")
+    if max_statements and len(statements) > max_statements:
+        raise ScriptError(f"脚本最多包含 {max_statements} 条语句，当前为 {len(statements)} 条")
+    if transaction:
+        for statement in statements:
+            # DDL会隐式提交，事务控制语句会提前结束事务，都无法整体回滚
+            if classify_statement(statement) in ("ddl", "control"):
+                raise ScriptError(f"事务模式下不能包含DDL或事务控制语句：{statement[:80]}")
+    return statements
+
+
+class ScriptResult:
+    """逐条记录脚本中语句的执行结果，第一条失败的语句之后的语句标记为跳过"""
+
+    def __init__(self, statements, transaction=False):
+        self.statements = statements
+        self.transaction = transaction
+        self.entries = []
+        self.failed = False
+        self.rolled_back = False
+        # 成功执行的写语句数，会话模式下回滚事务时逐条撤销
+        self.writes = 0
+
+    def ok(self, results, columns, row_count, affected_rows, elapsed_ms):
+        statement = self.statements[len(self.entries)]
+        if classify_statement(statement) == "write":
+            self.writes += 1
+        self.entries.append({
+            "index": len(self.entries),
+            "sql": statement,
+            "status": "ok",
+            "columns": columns,
+            "results": results,
+            "rowCount": row_count,
+            "truncated": results is not None and len(results) < row_count,
+            "affectedRows": affected_rows,
+            "executionTime": round(elapsed_ms, 2),
+        })
+
+    def error(self, error, elapsed_ms):
+        self.failed = True
+        self.entries.append({
+            "index": len(self.entries),
+            "sql": self.statements[len(self.entries)],
+            "status": "error",
+            "error": str(error),
+            "errno": getattr(error, "errno", None),
+            "executionTime": round(elapsed_ms, 2),
+        })
+
+    def to_dict(self):
+        entries = list(self.entries)
+        for index in range(len(entries), len(self.statements)):
+            entries.append({"index": index, "sql": self.statements[index], "status": "skipped"})
+        return {
+            "success": not self.failed,
+            "statements": entries,
+            "executed": sum(1 for entry in self.entries if entry["status"] == "ok"),
+            "executionTime": round(sum(entry["executionTime"] for entry in self.entries), 2),
+            "affectedRows": sum(entry.get("affectedRows", 0) for entry in self.entries),
+            "truncated": any(entry.get("truncated") for entry in self.entries),
+            "transaction": self.transaction,
+            "rolledBack": self.rolled_back,
+        }
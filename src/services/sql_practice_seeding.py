@@ -0,0 +1,253 @@
+import os
+import re
+import csv
+import time
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+DATA_KEYWORDS = {"INSERT", "REPLACE", "UPDATE", "DELETE"}
+LEADING_KEYWORD = re.compile(r"^\s*(\w+)")
+# mysql 客户端的分隔符命令：DELIMITER <分隔符>，到行尾结束
+DELIMITER_COMMAND = re.compile(r"DELIMITER[ \t]+(\S+)[^\n]*", re.I)
+# 拆分时保留的注释：服务器会执行的注释和优化器提示
+KEPT_COMMENTS = ("/*!", "/*M!", "/*+")
+
+# 服务器禁止 LOAD DATA LOCAL 时的错误码
+LOCAL_INFILE_REJECTED = (1148, 3948)
+
+
+def split_statements(script):
+    """按分隔符拆分SQL脚本，正确处理字符串、反引号标识符和注释中的分号
+
+    普通注释被去掉，/*! ... */、/*M! ... */ 形式的可执行注释和 /*+ ... */ 优化器提示保留。
+    支持 mysql 客户端的 DELIMITER 命令（如存储过程定义前的 DELIMITER $$），命令本身不作为语句返回。
+    """
+    statements = []
+    parts = []
+    segment_start = 0
+    delimiter = ";"
+    quote = None
+    i = 0
+    n = len(script)
+
+    def flush(end):
+        parts.append(script[segment_start:end])
+
+    def pending_empty():
+        return not "".join(parts).strip() and not script[segment_start:i].strip()
+
+    while i < n:
+        ch = script[i]
+        if quote:
+            if ch == "\\" and quote != "`":
+                i += 2
+                continue
+            if ch == quote:
+                if i + 1 < n and script[i + 1] == quote:
+                    i += 2
+                    continue
+                quote = None
+            i += 1
+            continue
+
+        if ch in "Dd" and (i == 0 or script[i - 1].isspace()):
+            # DELIMITER 只在语句开头识别，作用到行尾
+            match = DELIMITER_COMMAND.match(script, i)
+            if match and pending_empty():
+                delimiter = match.group(1)
+                parts = []
+                i = segment_start = match.end()
+                continue
+
+        if ch in ("'", '"', "`"):
+            quote = ch
+        elif script.startswith(delimiter, i):
+            flush(i)
+            statement = "".join(parts).strip()
+            if statement:
+                statements.append(statement)
+            parts = []
+            i = segment_start = i + len(delimiter)
+            continue
+        elif ch == "#" or (script.startswith("--", i) and (i + 2 >= n or script[i + 2] in " \t\r\n")):
+            flush(i)
+            end = script.find("\n", i)
+            i = segment_start = n if end == -1 else end
+            continue
+        elif script.startswith("/*", i) and not script.startswith(KEPT_COMMENTS, i):
+            flush(i)
+            end = script.find("*/", i + 2)
+            i = segment_start = n if end == -1 else end + 2
+            continue
+        i += 1
+
+    flush(n)
+    statement = "".join(parts).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def is_data_statement(statement):
+    match = LEADING_KEYWORD.match(statement)
+    return bool(match) and match.group(1).upper() in DATA_KEYWORDS
+
+
+class SeedingPipeline:
+    """批量导入练习数据
+
+    1. 解析：完整解析脚本，得到独立的语句；
+    2. 建表：连续的DDL合并为多语句批次发送；
+    3. 插入：连续的数据语句按批次大小合并发送，关闭外键和唯一性检查；
+    4. 导入：大表以CSV提供，优先 LOAD DATA LOCAL INFILE，服务器禁用时回退到批量 executemany；
+    5. 提交：数据在同一个事务中提交。
+    每个阶段的耗时（毫秒）都记录在返回的报告中。
+    """
+
+    def __init__(self, batch_bytes=1024 * 1024, load_batch_rows=5000, metrics=None):
+        self.batch_bytes = batch_bytes
+        self.load_batch_rows = load_batch_rows
+        self.metrics = metrics
+
+    def seed(self, conn_params, script, data_files=None, enable_local_infile=False):
+        """执行初始化脚本并导入CSV数据，返回各阶段耗时报告
+
+        data_files 为 [(表名, CSV文件路径)]，CSV首行为列名，NULL 值写作不带引号的 NULL。
+        enable_local_infile 为 True 时尝试以管理员权限在服务器上开启 local_infile（只用于独占的容器）。
+        """
+        report = {"statements": 0, "batches": 0, "rows_loaded": 0, "load_method": None}
+        total_start = time.perf_counter()
+
+        phase_start = time.perf_counter()
+        statements = split_statements(script)
+        report["statements"] = len(statements)
+        report["parse_ms"] = self._elapsed(phase_start)
+
+        data_files = list(data_files or [])
+        params = dict(conn_params)
+        if data_files:
+            # 只允许读取数据文件所在目录中的文件
+            params["allow_local_infile_in_path"] = os.path.commonpath(
+                [os.path.dirname(os.path.abspath(path)) for _, path in data_files]
+            )
+        conn = mysql.connector.connect(**params)
+        cursor = conn.cursor()
+        try:
+            conn.autocommit = False
+            cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+            report["schema_ms"] = 0.0
+            report["insert_ms"] = 0.0
+            for is_data, batch in self._batches(statements):
+                phase_start = time.perf_counter()
+                self._execute_batch(cursor, batch)
+                report["schema_ms" if not is_data else "insert_ms"] += self._elapsed(phase_start)
+                report["batches"] += 1
+
+            phase_start = time.perf_counter()
+            if data_files:
+                if enable_local_infile:
+                    self._enable_local_infile(cursor)
+                for table, path in data_files:
+                    rows, method = self._load_table(cursor, table, path)
+                    report["rows_loaded"] += rows
+                    report["load_method"] = method
+            report["load_ms"] = self._elapsed(phase_start)
+
+            phase_start = time.perf_counter()
+            conn.commit()
+            cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+            report["commit_ms"] = self._elapsed(phase_start)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        report["total_ms"] = self._elapsed(total_start)
+        self._record(report)
+        return report
+
+    def _batches(self, statements):
+        """把连续的同类语句合并为不超过 batch_bytes 的批次"""
+        batch, size, batch_is_data = [], 0, None
+        for statement in statements:
+            is_data = is_data_statement(statement)
+            if batch and (is_data != batch_is_data or size + len(statement) > self.batch_bytes):
+                yield batch_is_data, batch
+                batch, size = [], 0
+            batch.append(statement)
+            batch_is_data = is_data
+            size += len(statement) + 2
+        if batch:
+            yield batch_is_data, batch
+
+    def _execute_batch(self, cursor, batch):
+        """以多语句方式一次发送整个批次，出错时指出具体语句"""
+        index = 0
+        try:
+            for _ in cursor.execute(";\n".join(batch), multi=True):
+                index += 1
+        except mysql_errors.Error as e:
+            statement = batch[min(index, len(batch) - 1)]
+            raise mysql_errors.DatabaseError(
+                msg=f"{e.msg}（语句：{statement[:200]}）", errno=e.errno, sqlstate=e.sqlstate
+            ) from e
+
+    def _enable_local_infile(self, cursor):
+        try:
+            cursor.execute("SET GLOBAL local_infile = 1")
+        except mysql_errors.Error as e:
+            print(f"Error enabling local_infile: {e}")
+
+    def _load_table(self, cursor, table, path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            columns = next(csv.reader(f))
+        column_list = ", ".join(f"`{column}`" for column in columns)
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+                f"({column_list})",
+                (os.path.abspath(path),)
+            )
+            return cursor.rowcount, "load_data"
+        except mysql_errors.DatabaseError as e:
+            # 服务器或客户端拒绝本地文件导入时回退
+            if e.errno not in LOCAL_INFILE_REJECTED and "LOCAL" not in str(e).upper():
+                raise
+        return self._insert_table(cursor, table, columns, path), "executemany"
+
+    def _insert_table(self, cursor, table, columns, path):
+        """逐批读取CSV，用 executemany 发送（驱动会改写为多行INSERT）"""
+        placeholders = ", ".join(["%s"] * len(columns))
+        column_list = ", ".join(f"`{column}`" for column in columns)
+        sql = f"INSERT INTO `{table}` ({column_list}) VALUES ({placeholders})"
+        total = 0
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            batch = []
+            for row in reader:
+                batch.append([None if value == "NULL" else value for value in row])
+                if len(batch) >= self.load_batch_rows:
+                    cursor.executemany(sql, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+                total += len(batch)
+        return total
+
+    def _elapsed(self, start):
+        return round((time.perf_counter() - start) * 1000, 2)
+
+    def _record(self, report):
+        if not self.metrics:
+            return
+        for phase in ("parse", "schema", "insert", "load", "commit", "total"):
+            self.metrics.observe(f"seed.{phase}_ms", report[f"{phase}_ms"])
+        if report["rows_loaded"]:
+            self.metrics.incr("seed.rows_loaded", report["rows_loaded"])
@@ -0,0 +1,285 @@
+import re
+import threading
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+# 去掉语句开头的注释和括号后取第一个关键字
+LEADING_KEYWORD = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|#[^\n]*(?:\n|$)|/\*.*?\*/|\()*(\w+)", re.S)
+# 服务器会执行的注释（/*!50000 ... */、MariaDB 的 /*M! ... */）和优化器提示 /*+ ... */，
+# 内容按普通语句文本分类，不能当作注释跳过
+EXECUTABLE_COMMENT = re.compile(r"/\*(?:M?!\d*|\+)(.*?)\*/", re.S)
+WRITE_IN_CTE = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+# 用户变量可以设置，会话/事务相关的设置不行
+SET_SESSION_STATE = re.compile(r"\bautocommit\b|\bTRANSACTION\b|@@|\b(?:GLOBAL|SESSION|PERSIST)\b", re.I)
+
+READ_KEYWORDS = {"SELECT", "SHOW", "DESCRIBE", "DESC", "EXPLAIN", "TABLE", "VALUES", "HELP"}
+# 会导致隐式提交的语句，执行后事务无法再回滚
+# 存储过程（CALL）中可能包含DDL或事务控制语句，按DDL处理
+DDL_KEYWORDS = {
+    "CREATE", "ALTER", "DROP", "TRUNCATE", "RENAME", "GRANT", "REVOKE", "ANALYZE", "OPTIMIZE", "REPAIR", "CALL"
+}
+# 会破坏会话事务的语句；预处理语句的内容执行前无法检查，一并拒绝
+CONTROL_KEYWORDS = {
+    "BEGIN", "START", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "LOCK", "UNLOCK", "XA",
+    "PREPARE", "EXECUTE", "DEALLOCATE"
+}
+
+# 死锁等错误会回滚整个事务，保存点随之失效
+ER_LOCK_DEADLOCK = 1213
+
+
+class SessionError(Exception):
+    """练习会话模式下不允许执行的语句"""
+
+
+def classify_statement(sql):
+    """返回语句类型：read / write / ddl / control"""
+    sql = EXECUTABLE_COMMENT.sub(r" \1 ", sql)
+    match = LEADING_KEYWORD.match(sql)
+    keyword = match.group(1).upper() if match else ""
+    if keyword == "WITH":
+        return "write" if WRITE_IN_CTE.search(sql) else "read"
+    if keyword == "SET":
+        return "control" if SET_SESSION_STATE.search(sql) else "read"
+    if keyword in READ_KEYWORDS:
+        return "read"
+    if keyword in DDL_KEYWORDS:
+        return "ddl"
+    if keyword in CONTROL_KEYWORDS:
+        return "control"
+    return "write"
+
+
+class _Session:
+    def __init__(self, conn_params=None, tainted=True):
+        self.conn_params = dict(conn_params or {})
+        self.conn = None
+        # 同一会话的语句串行执行，锁可能在一个线程获取、在另一个线程释放
+        self.lock = threading.Lock()
+        self.savepoints = []
+        self.counter = 0
+        self.pending = None  # 当前语句执行前创建的保存点
+        self.pending_ddl = False
+        self.drain = False
+        # 执行过DDL（或会话建立前状态未知），事务已被隐式提交，重置只能重新导入数据
+        self.tainted = tainted
+
+
+class SessionManager:
+    """练习会话：每个实例固定一条连接，用户的修改都在一个长事务中
+
+    每条写语句执行前创建保存点，撤销上一条语句即 ROLLBACK TO SAVEPOINT，
+    重置即 ROLLBACK，耗时与数据集大小无关。DDL会隐式提交事务，
+    执行过DDL的会话只能撤销DDL之后的语句，重置时由服务重新导入数据。
+
+    提供与 ConnectionPoolManager 相同的借出/归还接口，阻塞方法应在数据库线程池中调用。
+    """
+
+    BROKEN_ERRORS = (mysql_errors.OperationalError, mysql_errors.InterfaceError)
+
+    def __init__(self, max_undo=100, metrics=None):
+        self.max_undo = max_undo
+        self.metrics = metrics
+        self._sessions = {}
+        self._owners = {}  # id(conn) -> 会话
+        self._lock = threading.Lock()
+
+    def owns(self, conn):
+        with self._lock:
+            return id(conn) in self._owners
+
+    @contextmanager
+    def connection(self, key, conn_params):
+        conn = self.acquire(key, conn_params)
+        try:
+            yield conn
+        except self.BROKEN_ERRORS:
+            self.release(conn, discard=True)
+            raise
+        except Exception:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def acquire(self, key, conn_params):
+        """借出实例的会话连接，其他语句正在执行时等待"""
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _Session(conn_params)
+        session.lock.acquire()
+        try:
+            if session.conn is not None and session.conn_params != conn_params:
+                # 实例重启后端口变化，原事务已随旧连接结束
+                self._drop_connection(session)
+            if session.conn is None:
+                session.conn = mysql.connector.connect(**conn_params)
+                session.conn_params = dict(conn_params)
+                session.conn.autocommit = False
+                self._record("session.opened")
+        except Exception:
+            session.lock.release()
+            raise
+        with self._lock:
+            self._owners[id(session.conn)] = session
+        return session.conn
+
+    def discard(self, conn):
+        """结果未读完：归还时读掉剩余结果，会话连接不能直接关闭"""
+        session = self._session_of(conn)
+        if session:
+            session.drain = True
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            session = self._owners.pop(id(conn), None)
+        if session is None:
+            return
+        try:
+            if discard or session.drain:
+                session.drain = False
+                try:
+                    conn.consume_results()
+                except Exception:
+                    # 连接已损坏，未提交的修改随之丢失
+                    self._drop_connection(session)
+        finally:
+            session.lock.release()
+
+    def check_statement(self, sql):
+        """会话模式下不允许的语句抛出 SessionError，返回语句类型"""
+        kind = classify_statement(sql)
+        if kind == "control":
+            raise SessionError("练习会话模式下不支持事务控制语句和会话设置，请使用撤销或重置功能")
+        return kind
+
+    def begin_statement(self, conn, sql):
+        """执行用户语句前调用：写语句先创建保存点，拒绝事务控制语句"""
+        session = self._session_of(conn)
+        if session is None:
+            return
+        kind = self.check_statement(sql)
+        session.pending = None
+        session.pending_ddl = kind == "ddl"
+        if kind == "write":
+            session.counter += 1
+            name = f"sp_{session.counter}"
+            cursor = conn.cursor()
+            cursor.execute(f"SAVEPOINT {name}")
+            cursor.close()
+            session.pending = name
+
+    def end_statement(self, conn, ok, error=None):
+        """语句执行后调用：成功的写语句保存点入栈，失败的释放；执行过（包括失败的）DDL的会话不能再回滚重置"""
+        session = self._session_of(conn)
+        if session is None:
+            return
+        name, session.pending = session.pending, None
+        if getattr(error, "errno", None) == ER_LOCK_DEADLOCK:
+            # 整个事务已被回滚
+            session.savepoints.clear()
+            return
+        if session.pending_ddl:
+            # MySQL在执行DDL之前就隐式提交事务，DDL本身失败时事务同样已提交
+            session.pending_ddl = False
+            session.tainted = True
+            session.savepoints.clear()
+            return
+        if not name:
+            return
+        if ok:
+            session.savepoints.append(name)
+            # 只保留最近的若干个可撤销语句，更早的保存点留在事务中但不再跟踪
+            del session.savepoints[:-self.max_undo]
+        else:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"RELEASE SAVEPOINT {name}")
+                cursor.close()
+            except Exception:
+                session.savepoints.clear()
+
+    def undo(self, key):
+        """撤销上一条成功的写语句，没有可撤销的语句时返回False"""
+        session = self._sessions.get(key)
+        if session is None:
+            return False
+        with session.lock:
+            if session.conn is None or not session.savepoints:
+                return False
+            name = session.savepoints.pop()
+            cursor = session.conn.cursor()
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            cursor.execute(f"RELEASE SAVEPOINT {name}")
+            cursor.close()
+        self._record("session.undo")
+        return True
+
+    def reset(self, key):
+        """回滚会话中的全部修改；无法保证回到初始状态时返回False，由调用方重新导入数据"""
+        session = self._sessions.get(key)
+        if session is None:
+            # 服务重启等原因没有会话记录，此前是否执行过DDL未知
+            return False
+        with session.lock:
+            if session.tainted:
+                return False
+            if session.conn is not None:
+                session.conn.rollback()
+            session.savepoints.clear()
+            session.counter = 0
+        self._record("session.reset")
+        return True
+
+    def has_uncommitted(self, key):
+        """会话事务中是否可能有未提交的修改"""
+        session = self._sessions.get(key)
+        return bool(session and session.conn is not None and session.counter)
+
+    def mark_pristine(self, key):
+        """新建或重新导入数据后登记一个干净的会话，下一次查询时建立连接"""
+        with self._lock:
+            self._sessions[key] = _Session(tainted=False)
+
+    def close(self, key):
+        """结束会话并回滚未提交的修改；删除或重建数据库前必须调用，否则会等待会话持有的元数据锁"""
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is None:
+            return
+        with session.lock:
+            self._drop_connection(session)
+
+    def close_all(self):
+        with self._lock:
+            keys = list(self._sessions)
+        for key in keys:
+            self.close(key)
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "tainted": sum(1 for session in sessions if session.tainted),
+            "savepoints": sum(len(session.savepoints) for session in sessions)
+        }
+
+    def _session_of(self, conn):
+        with self._lock:
+            return self._owners.get(id(conn))
+
+    def _drop_connection(self, session):
+        conn, session.conn = session.conn, None
+        session.savepoints.clear()
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _record(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
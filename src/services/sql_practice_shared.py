@@ -0,0 +1,337 @@
+import uuid
+import secrets
+from datetime import datetime
+import mysql.connector
+from src.services.sql_practice_backend import PracticeBackend
+
+
+class SharedMySQLBackend(PracticeBackend):
+    """共享MySQL后端：少量长期运行的MySQL服务器承载大量用户库，每个用户库配有独立的受限账号"""
+
+    name = "shared"
+    ID_PREFIX = "shared-"
+    META_DATABASE = "sql_practice_meta"
+    TENANT_PRIVILEGES = (
+        "SELECT, INSERT, UPDATE, DELETE, CREATE, DROP, ALTER, INDEX, REFERENCES, "
+        "CREATE VIEW, SHOW VIEW, CREATE TEMPORARY TABLES, LOCK TABLES"
+    )
+
+    def __init__(self, service, servers, root_user, root_password, max_schemas_per_server=200,
+                 max_user_connections=5):
+        self.service = service
+        self.servers = [self._parse_server(server) for server in servers]
+        self.root_user = root_user
+        self.root_password = root_password
+        self.max_schemas_per_server = max_schemas_per_server
+        self.max_user_connections = max_user_connections
+        self._meta_ready = set()
+        # 实例ID -> (服务器序号, 元数据行)；账号和库名在实例存续期间不变，查询连接参数时无需再连接服务器
+        self._tenants = {}
+
+        if not self.servers:
+            raise ValueError("共享后端未配置MySQL服务器")
+
+    @staticmethod
+    def _parse_server(server):
+        host, _, port = server.rpartition(":")
+        if not host:
+            return server, 3306
+        return host, int(port)
+
+    def _split_id(self, database_id):
+        _, index, _ = database_id.split("-", 2)
+        return int(index)
+
+    def _admin_connect(self, index, database=None):
+        host, port = self.servers[index]
+        conn = mysql.connector.connect(
+            host=host,
+            port=port,
+            user=self.root_user,
+            password=self.root_password,
+            database=database
+        )
+        if index not in self._meta_ready:
+            self._ensure_meta(conn)
+            self._meta_ready.add(index)
+        return conn
+
+    def _ensure_meta(self, conn):
+        """创建记录租户实例的元数据表"""
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.META_DATABASE}`")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{self.META_DATABASE}`.instances (
+                id VARCHAR(64) PRIMARY KEY,
+                user_id VARCHAR(64) NOT NULL,
+                username VARCHAR(100),
+                db_name VARCHAR(64) NOT NULL UNIQUE,
+                account VARCHAR(32) NOT NULL,
+                password VARCHAR(64) NOT NULL,
+                difficulty VARCHAR(20) NOT NULL,
+                created_at DATETIME NOT NULL,
+                expires_at DATETIME NOT NULL,
+                INDEX idx_user_id (user_id)
+            )
+        """)
+        conn.commit()
+        cursor.close()
+
+    def _fetch_instances(self, index, where, params):
+        conn = self._admin_connect(index)
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"SELECT * FROM `{self.META_DATABASE}`.instances WHERE {where}", params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _get_instance(self, database_id):
+        """实例的服务器序号和元数据，优先使用内存缓存；重置、续租和删除时使缓存失效"""
+        cached = self._tenants.get(database_id)
+        if cached:
+            return cached
+        index = self._split_id(database_id)
+        rows = self._fetch_instances(index, "id = %s", (database_id,))
+        if not rows:
+            return index, None
+        self._tenants[database_id] = (index, rows[0])
+        return index, rows[0]
+
+    def _pick_server(self):
+        """选择租户数最少且未满的服务器"""
+        best_index, best_count = None, None
+        for index in range(len(self.servers)):
+            try:
+                conn = self._admin_connect(index)
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM `{self.META_DATABASE}`.instances")
+                count = cursor.fetchone()[0]
+                cursor.close()
+                conn.close()
+            except Exception as e:
+                print(f"Error checking shared server {self.servers[index]}: {e}")
+                continue
+            if count < self.max_schemas_per_server and (best_count is None or count < best_count):
+                best_index, best_count = index, count
+        if best_index is None:
+            raise Exception("共享数据库服务器容量已满")
+        return best_index
+
+    def _format_instance(self, index, row):
+        host, port = self.servers[index]
+        return {
+            "id": row["id"],
+            "name": row["db_name"],
+            "user_id": row["user_id"],
+            "username": row["username"],
+            "dbName": row["db_name"],
+            "status": "running",
+            "created": row["created_at"].isoformat(),
+            "expiresAt": row["expires_at"].isoformat(),
+            "difficulty": row["difficulty"],
+            "host": host,
+            "port": str(port)
+        }
+
+    async def create_database(self, user_id, username, db_name, difficulty, expires_at):
+        """在共享服务器上创建用户库、受限账号并初始化数据"""
+        index, database_id, db_name = await self.service._run_db(
+            self._create_tenant, user_id, username, db_name, difficulty, expires_at
+        )
+
+        try:
+            await self._seed(index, db_name, difficulty)
+        except Exception:
+            await self.delete_database(database_id)
+            raise
+
+        return await self.get_database_info(database_id)
+
+    def _create_tenant(self, user_id, username, db_name, difficulty, expires_at):
+        index = self._pick_server()
+        database_id = f"{self.ID_PREFIX}{index}-{uuid.uuid4().hex[:12]}"
+        account = f"u_{uuid.uuid4().hex[:12]}"
+        password = secrets.token_urlsafe(16)
+
+        conn = self._admin_connect(index)
+        cursor = conn.cursor()
+        try:
+            # 库名冲突时（不同用户名清理后相同）追加随机后缀
+            cursor.execute("SELECT 1 FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (db_name,))
+            if cursor.fetchone():
+                db_name = f"{db_name[:24]}_{uuid.uuid4().hex[:6]}"
+
+            cursor.execute(f"CREATE DATABASE `{db_name}`")
+            cursor.execute(
+                f"CREATE USER '{account}'@'%' IDENTIFIED BY %s "
+                f"WITH MAX_USER_CONNECTIONS {int(self.max_user_connections)}",
+                (password,)
+            )
+            cursor.execute(f"GRANT {self.TENANT_PRIVILEGES} ON `{db_name}`.* TO '{account}'@'%'")
+            cursor.execute(
+                f"INSERT INTO `{self.META_DATABASE}`.instances "
+                "(id, user_id, username, db_name, account, password, difficulty, created_at, expires_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (database_id, str(user_id), username, db_name, account, password, difficulty,
+                 datetime.now(), expires_at)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        return index, database_id, db_name
+
+    async def _seed(self, index, db_name, difficulty):
+        host, port = self.servers[index]
+        await self.service._run_init_script(
+            host=host,
+            port=port,
+            user=self.root_user,
+            password=self.root_password,
+            database=db_name,
+            difficulty=difficulty
+        )
+
+    async def get_database_info(self, database_id):
+        index, row = await self.service._run_db(self._get_instance, database_id)
+        if not row:
+            return None
+        return self._format_instance(index, row)
+
+    async def get_user_database(self, user_id):
+        """获取用户最新创建的共享实例"""
+        instances = await self.service._run_db(self._find_user_instances, user_id)
+        if not instances:
+            return None
+        index, row = max(instances, key=lambda item: item[1]["created_at"])
+        return self._format_instance(index, row)
+
+    async def get_connection_params(self, database_id):
+        """返回租户账号的连接参数"""
+        index, row = await self.service._run_db(self._get_instance, database_id)
+        if not row:
+            raise Exception("数据库实例不存在")
+        host, port = self.servers[index]
+        return {
+            "host": host,
+            "port": port,
+            "user": row["account"],
+            "password": row["password"],
+            "database": row["db_name"]
+        }
+
+    def get_admin_params(self, database_id):
+        """返回实例所在服务器的管理员连接参数"""
+        host, port = self.servers[self._split_id(database_id)]
+        return {
+            "host": host,
+            "port": port,
+            "user": self.root_user,
+            "password": self.root_password
+        }
+
+    async def reset_database(self, database_id, difficulty="easy"):
+        """删除并重建用户库；库级授权不随DROP DATABASE删除"""
+        index, row = await self.service._run_db(self._get_instance, database_id)
+        if not row:
+            raise Exception("数据库实例不存在")
+        self._tenants.pop(database_id, None)
+
+        await self.service._run_db(self._recreate_schema, index, row["db_name"])
+        await self._seed(index, row["db_name"], row["difficulty"] or difficulty)
+        return True
+
+    def _recreate_schema(self, index, db_name):
+        conn = self._admin_connect(index)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
+            cursor.execute(f"CREATE DATABASE `{db_name}`")
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def delete_database(self, database_id):
+        """删除用户库、租户账号和元数据"""
+        return await self.service._run_db(self._delete_tenant, database_id)
+
+    def _delete_tenant(self, database_id):
+        self.service._close_query_connections(database_id)
+        index, row = self._get_instance(database_id)
+        if not row:
+            return True
+
+        conn = self._admin_connect(index)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{row['db_name']}`")
+            cursor.execute(f"DROP USER IF EXISTS '{row['account']}'@'%'")
+            cursor.execute(f"DELETE FROM `{self.META_DATABASE}`.instances WHERE id = %s", (database_id,))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        self._tenants.pop(database_id, None)
+        return True
+
+    async def cleanup_user_databases(self, user_id):
+        """删除用户在所有共享服务器上的实例"""
+        for _, row in await self.service._run_db(self._find_user_instances, user_id):
+            await self.delete_database(row["id"])
+        return True
+
+    def _find_user_instances(self, user_id):
+        instances = []
+        for index in self._user_servers(user_id):
+            for row in self._fetch_server_instances(index, "user_id = %s", (str(user_id),)):
+                instances.append((index, row))
+        return instances
+
+    def _user_servers(self, user_id):
+        """用户实例所在的服务器：实例存储中记录了实例ID（包含服务器序号）时只查询这些服务器"""
+        if self.service.store:
+            try:
+                rows = self.service.store.for_user(user_id)
+                return sorted({self._split_id(row["id"]) for row in rows if row["backend"] == self.name})
+            except Exception as e:
+                print(f"Error reading practice instance store: {e}")
+        return range(len(self.servers))
+
+    def _fetch_server_instances(self, index, where, params):
+        """查询单台服务器，服务器不可达时记录错误并跳过，不影响其他服务器上的实例"""
+        try:
+            return self._fetch_instances(index, where, params)
+        except Exception as e:
+            print(f"Error querying shared server {self.servers[index]}: {e}")
+            return []
+
+    async def list_leases(self):
+        """返回所有共享实例的ID和到期时间"""
+        return await self.service._run_db(self._list_leases)
+
+    def _list_leases(self):
+        leases = []
+        for index in range(len(self.servers)):
+            for row in self._fetch_server_instances(index, "1 = 1", ()):
+                leases.append((row["id"], row["expires_at"]))
+        return leases
+
+    async def update_expiry(self, database_id, expires_at):
+        """续租时更新实例的到期时间"""
+        await self.service._run_db(self._update_expiry, database_id, expires_at)
+
+    def _update_expiry(self, database_id, expires_at):
+        self._tenants.pop(database_id, None)
+        conn = self._admin_connect(self._split_id(database_id))
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"UPDATE `{self.META_DATABASE}`.instances SET expires_at = %s WHERE id = %s",
+                (expires_at, database_id)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
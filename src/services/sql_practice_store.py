@@ -0,0 +1,176 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.models.practice_instance import PracticeInstance
+
+
+def _parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _parse_port(value):
+    return int(value) if value else None
+
+
+class PracticeInstanceStore:
+    """练习实例状态持久化到应用数据库
+
+    Docker标签和进程内注册表只作为缓存；按用户查询走索引，状态在Docker重启、
+    服务重启和多个API进程之间保持一致。每次生命周期变化在一个事务中写入。
+    阻塞方法，应在数据库线程池中调用。
+    """
+
+    def __init__(self, session_factory, metrics=None):
+        self.session_factory = session_factory
+        self.metrics = metrics
+
+    @contextmanager
+    def _session(self):
+        session = self.session_factory()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def save(self, db_info, backend="container", dataset_rows=None):
+        """新建或覆盖实例记录，db_info 为API响应格式的实例信息"""
+        with self._session() as session:
+            session.merge(PracticeInstance(
+                id=db_info["id"],
+                user_id=int(db_info["user_id"]),
+                backend=backend,
+                name=db_info.get("name"),
+                username=db_info.get("username"),
+                db_name=db_info.get("dbName"),
+                difficulty=db_info.get("difficulty") or "easy",
+                dataset_rows=dataset_rows,
+                status=db_info.get("status") or "running",
+                port=_parse_port(db_info.get("port")),
+                expires_at=_parse_time(db_info.get("expiresAt")),
+                last_activity_at=datetime.now()
+            ))
+        self._record("store.saved")
+
+    def get(self, instance_id):
+        with self._session() as session:
+            instance = session.get(PracticeInstance, instance_id)
+            return self._to_dict(instance) if instance else None
+
+    def get_many(self, instance_ids):
+        """按ID批量读取记录，返回 实例ID -> 记录"""
+        if not instance_ids:
+            return {}
+        with self._session() as session:
+            instances = (
+                session.query(PracticeInstance)
+                .filter(PracticeInstance.id.in_(list(instance_ids)))
+                .all()
+            )
+            return {instance.id: self._to_dict(instance) for instance in instances}
+
+    def latest_for_user(self, user_id):
+        """用户最新创建的实例"""
+        with self._session() as session:
+            instance = (
+                session.query(PracticeInstance)
+                .filter(PracticeInstance.user_id == int(user_id))
+                .order_by(PracticeInstance.created_at.desc())
+                .first()
+            )
+            return self._to_dict(instance) if instance else None
+
+    def for_user(self, user_id):
+        with self._session() as session:
+            instances = (
+                session.query(PracticeInstance)
+                .filter(PracticeInstance.user_id == int(user_id))
+                .all()
+            )
+            return [self._to_dict(instance) for instance in instances]
+
+    def known_ids(self, instance_ids):
+        """返回已有记录的实例ID"""
+        if not instance_ids:
+            return set()
+        with self._session() as session:
+            rows = (
+                session.query(PracticeInstance.id)
+                .filter(PracticeInstance.id.in_(list(instance_ids)))
+                .all()
+            )
+            return {row.id for row in rows}
+
+    def leases(self):
+        """尚未被回收的实例ID和到期时间，供回收任务登记"""
+        with self._session() as session:
+            rows = (
+                session.query(PracticeInstance.id, PracticeInstance.expires_at)
+                .filter(PracticeInstance.status != "evicted", PracticeInstance.expires_at.isnot(None))
+                .all()
+            )
+            return [(row.id, row.expires_at) for row in rows]
+
+    def touch(self, instance_id, expires_at=None):
+        """用户有活动：记录活动时间并续租"""
+        values = {PracticeInstance.last_activity_at: datetime.now()}
+        if expires_at:
+            values[PracticeInstance.expires_at] = _parse_time(expires_at)
+        with self._session() as session:
+            session.query(PracticeInstance).filter(PracticeInstance.id == instance_id).update(
+                values, synchronize_session=False
+            )
+
+    def update_status(self, instance_id, status, port=None):
+        with self._session() as session:
+            return session.query(PracticeInstance).filter(PracticeInstance.id == instance_id).update(
+                {PracticeInstance.status: status, PracticeInstance.port: _parse_port(port)},
+                synchronize_session=False
+            )
+
+    def purge_status(self, status, before):
+        """删除在 before 之前进入 status 状态的记录（如过期的回收通知）"""
+        with self._session() as session:
+            return session.query(PracticeInstance).filter(
+                PracticeInstance.status == status,
+                PracticeInstance.updated_at < before
+            ).delete(synchronize_session=False)
+
+    def delete(self, instance_id):
+        with self._session() as session:
+            deleted = session.query(PracticeInstance).filter(PracticeInstance.id == instance_id).delete(
+                synchronize_session=False
+            )
+        if deleted:
+            self._record("store.deleted")
+        return deleted
+
+    def _to_dict(self, instance):
+        return {
+            "id": instance.id,
+            "user_id": instance.user_id,
+            "backend": instance.backend,
+            "name": instance.name,
+            "username": instance.username,
+            "db_name": instance.db_name,
+            "difficulty": instance.difficulty,
+            "dataset_rows": instance.dataset_rows,
+            "status": instance.status,
+            "port": instance.port,
+            "expires_at": instance.expires_at,
+            "last_activity_at": instance.last_activity_at,
+            "created_at": instance.created_at,
+            "updated_at": instance.updated_at,
+        }
+
+    def _record(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
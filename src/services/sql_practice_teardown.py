@@ -0,0 +1,153 @@
+import time
+import asyncio
+import docker
+
+# 待删除的容器改为此前缀的名称，服务重启后据此继续删除
+TEARDOWN_PREFIX = "sql-teardown-"
+
+
+class TeardownQueue:
+    """练习容器的销毁：先并行停止容器，再删除容器及其数据卷
+
+    停止后主机端口和内存即被释放，调用方（如创建新实例）无需等待删除完成；
+    删除容器文件系统和数据卷较慢，deferred 为 True 时交给后台队列执行，失败后重试。
+    练习容器可随时丢弃，force 为 True 时直接 kill，不等待MySQL正常关闭。
+    """
+
+    def __init__(self, service, concurrency=4, force=True, deferred=True, stop_timeout=5,
+                 retry_delay=5.0, max_attempts=5, metrics=None):
+        self.service = service
+        self.concurrency = concurrency
+        self.force = force
+        self.deferred = deferred
+        self.stop_timeout = stop_timeout
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+
+        self._queue = None
+        self._pending = set()
+        self._workers = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        # 上次退出时未删除完的容器
+        try:
+            leftovers = await self.service.docker.list(all=True, filters={"name": TEARDOWN_PREFIX})
+        except Exception as e:
+            print(f"Error listing containers pending teardown: {e}")
+            return
+        for container in leftovers:
+            if container.name.startswith(TEARDOWN_PREFIX):
+                self.service.registry.discard(container.id)
+                self._enqueue(container.id)
+
+    async def stop(self):
+        # 队列中的容器已改名，下次启动时继续删除
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def is_pending(self, container_id):
+        return container_id in self._pending
+
+    async def release(self, container_ids):
+        """并行停止容器，返回时端口和内存已释放；容器删除按 deferred 在后台或当场完成"""
+        container_ids = [container_id for container_id in container_ids if container_id not in self._pending]
+        if not container_ids:
+            return
+        started = time.perf_counter()
+        await asyncio.gather(*(self._retire(container_id) for container_id in container_ids),
+                             return_exceptions=True)
+        if self.metrics:
+            self.metrics.observe("teardown.stop_ms", round((time.perf_counter() - started) * 1000, 2))
+
+        container_ids = [container_id for container_id in container_ids if container_id in self._pending]
+        if self.deferred and self._workers:
+            for container_id in container_ids:
+                self._enqueue(container_id)
+        else:
+            await asyncio.gather(*(self._remove(container_id) for container_id in container_ids),
+                                 return_exceptions=True)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "force": self.force,
+            "deferred": self.deferred,
+        }
+
+    async def _retire(self, container_id):
+        """改名并停止容器；容器已不存在时直接返回，其余失败留在 _pending 中交由删除流程重试"""
+        self._pending.add(container_id)
+        self.service.registry.discard(container_id)
+        self._gauge()
+        client = self.service.docker
+        try:
+            await client.rename(container_id, f"{TEARDOWN_PREFIX}{container_id[:12]}")
+            if self.force:
+                await client.kill(container_id)
+            else:
+                await client.stop(container_id, timeout=self.stop_timeout)
+        except docker.errors.NotFound:
+            self._done(container_id)
+        except docker.errors.APIError as e:
+            if e.status_code == 409 and "not running" in str(e).lower():
+                return  # 已停止（如休眠的实例）
+            # 暂停等状态无法 kill 时当场强制删除，保证资源被释放
+            print(f"Error stopping container {container_id}, removing it now: {e}")
+            await self._remove(container_id)
+        except Exception as e:
+            # 连接错误、超时等：容器可能仍在运行且未改名，release 随后会将其交给删除流程
+            print(f"Error stopping container {container_id}: {e}")
+            self._record("teardown.failed")
+
+    def _enqueue(self, container_id):
+        self._pending.add(container_id)
+        self._queue.put_nowait((container_id, 1))
+        self._gauge()
+
+    async def _work(self):
+        while True:
+            container_id, attempt = await self._queue.get()
+            try:
+                if not await self._remove(container_id, final=attempt >= self.max_attempts):
+                    asyncio.get_running_loop().call_later(
+                        self.retry_delay * attempt, self._queue.put_nowait, (container_id, attempt + 1)
+                    )
+            finally:
+                self._queue.task_done()
+
+    async def _remove(self, container_id, final=True):
+        """删除容器及其匿名数据卷，成功（或容器已不存在）返回True"""
+        started = time.perf_counter()
+        try:
+            await self.service.docker.remove(container_id, force=True, v=True)
+        except docker.errors.NotFound:
+            pass
+        except Exception as e:
+            print(f"Error removing container {container_id}: {e}")
+            self._record("teardown.failed")
+            if not final:
+                return False
+            # 放弃重试；容器名带有前缀，下次启动时再删除
+        else:
+            if self.metrics:
+                self.metrics.incr("teardown.removed")
+                self.metrics.observe("teardown.remove_ms", round((time.perf_counter() - started) * 1000, 2))
+        self._done(container_id)
+        return True
+
+    def _done(self, container_id):
+        self._pending.discard(container_id)
+        self._gauge()
+
+    def _gauge(self):
+        if self.metrics:
+            self.metrics.set_gauge("teardown.pending", len(self._pending))
+
+    def _record(self, name):
+        if self.metrics:
+            self.metrics.incr(name)
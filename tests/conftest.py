@@ -0,0 +1,30 @@
+import pytest
+
+from src.scripts.fake_docker_engine import serve
+
+
+@pytest.fixture
+def fake_engine_socket(tmp_path):
+    """unix 套接字上的 Fake Docker Engine，返回 DOCKER_HOST 格式的地址"""
+    socket_path = tmp_path / "docker.sock"
+    server = serve(socket_path=str(socket_path), ready_after=0.1)
+    yield f"unix://{socket_path}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_engine_urls():
+    """启动多台TCP上的 Fake Docker Engine，返回创建函数，参数为主机数"""
+    servers = []
+
+    def start(count):
+        for _ in range(count):
+            server = serve(port=0, ready_after=0.1)
+            servers.append(server)
+        return [f"http://127.0.0.1:{server.server_address[1]}" for server in servers[-count:]]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
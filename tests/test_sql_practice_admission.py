@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from src.services.sql_practice_admission import AdmissionController, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def hold(controller, user_id, order, release, containers=True, background=False):
+    async with controller.admit(user_id, containers=containers, background=background):
+        order.append(user_id)
+        await release.wait()
+
+
+def test_limits_in_flight_and_admits_in_order():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, poll_interval=0.01)
+        order = []
+        releases = {user_id: asyncio.Event() for user_id in range(4)}
+        tasks = [asyncio.create_task(hold(controller, user_id, order, releases[user_id])) for user_id in range(4)]
+        await asyncio.sleep(0.02)
+        first = (list(order), controller.stats()["inFlight"], controller.stats()["queued"])
+        releases[1].set()
+        await asyncio.sleep(0.02)
+        second = list(order)
+        for release in releases.values():
+            release.set()
+        await asyncio.gather(*tasks)
+        return first, second, controller.stats()
+
+    first, second, stats = run(scenario())
+    assert first == ([0, 1], 2, 2)
+    assert second == [0, 1, 2]
+    assert stats["inFlight"] == 0 and stats["queued"] == 0
+
+
+def test_host_capacity_blocks_queue_head():
+    async def scenario():
+        load = {"containers": 1}
+        controller = AdmissionController(
+            max_in_flight=4, host_capacity=2, host_load=lambda: load["containers"], poll_interval=0.01
+        )
+        order = []
+        release = asyncio.Event()
+        tasks = [
+            asyncio.create_task(hold(controller, 1, order, release)),
+            asyncio.create_task(hold(controller, 2, order, release)),
+            # 不占用容器的请求也不会越过排在前面的请求
+            asyncio.create_task(hold(controller, 3, order, release, containers=False)),
+        ]
+        await asyncio.sleep(0.03)
+        blocked = list(order)
+        # 容量在别处释放（如删除容器）时由轮询发现
+        load["containers"] = 0
+        await asyncio.sleep(0.03)
+        admitted = list(order)
+        release.set()
+        await asyncio.gather(*tasks)
+        return blocked, admitted
+
+    blocked, admitted = run(scenario())
+    assert blocked == [1]
+    assert admitted == [1, 2, 3]
+
+
+def test_rejects_when_queue_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, poll_interval=0.01)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(hold(controller, 1, order, release))
+        queued = asyncio.create_task(hold(controller, 2, order, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            controller.check()
+        with pytest.raises(AdmissionRejected):
+            async with controller.admit(3):
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value.retry_after, order
+
+    retry_after, order = run(scenario())
+    assert retry_after > 0
+    assert order == [1, 2]
+
+
+def test_queue_timeout_removes_ticket():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, poll_interval=0.01)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(hold(controller, 1, order, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hold(controller, 2, order, release), 0.05)
+        waiting = controller.stats()["queued"]
+        release.set()
+        await running
+        # 超时的请求不占用名额，之后的请求可以立即放行
+        await asyncio.wait_for(hold(controller, 3, order, release), 0.1)
+        return waiting, order, controller.stats()
+
+    waiting, order, stats = run(scenario())
+    assert waiting == 0
+    assert order == [1, 3]
+    assert stats["inFlight"] == 0
+
+
+def test_cancel_after_admission_releases_slot():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, poll_interval=0.01)
+        release = asyncio.Event()
+        order = []
+        task = asyncio.create_task(hold(controller, 1, order, release))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return controller.stats()["inFlight"]
+
+    assert run(scenario()) == 0
+
+
+def test_background_requests_count_against_limit_and_yield_to_users():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, poll_interval=0.01)
+        order = []
+        releases = {user_id: asyncio.Event() for user_id in ("pool-1", "pool-2", "user")}
+        tasks = [asyncio.create_task(hold(controller, "pool-1", order, releases["pool-1"], background=True))]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(hold(controller, "pool-2", order, releases["pool-2"], background=True)))
+        await asyncio.sleep(0.01)
+        # 后台请求不计入排队人数，用户请求不会因此被拒绝
+        controller.check()
+        tasks.append(asyncio.create_task(hold(controller, "user", order, releases["user"])))
+        await asyncio.sleep(0.01)
+        first = (list(order), controller.stats())
+        releases["pool-1"].set()
+        await asyncio.sleep(0.02)
+        second = list(order)
+        for release in releases.values():
+            release.set()
+        await asyncio.gather(*tasks)
+        return first, second, list(order)
+
+    (order, stats), second, final = run(scenario())
+    assert order == ["pool-1"]
+    assert stats["inFlight"] == 1 and stats["queued"] == 1 and stats["backgroundQueued"] == 1
+    assert second == ["pool-1", "user"]
+    assert final == ["pool-1", "user", "pool-2"]
@@ -0,0 +1,117 @@
+import asyncio
+
+import docker
+import pytest
+
+from src.services.sql_practice_docker import AsyncDockerClient
+
+
+def run_with_client(base_url, scenario):
+    async def main():
+        client = AsyncDockerClient(base_url=base_url, timeout=5.0)
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def test_container_lifecycle(fake_engine_socket):
+    async def scenario(client):
+        container = await client.run(
+            "mysql:8.0",
+            name="sql-test-1",
+            environment={"MYSQL_DATABASE": "practice"},
+            ports={"3306/tcp": None},
+            labels={"sql_practice": "true", "user_id": "1"},
+        )
+        inspected = await client.get(container.id)
+        listed = await client.list(filters={"label": "user_id=1"})
+        await client.stop(container.id, timeout=1)
+        stopped = await client.get(container.id)
+        await client.remove(container.id, v=True)
+        with pytest.raises(docker.errors.NotFound):
+            await client.get(container.id)
+        return container, inspected, listed, stopped
+
+    container, inspected, listed, stopped = run_with_client(fake_engine_socket, scenario)
+    assert container.status == "running"
+    assert container.name == "sql-test-1"
+    assert inspected.labels == {"sql_practice": "true", "user_id": "1"}
+    assert "MYSQL_DATABASE=practice" in inspected.attrs["Config"]["Env"]
+    assert inspected.attrs["NetworkSettings"]["Ports"]["3306/tcp"][0]["HostPort"]
+    assert [c.id for c in listed] == [container.id]
+    assert stopped.status == "exited"
+
+
+def test_list_filters_and_all(fake_engine_socket):
+    async def scenario(client):
+        running = await client.run("mysql:8.0", name="a", labels={"sql_practice": "true"})
+        stopped = await client.run("mysql:8.0", name="b", labels={"sql_practice": "true"})
+        await client.run("mysql:8.0", name="c", labels={"other": "true"})
+        await client.stop(stopped.id)
+        return (
+            running.id,
+            stopped.id,
+            {c.id for c in await client.list(filters={"label": ["sql_practice"]})},
+            {c.id for c in await client.list(all=True, filters={"label": ["sql_practice"]})},
+        )
+
+    running_id, stopped_id, running_only, everything = run_with_client(fake_engine_socket, scenario)
+    assert running_only == {running_id}
+    assert everything == {running_id, stopped_id}
+
+
+def test_pulls_missing_image(fake_engine_socket):
+    async def scenario(client):
+        return await client.run("missing-image:1")
+
+    assert run_with_client(fake_engine_socket, scenario).status == "running"
+
+
+def test_rename_pause_and_logs(fake_engine_socket):
+    async def scenario(client):
+        container = await client.run("mysql:8.0", name="sql-pool-easy-1")
+        await client.rename(container.id, "sql-user-1")
+        await client.pause(container.id)
+        paused = await client.get(container.id)
+        await client.unpause(container.id)
+        await asyncio.sleep(0.15)
+        lines = [line async for line in client.logs(container.id)]
+        return await client.get(container.id), paused, lines
+
+    container, paused, lines = run_with_client(fake_engine_socket, scenario)
+    assert container.name == "sql-user-1"
+    assert paused.status == "paused"
+    assert container.status == "running"
+    assert any("ready for connections" in line for line in lines)
+
+
+@pytest.mark.parametrize("operation, error, status", [
+    ("get_missing", docker.errors.NotFound, 404),
+    ("remove_missing", docker.errors.NotFound, 404),
+    ("remove_running", docker.errors.APIError, 409),
+    ("duplicate_name", docker.errors.APIError, 409),
+    ("pause_stopped", docker.errors.APIError, 409),
+])
+def test_error_status_mapping(fake_engine_socket, operation, error, status):
+    async def scenario(client):
+        container = await client.run("mysql:8.0", name="taken")
+        if operation == "pause_stopped":
+            await client.stop(container.id)
+        operations = {
+            "get_missing": lambda: client.get("does-not-exist"),
+            "remove_missing": lambda: client.remove("does-not-exist", force=True),
+            "remove_running": lambda: client.remove(container.id),
+            "duplicate_name": lambda: client.run("mysql:8.0", name="taken"),
+            "pause_stopped": lambda: client.pause(container.id),
+        }
+        with pytest.raises(error) as raised:
+            await operations[operation]()
+        return raised.value
+
+    raised = run_with_client(fake_engine_socket, scenario)
+    assert type(raised) is error
+    assert raised.status_code == status
+    assert raised.explanation
@@ -0,0 +1,188 @@
+import json
+import asyncio
+
+import pytest
+
+from src.services.sql_practice_jobs import JobConflict, JobRunner, job_events, report_progress
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_job_state_transitions():
+    async def scenario():
+        runner = JobRunner(concurrency=1)
+        gate = asyncio.Event()
+
+        async def work():
+            report_progress("starting_container")
+            await gate.wait()
+            report_progress("seeding", "easy")
+            return {"id": "db-1"}
+
+        job, created = runner.submit("create", 1, work)
+        assert created
+        assert job.status == "queued"
+        await asyncio.sleep(0)
+        assert job.status == "running"
+        assert job.stage == "starting_container"
+        gate.set()
+        await job.task
+        return job
+
+    job = run(scenario())
+    assert job.status == "succeeded"
+    assert job.result == {"id": "db-1"}
+    assert [entry["stage"] for entry in job.history] == ["running", "starting_container", "seeding", "done"]
+    assert job.history[2]["message"] == "easy"
+    assert job.started_at <= job.finished_at
+
+
+def test_job_failure_records_error():
+    async def scenario():
+        runner = JobRunner()
+
+        async def work():
+            raise RuntimeError("容器启动失败")
+
+        job, _ = runner.submit("create", 1, work)
+        await job.task
+        return job, runner.stats()
+
+    job, stats = run(scenario())
+    assert job.status == "failed"
+    assert job.error == "容器启动失败"
+    assert (job.history[-1]["stage"], job.history[-1]["message"]) == ("failed", "容器启动失败")
+    assert stats["failed"] == 1
+
+
+def test_jobs_queue_beyond_concurrency():
+    async def scenario():
+        runner = JobRunner(concurrency=1)
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+
+        first, _ = runner.submit("create", 1, work)
+        second, _ = runner.submit("create", 2, work)
+        third, _ = runner.submit("create", 3, work)
+        await asyncio.sleep(0)
+        snapshot = (first.status, second.status, second.to_dict()["queuePosition"],
+                    third.to_dict()["queuePosition"])
+        gate.set()
+        await asyncio.gather(first.task, second.task, third.task)
+        return snapshot, [job.status for job in (first, second, third)]
+
+    snapshot, statuses = run(scenario())
+    assert snapshot == ("running", "queued", 1, 2)
+    assert statuses == ["succeeded"] * 3
+
+
+def test_duplicate_submissions():
+    async def scenario():
+        runner = JobRunner()
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+
+        job, created = runner.submit("create", 1, work, params={"difficulty": "easy"})
+        same, again = runner.submit("create", 1, work, params={"difficulty": "easy"})
+        with pytest.raises(JobConflict):
+            runner.submit("create", 1, work, params={"difficulty": "hard"})
+        keyed, _ = runner.submit("reset", 1, work, idempotency_key="k")
+        gate.set()
+        await asyncio.gather(job.task, keyed.task)
+        # 幂等键在作业完成后仍返回同一个作业
+        retried, retried_created = runner.submit("reset", 1, work, idempotency_key="k")
+        return created, same is job, again, retried is keyed, retried_created
+
+    assert run(scenario()) == (True, True, False, True, False)
+
+
+def test_idempotency_key_is_scoped_by_kind():
+    async def scenario():
+        runner = JobRunner()
+
+        async def work():
+            return True
+
+        reset, _ = runner.submit("reset", 1, work, idempotency_key="k")
+        # 客户端对不同操作复用同一幂等键时不应返回其他类型的作业
+        delete, created = runner.submit("delete", 1, work, idempotency_key="k")
+        await asyncio.gather(reset.task, delete.task)
+        return delete is not reset, created, delete.kind
+
+    assert run(scenario()) == (True, True, "delete")
+
+
+def test_cancelled_job_fails():
+    async def scenario():
+        runner = JobRunner()
+
+        async def work():
+            await asyncio.sleep(10)
+
+        job, _ = runner.submit("create", 1, work)
+        await asyncio.sleep(0)
+        await runner.stop()
+        return job
+
+    job = run(scenario())
+    assert job.status == "failed"
+    assert job.stage == "failed"
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            events.append(("keepalive", None))
+            continue
+        lines = chunk.strip().split("\n")
+        event = lines[0].removeprefix("event: ")
+        data = json.loads(lines[1].removeprefix("data: "))
+        events.append((event, data))
+    return events
+
+
+def test_job_events_order():
+    async def scenario():
+        runner = JobRunner()
+        steps = [asyncio.Event() for _ in range(3)]
+
+        async def work():
+            for stage, step in zip(("starting_container", "waiting_for_mysql", "seeding"), steps):
+                await step.wait()
+                report_progress(stage)
+            return {"id": "db-1"}
+
+        job, _ = runner.submit("create", 1, work)
+        chunks = []
+
+        async def consume():
+            async for chunk in job_events(job, keepalive=0.05):
+                chunks.append(chunk)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.12)
+        for step in steps:
+            step.set()
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(consumer, 1)
+        return chunks
+
+    events = parse_events(run(scenario()))
+    assert ("keepalive", None) in events
+    progress = [data for event, data in events if event == "progress"]
+    final = [(event, data) for event, data in events if event not in ("progress", "keepalive")]
+    assert [event for event, _ in final] == ["succeeded"]
+    assert events[-1][0] == "succeeded"
+    assert final[0][1]["result"] == {"id": "db-1"}
+    # 每条事件的阶段都不早于前一条，历史只会追加
+    stages = ["queued", "running", "starting_container", "waiting_for_mysql", "seeding", "done"]
+    seen = [stages.index(data["stage"]) for data in progress] + [stages.index(final[0][1]["stage"])]
+    assert seen == sorted(seen)
+    assert [entry["stage"] for entry in final[0][1]["history"]] == stages[1:]
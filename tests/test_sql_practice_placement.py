@@ -0,0 +1,212 @@
+import socket
+import asyncio
+from types import SimpleNamespace
+
+import docker
+import pytest
+
+from src.scripts.fake_docker_engine import serve
+from src.services.sql_practice_placement import (
+    DockerHost, PlacementError, PlacementScheduler, RoutedDockerClient
+)
+
+
+class Registry:
+    """注册表的最小替身：调度器只读取各容器的状态"""
+
+    def __init__(self):
+        self.records = {}
+
+    def all(self):
+        return list(self.records.values())
+
+    def add(self, container_id, status="running"):
+        self.records[container_id] = {"id": container_id, "status": status, "labels": {}}
+
+
+def make_scheduler(urls, strategy="least_loaded", capacities=None):
+    service = SimpleNamespace(registry=Registry())
+    hosts = [
+        DockerHost(f"h{i}", url, address=f"10.0.0.{i}", capacity=(capacities or {}).get(f"h{i}", 0), timeout=2.0)
+        for i, url in enumerate(urls)
+    ]
+    return PlacementScheduler(service, hosts, strategy=strategy), service.registry
+
+
+def place(scheduler, registry, host_name, count):
+    for i in range(count):
+        container_id = f"{host_name}-{i}"
+        scheduler.claim(container_id, host_name)
+        registry.add(container_id)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize("strategy, capacities, loads, expected", [
+    # 按容器数占上限的比例选择负载最低的主机
+    ("least_loaded", {"h0": 10, "h1": 4, "h2": 10}, {"h0": 3, "h1": 1, "h2": 5}, "h1"),
+    ("least_loaded", {"h0": 10, "h1": 10, "h2": 10}, {"h0": 2, "h1": 2, "h2": 2}, "h0"),
+    # 已满的主机不参与放置
+    ("least_loaded", {"h0": 2, "h1": 10, "h2": 10}, {"h0": 2, "h1": 9, "h2": 9}, "h1"),
+    # binpack 选择最满但仍有空位的主机
+    ("binpack", {"h0": 10, "h1": 10, "h2": 10}, {"h0": 3, "h1": 7, "h2": 1}, "h1"),
+    ("binpack", {"h0": 10, "h1": 7, "h2": 10}, {"h0": 3, "h1": 7, "h2": 1}, "h0"),
+])
+def test_choose(strategy, capacities, loads, expected):
+    scheduler, registry = make_scheduler(["http://a", "http://b", "http://c"], strategy, capacities)
+    for host_name, count in loads.items():
+        place(scheduler, registry, host_name, count)
+    assert scheduler.choose().name == expected
+
+
+def test_choose_skips_draining_unreachable_and_stopped():
+    scheduler, registry = make_scheduler(["http://a", "http://b", "http://c"], capacities={"h0": 2, "h1": 2, "h2": 2})
+    place(scheduler, registry, "h0", 1)
+    scheduler.drain("h1")
+    scheduler.hosts["h2"].last_error = "connection refused"
+    assert scheduler.choose().name == "h0"
+
+    # 已停止的容器不计入负载
+    registry.add("h0-stopped", status="exited")
+    scheduler.claim("h0-stopped", "h0")
+    assert scheduler.load("h0") == 1
+
+    place(scheduler, registry, "h0", 2)
+    with pytest.raises(PlacementError):
+        scheduler.choose()
+    # 排空中和不可达的主机在准入控制中按已满计算
+    assert scheduler.admission_load() == 6
+
+    scheduler.undrain("h1")
+    assert scheduler.choose().name == "h1"
+    with pytest.raises(ValueError):
+        scheduler.drain("missing")
+
+
+def test_reserve_counts_load_during_creation():
+    scheduler, _ = make_scheduler(["http://a", "http://b"], capacities={"h0": 1, "h1": 1})
+    with scheduler.reserve() as first:
+        with scheduler.reserve() as second:
+            assert {first, second} == {"h0", "h1"}
+            with pytest.raises(PlacementError):
+                scheduler.choose()
+    assert scheduler.load("h0") == scheduler.load("h1") == 0
+
+
+def run_routed(urls, scenario, **kwargs):
+    async def main():
+        scheduler, registry = make_scheduler(urls, **kwargs)
+        routed = RoutedDockerClient(scheduler)
+        try:
+            return await scenario(routed, scheduler, registry)
+        finally:
+            await routed.close()
+
+    return asyncio.run(main())
+
+
+def test_run_spreads_containers_and_routes_by_owner(fake_engine_urls):
+    urls = fake_engine_urls(2)
+
+    async def scenario(routed, scheduler, registry):
+        placed = {}
+        for i in range(4):
+            container = await routed.run("mysql:8.0", name=f"sql-{i}")
+            registry.add(container.id)
+            placed[container.id] = scheduler.owner(container.id)
+
+        per_host = {
+            host.name: {c.id for c in await host.client.list(all=True)}
+            for host in scheduler.hosts.values()
+        }
+
+        # 新的路由客户端不知道容器归属：get 在所有主机上查找，list 汇总所有主机
+        fresh_scheduler, _ = make_scheduler(urls)
+        fresh = RoutedDockerClient(fresh_scheduler)
+        try:
+            container_id = next(iter(placed))
+            found = await fresh.get(container_id)
+            found_owner = fresh_scheduler.owner(container_id)
+            with pytest.raises(docker.errors.NotFound):
+                await fresh.get("does-not-exist")
+            listed = {c.id for c in await fresh.list(all=True)}
+            owners = {cid: fresh_scheduler.owner(cid) for cid in listed}
+        finally:
+            await fresh.close()
+
+        await routed.stop(container_id)
+        await routed.remove(container_id)
+        remaining = {c.id for c in await scheduler.hosts[placed[container_id]].client.list(all=True)}
+        return placed, per_host, found.id, found_owner, listed, owners, remaining, scheduler.owner(container_id)
+
+    placed, per_host, found_id, found_owner, listed, owners, remaining, forgotten = run_routed(urls, scenario)
+    assert sorted(placed.values()) == ["h0", "h0", "h1", "h1"]
+    for container_id, host_name in placed.items():
+        assert container_id in per_host[host_name]
+    assert found_owner == placed[found_id]
+    assert listed == set(placed)
+    assert owners == placed
+    assert found_id not in remaining
+    assert forgotten is None
+
+
+def test_drain_moves_new_placements(fake_engine_urls):
+    urls = fake_engine_urls(2)
+
+    async def scenario(routed, scheduler, registry):
+        first = await routed.run("mysql:8.0")
+        registry.add(first.id)
+        drained = scheduler.owner(first.id)
+        scheduler.drain(drained)
+        placed = []
+        for _ in range(3):
+            container = await routed.run("mysql:8.0")
+            registry.add(container.id)
+            placed.append(scheduler.owner(container.id))
+        # 排空不影响已有容器的操作
+        await routed.stop(first.id)
+        stopped = await routed.get(first.id)
+        return drained, placed, stopped.status, [r["id"] for r in scheduler.containers_on(drained)]
+
+    drained, placed, status, on_drained = run_routed(urls, scenario)
+    assert drained not in placed
+    assert len(set(placed)) == 1
+    assert status == "exited"
+    assert len(on_drained) == 1
+
+
+def test_unreachable_host_recovers(fake_engine_urls):
+    urls = fake_engine_urls(1)
+    port = free_port()
+    urls.append(f"http://127.0.0.1:{port}")
+    servers = []
+
+    async def scenario(routed, scheduler, registry):
+        listed = await routed.list(all=True)
+        down = scheduler.hosts["h1"].last_error
+        unreachable = await routed.probe()
+        placements = set()
+        for _ in range(2):
+            container = await routed.run("mysql:8.0")
+            registry.add(container.id)
+            placements.add(scheduler.owner(container.id))
+        servers.append(serve(port=port, ready_after=0.1))
+        recovered = await routed.probe()
+        return listed, down, unreachable, placements, recovered, scheduler.choose().name
+
+    try:
+        listed, down, unreachable, placements, recovered, chosen = run_routed(urls, scenario)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    assert listed == []
+    assert down
+    assert unreachable == ["h1"]
+    assert placements == {"h0"}
+    assert recovered == []
+    assert chosen == "h1"
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from src.services.sql_practice_reaper import ExpiryReaper
+
+
+class Service:
+    def __init__(self, failures=0, leases=()):
+        self.failures = failures
+        self.leases = list(leases)
+        self.expired = []
+
+    async def _list_leases(self):
+        return self.leases
+
+    async def _expire_database(self, database_id):
+        self.expired.append(database_id)
+        if len(self.expired) <= self.failures:
+            raise RuntimeError("容器删除失败")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_failed_reap_is_retried_with_backoff():
+    async def scenario():
+        service = Service(failures=2)
+        reaper = ExpiryReaper(service, timedelta(minutes=5), retry_backoff=0.05)
+        await reaper.start()
+        reaper.schedule("c1", datetime.now())
+        await asyncio.sleep(0.1)
+        retrying = reaper.pending()
+        await asyncio.sleep(0.3)
+        await reaper.stop()
+        return service.expired, retrying, reaper.pending()
+
+    expired, retrying, pending = run(scenario())
+    assert expired == ["c1", "c1", "c1"]
+    assert retrying == 1
+    assert pending == 0
+
+
+def test_cancel_during_failed_reap_stops_retries():
+    async def scenario():
+        service = Service(failures=10)
+        reaper = ExpiryReaper(service, timedelta(minutes=5), retry_backoff=0.05)
+        original = service._expire_database
+
+        async def expire(database_id):
+            reaper.cancel(database_id)
+            await original(database_id)
+
+        service._expire_database = expire
+        await reaper.start()
+        reaper.schedule("c1", datetime.now())
+        await asyncio.sleep(0.3)
+        await reaper.stop()
+        return service.expired, reaper.pending()
+
+    assert run(scenario()) == (["c1"], 0)
+
+
+def test_reconcile_picks_up_extended_leases():
+    async def scenario():
+        soon = datetime.now() + timedelta(seconds=60)
+        later = soon + timedelta(minutes=30)
+        service = Service(leases=[("c1", soon), ("c2", soon.isoformat()), ("c3", None)])
+        reaper = ExpiryReaper(service, timedelta(minutes=5), reconcile_interval=3600)
+        await reaper.start()
+        scheduled = dict(reaper._deadlines)
+        # 其他进程续租后，存储中的到期时间更晚
+        service.leases = [("c1", later), ("c2", soon - timedelta(minutes=1))]
+        await reaper._reconcile()
+        await reaper.stop()
+        return scheduled, dict(reaper._deadlines), soon, later
+
+    scheduled, reconciled, soon, later = run(scenario())
+    assert set(scheduled) == {"c1", "c2"}
+    assert reconciled["c1"] == later.timestamp()
+    # 更早的到期时间不会提前回收已登记的实例
+    assert reconciled["c2"] == soon.timestamp()
@@ -0,0 +1,60 @@
+import pytest
+
+from src.services.sql_practice_seeding import split_statements
+
+
+@pytest.mark.parametrize("script, statements", [
+    ("SELECT 1; SELECT 2;", ["SELECT 1", "SELECT 2"]),
+    # 最后一条语句没有分号
+    ("SELECT 1;\nSELECT 2", ["SELECT 1", "SELECT 2"]),
+    ("  ;;\n", []),
+    # 字符串和标识符中的分号
+    ("INSERT INTO t VALUES ('a;b'); SELECT 2", ["INSERT INTO t VALUES ('a;b')", "SELECT 2"]),
+    ('SELECT "x;y"; SELECT 2', ['SELECT "x;y"', "SELECT 2"]),
+    ("SELECT `a;b` FROM t; SELECT 2", ["SELECT `a;b` FROM t", "SELECT 2"]),
+    # 转义和重复的引号
+    ("SELECT 'it''s;'; SELECT 2", ["SELECT 'it''s;'", "SELECT 2"]),
+    ("SELECT 'a\\';b'; SELECT 2", ["SELECT 'a\\';b'", "SELECT 2"]),
+    ('SELECT "say \\"hi;\\""; SELECT 2', ['SELECT "say \\"hi;\\""', "SELECT 2"]),
+    ("SELECT 'back\\\\'; SELECT 2", ["SELECT 'back\\\\'", "SELECT 2"]),
+    # 注释中的分号，注释被去掉
+    ("SELECT 1; -- a; b\nSELECT 2;", ["SELECT 1", "SELECT 2"]),
+    ("SELECT 1; # a; b\nSELECT 2", ["SELECT 1", "SELECT 2"]),
+    ("SELECT /* a; b */ 1; SELECT 2", ["SELECT  1", "SELECT 2"]),
+    ("SELECT 1 --1;", ["SELECT 1 --1"]),
+    # 可执行注释和优化器提示保留
+    ("/*!40101 SET NAMES utf8 */; SELECT 1", ["/*!40101 SET NAMES utf8 */", "SELECT 1"]),
+    ("SELECT /*+ MAX_EXECUTION_TIME(1) */ 1;", ["SELECT /*+ MAX_EXECUTION_TIME(1) */ 1"]),
+])
+def test_split_statements(script, statements):
+    assert split_statements(script) == statements
+
+
+PROCEDURE = """
+CREATE TABLE t (id INT);
+DELIMITER $$
+CREATE PROCEDURE fill()
+BEGIN
+  INSERT INTO t VALUES (1);
+  INSERT INTO t VALUES (';$$');
+END$$
+DELIMITER ;
+CALL fill();
+"""
+
+
+@pytest.mark.parametrize("script, statements", [
+    (PROCEDURE, [
+        "CREATE TABLE t (id INT)",
+        "CREATE PROCEDURE fill()\nBEGIN\n  INSERT INTO t VALUES (1);\n  INSERT INTO t VALUES (';$$');\nEND",
+        "CALL fill()",
+    ]),
+    ("delimiter //\nSELECT 1; SELECT 2//\nSELECT 3//", ["SELECT 1; SELECT 2", "SELECT 3"]),
+    # 分隔符修改后最后一条语句可以没有分隔符
+    ("DELIMITER $$\nSELECT 1", ["SELECT 1"]),
+    # 只在语句开头识别 DELIMITER
+    ("SELECT 'DELIMITER $$'; SELECT 2", ["SELECT 'DELIMITER $$'", "SELECT 2"]),
+    ("SELECT 1 AS x\nDELIMITER $$;", ["SELECT 1 AS x\nDELIMITER $$"]),
+])
+def test_split_statements_delimiter(script, statements):
+    assert split_statements(script) == statements
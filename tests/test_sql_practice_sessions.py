@@ -0,0 +1,113 @@
+import pytest
+
+from src.services.sql_practice_sessions import SessionManager, classify_statement
+
+
+@pytest.mark.parametrize("sql, kind", [
+    ("SELECT * FROM users", "read"),
+    ("  select 1", "read"),
+    ("(SELECT 1) UNION (SELECT 2)", "read"),
+    ("-- 注释\nSELECT 1", "read"),
+    ("# 注释\nSHOW TABLES", "read"),
+    ("/* 普通注释 */ DESCRIBE users", "read"),
+    ("WITH t AS (SELECT 1) SELECT * FROM t", "read"),
+    ("WITH t AS (SELECT 1) DELETE FROM users WHERE id IN (SELECT * FROM t)", "write"),
+    ("SET @total = 1", "read"),
+    ("SET autocommit = 0", "control"),
+    ("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED", "control"),
+    ("SET @@sql_mode = ''", "control"),
+    ("INSERT INTO users (name) VALUES ('a')", "write"),
+    ("UPDATE users SET name = 'b'", "write"),
+    ("DELETE FROM users", "write"),
+    ("CREATE TABLE t (id INT)", "ddl"),
+    ("TRUNCATE TABLE users", "ddl"),
+    ("BEGIN", "control"),
+    ("START TRANSACTION", "control"),
+    ("COMMIT", "control"),
+    ("/* 注释 */ ROLLBACK", "control"),
+    ("LOCK TABLES users WRITE", "control"),
+    # 预处理语句可以执行任意语句（如 PREPARE s FROM 'COMMIT'），存储过程可能包含DDL
+    ("PREPARE s FROM 'COMMIT'", "control"),
+    ("EXECUTE s", "control"),
+    ("DEALLOCATE PREPARE s", "control"),
+    ("/*!50000 EXECUTE s */", "control"),
+    ("CALL fill()", "ddl"),
+])
+def test_classify_statement(sql, kind):
+    assert classify_statement(sql) == kind
+
+
+@pytest.mark.parametrize("sql, kind", [
+    # 可执行注释中的内容会被服务器执行，不能当作注释跳过
+    ("/*!50000 COMMIT */", "control"),
+    ("/*! COMMIT */", "control"),
+    ("/*!40101 SET autocommit = 0 */", "control"),
+    ("/*M!100100 ROLLBACK */", "control"),
+    ("/*!50000 DROP TABLE users */", "ddl"),
+    ("/* 普通注释 */ /*!50000 START TRANSACTION */", "control"),
+    ("/*+ COMMIT */ SELECT 1", "control"),
+    ("SELECT /*+ MAX_EXECUTION_TIME(1000) */ * FROM users", "read"),
+    ("/*!50000 SELECT */ 1", "read"),
+])
+def test_classify_statement_executable_comments(sql, kind):
+    assert classify_statement(sql) == kind
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        self.conn.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.rollbacks = 0
+        self.autocommit = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    monkeypatch.setattr("src.services.sql_practice_sessions.mysql.connector.connect", lambda **_: FakeConnection())
+    manager = SessionManager()
+    manager.mark_pristine("db-1")
+    return manager
+
+
+def run_statement(manager, sql, ok=True):
+    with manager.connection("db-1", {"host": "localhost"}) as conn:
+        manager.begin_statement(conn, sql)
+        manager.end_statement(conn, ok, None if ok else Exception("failed"))
+    return conn
+
+
+def test_reset_rolls_back_writes(sessions):
+    conn = run_statement(sessions, "INSERT INTO users VALUES (1)")
+    assert sessions.undo("db-1")
+    run_statement(sessions, "UPDATE users SET name = 'a'")
+    assert sessions.reset("db-1")
+    assert conn.rollbacks == 1
+
+
+@pytest.mark.parametrize("ok", [True, False])
+def test_ddl_taints_session_even_when_it_fails(sessions, ok):
+    # DROP TABLE 失败前事务已被隐式提交，之前的写入无法再回滚
+    run_statement(sessions, "INSERT INTO users VALUES (1)")
+    run_statement(sessions, "DROP TABLE nonexistent", ok=ok)
+    assert not sessions.undo("db-1")
+    assert not sessions.reset("db-1")
+    assert sessions.stats()["tainted"] == 1
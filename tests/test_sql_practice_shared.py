@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src.services.sql_practice_shared import SharedMySQLBackend
+
+DATABASE_ID = "shared-0-abc123"
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.server.statements.append(sql)
+        if sql.startswith("SELECT *"):
+            self.rows = [dict(self.server.row)] if self.server.row else []
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    def __init__(self):
+        self.connects = 0
+        self.statements = []
+        now = datetime.now()
+        self.row = {
+            "id": DATABASE_ID, "user_id": "1", "username": "alice", "db_name": "practice_alice",
+            "account": "u_abc", "password": "secret", "difficulty": "easy",
+            "created_at": now, "expires_at": now,
+        }
+
+    def connect(self, **kwargs):
+        self.connects += 1
+        return FakeConnection(self)
+
+
+class Service:
+    store = None
+
+    async def _run_db(self, func, *args):
+        return func(*args)
+
+    def _close_query_connections(self, database_id):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr("src.services.sql_practice_shared.mysql.connector.connect", server.connect)
+    return server
+
+
+def test_connection_params_are_cached(server):
+    async def scenario():
+        backend = SharedMySQLBackend(Service(), ["db1:3306"], "root", "root")
+        for _ in range(3):
+            params = await backend.get_connection_params(DATABASE_ID)
+            await backend.get_database_info(DATABASE_ID)
+        return params
+
+    params = asyncio.run(scenario())
+    assert params["user"] == "u_abc"
+    assert params["database"] == "practice_alice"
+    assert server.connects == 1
+
+
+def test_delete_invalidates_cache(server):
+    async def scenario():
+        backend = SharedMySQLBackend(Service(), ["db1:3306"], "root", "root")
+        await backend.get_connection_params(DATABASE_ID)
+        await backend.delete_database(DATABASE_ID)
+        server.row = None
+        return await backend.get_database_info(DATABASE_ID)
+
+    assert asyncio.run(scenario()) is None
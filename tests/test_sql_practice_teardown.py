@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+
+from src.services.sql_practice_teardown import TeardownQueue
+
+
+class Registry:
+    def discard(self, container_id):
+        pass
+
+
+class Docker:
+    def __init__(self, unreachable=()):
+        self.unreachable = set(unreachable)
+        self.killed = []
+        self.removed = []
+
+    async def list(self, **kwargs):
+        return []
+
+    async def rename(self, container_id, name):
+        if container_id in self.unreachable:
+            raise httpx.ConnectError("Docker守护进程无响应")
+
+    async def kill(self, container_id):
+        self.killed.append(container_id)
+
+    async def remove(self, container_id, **kwargs):
+        self.removed.append(container_id)
+
+
+class Service:
+    def __init__(self, docker):
+        self.docker = docker
+        self.registry = Registry()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_transport_error_does_not_abort_batch():
+    async def scenario():
+        docker = Docker(unreachable={"c2"})
+        queue = TeardownQueue(Service(docker), deferred=False)
+        await queue.release(["c1", "c2", "c3"])
+        return docker, queue.stats()["pending"]
+
+    docker, pending = run(scenario())
+    assert sorted(docker.killed) == ["c1", "c3"]
+    # 停止失败的容器仍交给删除流程，不会永久留在 _pending 中
+    assert sorted(docker.removed) == ["c1", "c2", "c3"]
+    assert pending == 0
+
+
+def test_transport_error_is_retried_in_background():
+    async def scenario():
+        docker = Docker(unreachable={"c2"})
+        queue = TeardownQueue(Service(docker), retry_delay=0.01)
+        await queue.start()
+        await queue.release(["c1", "c2"])
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return docker, queue.stats()["pending"]
+
+    docker, pending = run(scenario())
+    assert sorted(docker.removed) == ["c1", "c2"]
+    assert pending == 0